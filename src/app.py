@@ -3,12 +3,19 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from controllers.dashboard_route import dashboard_bp
 from models import db
+from models.routing import init_replicas
+from utils.sharding import init_sharding
 from models import User, Expense  # Import your database and models
 from utils.db_init import init_db
+from utils.commands import register_commands
+from utils.template_cache import init_template_cache
+from utils.compression import CompressionMiddleware
+from utils.live_updates import init_live_updates
+from utils.query_pool import init_query_pool
 import os
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev_secret_key")
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
@@ -17,6 +24,67 @@ def create_app():
     )
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_pre_ping": True}
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["JINJA_BYTECODE_CACHE_DIR"] = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+    app.config["FRAGMENT_CACHE_MAX_BYTES"] = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", "33554432"))
+    app.config["FRAGMENT_CACHE_MAX_ENTRY_BYTES"] = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRY_BYTES", "1048576"))
+    # Per-user memory-mapped column files backing the analytics pages
+    app.config["SNAPSHOT_DIR"] = os.getenv("SNAPSHOT_DIR")
+    app.config["ANALYTICS_SNAPSHOTS"] = os.getenv("ANALYTICS_SNAPSHOTS", "1") == "1"
+    app.config["COMPRESSION_MIN_SIZE"] = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    app.config["COMPRESSION_LEVEL"] = int(os.getenv("COMPRESSION_LEVEL", "6"))
+    app.config["ETAG_SALT"] = os.getenv("APP_VERSION", "")
+    app.config["RECENT_EXPENSES_DAYS"] = int(os.getenv("RECENT_EXPENSES_DAYS", "90"))
+    # Non-debt expenses older than this many whole months are moved to the archive
+    app.config["ARCHIVE_HORIZON_MONTHS"] = int(os.getenv("ARCHIVE_HORIZON_MONTHS", "12"))
+    # Admin analytics are recomputed by `flask analytics refresh` on a schedule
+    app.config["ADMIN_ANALYTICS_SHARDS"] = int(os.getenv("ADMIN_ANALYTICS_SHARDS", "8"))
+    app.config["ADMIN_ANALYTICS_MAX_AGE_MINUTES"] = int(os.getenv("ADMIN_ANALYTICS_MAX_AGE_MINUTES", "60"))
+
+    # Optional read replicas, e.g. DATABASE_REPLICA_URLS=postgresql://...,postgresql://...
+    app.config["SQLALCHEMY_REPLICA_URIS"] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    app.config["REPLICA_STICKY_SECONDS"] = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    # Optional extra databases holding user data; the primary stays shard "default"
+    app.config["SQLALCHEMY_SHARD_URIS"] = [
+        url.strip() for url in os.getenv("DATABASE_SHARD_URLS", "").split(",") if url.strip()
+    ]
+    # How long a session trusts its cached shard before re-reading the directory
+    app.config["SHARD_CACHE_SECONDS"] = float(os.getenv("SHARD_CACHE_SECONDS", "10"))
+    # Change-log entries returned per /sync page, and changes accepted per upload
+    app.config["SYNC_BATCH_SIZE"] = int(os.getenv("SYNC_BATCH_SIZE", "500"))
+    app.config["SYNC_MAX_UPLOAD"] = int(os.getenv("SYNC_MAX_UPLOAD", "1000"))
+    # Live dashboard streams held open per worker process, and their heartbeat
+    app.config["SSE_MAX_CONNECTIONS"] = int(os.getenv("SSE_MAX_CONNECTIONS", "100"))
+    app.config["SSE_KEEPALIVE_SECONDS"] = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+    # Daily debt reminders: look-ahead and look-back windows, and where they are delivered
+    app.config["DEBT_REMINDER_DAYS"] = int(os.getenv("DEBT_REMINDER_DAYS", "3"))
+    app.config["DEBT_REMINDER_OVERDUE_DAYS"] = int(os.getenv("DEBT_REMINDER_OVERDUE_DAYS", "30"))
+    app.config["REMINDER_SINK"] = os.getenv("REMINDER_SINK", "log")
+    # Threads per worker running a page's independent queries side by side (0 = sequential)
+    app.config["QUERY_CONCURRENCY"] = int(os.getenv("QUERY_CONCURRENCY", "4"))
+    # Most points /api/timeseries returns; longer ranges are downsampled
+    app.config["TIMESERIES_MAX_POINTS"] = int(os.getenv("TIMESERIES_MAX_POINTS", "200"))
+    # Content-addressed receipt blobs (default: <instance>/receipts) and the upload size limit
+    app.config["RECEIPTS_DIR"] = os.getenv("RECEIPTS_DIR")
+    app.config["RECEIPT_MAX_BYTES"] = int(os.getenv("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))
+    # Let a fronting nginx/Apache send receipt files via X-Sendfile instead of the worker
+    app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "0") == "1"
+    if config:
+        app.config.update(config)
+
+    db.init_app(app)
+    init_replicas(app)
+    init_sharding(app)
+    init_live_updates(app)
+    init_query_pool(app)
+    register_commands(app)
+    init_template_cache(app)
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        level=app.config["COMPRESSION_LEVEL"],
+    )
 
     # Initialize the database
     # Ensure tables and admin user exist on app startup
@@ -31,11 +99,27 @@ def create_app():
     # Import and register blueprints (routes)
     from controllers.auth_route import auth_bp
     from controllers.expense_route import expense_bp
+    from controllers.budget_route import budget_bp
+    from controllers.metrics_route import metrics_bp
+    from controllers.admin_route import admin_bp
+    from controllers.sync_route import sync_bp
+    from controllers.rule_route import rule_bp
+    from controllers.chart_route import chart_bp
+    from controllers.group_route import group_bp
+    from controllers.receipt_route import receipt_bp
     # from controllers.debt_route import debt_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(expense_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(budget_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(rule_bp)
+    app.register_blueprint(chart_bp)
+    app.register_blueprint(group_bp)
+    app.register_blueprint(receipt_bp)
     # app.register_blueprint(debt_bp)
 
     # Error handlers
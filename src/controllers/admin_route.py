@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, render_template
+from utils.admin_analytics import latest_platform_stats
+from utils.decorators import admin_required
+
+admin_bp = Blueprint("admin", __name__)
+
+
+@admin_bp.route("/admin/analytics")
+@admin_required
+def analytics():
+    """Platform-wide analytics, read from the last scheduled refresh"""
+    stats = latest_platform_stats()
+    max_age = timedelta(minutes=current_app.config["ADMIN_ANALYTICS_MAX_AGE_MINUTES"])
+    stale = stats is None or datetime.utcnow() - stats.computed_at > max_age
+    return render_template("admin_analytics.html", stats=stats, stale=stale)
@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from models import User
+from utils.sharding import find_user
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -14,12 +14,13 @@ def login():
         username = request.form.get("username")
         password = request.form.get("password")
 
-        user = User.query.filter_by(username=username).first()
+        user = find_user(username)
 
         if user and user.check_password(password):
             session["user_id"] = user.id
             session["username"] = user.username
             session["is_admin"] = user.is_admin
+            session["base_currency"] = user.base_currency
             flash(f"Welcome back, {user.username}!", "success")
             return redirect(url_for("dashboard.index"))
         else:
@@ -0,0 +1,84 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from models import db, Budget
+from utils.budgets import PERIODS, current_budgets, initialize_budget
+from utils.data_version import bump_data_version
+from utils.decorators import login_required
+from utils.fx import DEFAULT_CURRENCY
+
+budget_bp = Blueprint("budgets", __name__)
+
+
+@budget_bp.route("/budgets", methods=["GET", "POST"])
+@login_required
+def budgets_list():
+    """List budgets and create new ones"""
+    user_id = session.get("user_id")
+
+    if request.method == "POST":
+        try:
+            category = request.form.get("category")
+            period = request.form.get("period", "monthly")
+            limit_amount = request.form.get("limit_amount")
+
+            if not category or not limit_amount or period not in PERIODS:
+                flash("Please fill in all required fields", "warning")
+                return redirect(url_for("budgets.budgets_list"))
+
+            existing = Budget.query.filter_by(
+                user_id=user_id, category=category, period=period
+            ).first()
+            if existing:
+                flash("A budget for this category and period already exists", "warning")
+                return redirect(url_for("budgets.budgets_list"))
+
+            budget = Budget(
+                user_id=user_id,
+                category=category,
+                period=period,
+                limit_amount=float(limit_amount),
+            )
+            initialize_budget(budget)
+
+            db.session.add(budget)
+            bump_data_version(user_id)
+            db.session.commit()
+            flash("Budget created successfully!", "success")
+            return redirect(url_for("budgets.budgets_list"))
+
+        except ValueError:
+            db.session.rollback()
+            flash("Invalid data format. Please check your inputs.", "danger")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error creating budget: {str(e)}", "danger")
+
+    budgets = current_budgets(user_id, Budget.category.asc(), Budget.period.asc())
+
+    return render_template(
+        "budgets.html",
+        budgets=budgets,
+        periods=PERIODS,
+        base_currency=session.get("base_currency", DEFAULT_CURRENCY),
+    )
+
+
+@budget_bp.route("/budgets/<int:id>/delete", methods=["POST"])
+@login_required
+def delete_budget(id):
+    """Delete a budget"""
+    budget = Budget.query.get_or_404(id)
+
+    if budget.user_id != session.get("user_id"):
+        flash("You don't have permission to delete this budget", "danger")
+        return redirect(url_for("budgets.budgets_list"))
+
+    try:
+        db.session.delete(budget)
+        bump_data_version(budget.user_id)
+        db.session.commit()
+        flash("Budget deleted successfully", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error deleting budget: {str(e)}", "danger")
+
+    return redirect(url_for("budgets.budgets_list"))
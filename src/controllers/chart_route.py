@@ -0,0 +1,113 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request, session
+from utils.balances import balance_history
+from utils.data_version import get_data_version
+from utils.decorators import etag_by_data_version, login_required, read_only
+from utils.fx import DEFAULT_CURRENCY
+from utils.lookups import categories
+from utils.timeseries import GRANULARITIES, bucket_totals, buckets, downsample, pick_granularity
+
+chart_bp = Blueprint("charts", __name__)
+
+
+# Ranges stay well inside date.min/date.max, so defaults and whole buckets never overflow
+_FIRST_DAY, _LAST_DAY = date(1900, 1, 1), date(9998, 12, 31)
+
+
+def _parse_day(value, default):
+    day = datetime.strptime(value, "%Y-%m-%d").date() if value else default
+    if not _FIRST_DAY <= day <= _LAST_DAY:
+        raise ValueError(day)
+    return day
+
+
+def _parse_range():
+    """The [start, end] days of the request, the year up to end by default"""
+    end = _parse_day(request.args.get("end"), date.today())
+    start = _parse_day(request.args.get("start"), max(end - timedelta(days=365), _FIRST_DAY))
+    return start, end
+
+
+@chart_bp.route("/api/balances")
+@login_required
+@read_only
+@etag_by_data_version
+def balances():
+    """Daily running balances for a date range (the last year by default), read from the history table"""
+    user_id = session.get("user_id")
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify(error=f"Dates must be given as YYYY-MM-DD between {_FIRST_DAY} and {_LAST_DAY}"), 400
+    if start > end:
+        return jsonify(error="start must not be after end"), 400
+
+    opening, days = balance_history(user_id, start, end)
+    return jsonify(
+        currency=session.get("base_currency", DEFAULT_CURRENCY),
+        start=start.isoformat(),
+        end=end.isoformat(),
+        # Days without expenses are not stored; totals carry over from the previous day
+        opening={
+            "cumulative_total": round(opening.cumulative_total, 2) if opening else 0.0,
+            "open_debt": round(opening.open_debt, 2) if opening else 0.0,
+        },
+        days=[
+            {
+                "date": d.day.isoformat(),
+                "daily_total": round(d.daily_total, 2),
+                "cumulative_total": round(d.cumulative_total, 2),
+                "open_debt": round(d.open_debt, 2),
+            }
+            for d in days
+        ],
+    )
+
+
+# Not read-only: the first read of a closed bucket stores it on the primary
+@chart_bp.route("/api/timeseries")
+@login_required
+@etag_by_data_version
+def timeseries():
+    """Spend per day, week, month or year over a date range, optionally split by category.
+
+    The requested granularity is coarsened, and as a last resort neighbouring
+    buckets merged, until the series fits in TIMESERIES_MAX_POINTS points.
+    """
+    user_id = session.get("user_id")
+    currency = session.get("base_currency", DEFAULT_CURRENCY)
+    max_points = current_app.config["TIMESERIES_MAX_POINTS"]
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return jsonify(error=f"granularity must be one of {', '.join(GRANULARITIES)}"), 400
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify(error=f"Dates must be given as YYYY-MM-DD between {_FIRST_DAY} and {_LAST_DAY}"), 400
+    if start > end:
+        return jsonify(error="start must not be after end"), 400
+
+    chosen = pick_granularity(start, end, max_points, finest=granularity)
+    ranges = buckets(chosen, start, end)
+    totals = bucket_totals(user_id, chosen, currency, ranges, get_data_version(user_id))
+    points = downsample([(bucket, totals.get(bucket, {})) for bucket, _ in ranges], max_points)
+
+    payload = {
+        "granularity": chosen,
+        "downsampled": chosen != granularity or len(points) < len(ranges),
+        "currency": currency,
+        # Whole buckets are reported, so the range may widen to their edges
+        "start": ranges[0][0].isoformat(),
+        "end": (ranges[-1][1] - timedelta(days=1)).isoformat(),
+        "points": [
+            {"start": bucket.isoformat(), "total": round(sum(by_category.values()), 2)}
+            for bucket, by_category in points
+        ],
+    }
+    if request.args.get("by_category") in ("1", "true"):
+        category_ids = sorted({c for _, by_category in points for c in by_category})
+        names = categories.names_for(category_ids)
+        payload["series"] = {
+            names[c]: [round(by_category.get(c, 0.0), 2) for _, by_category in points] for c in category_ids
+        }
+    return jsonify(payload)
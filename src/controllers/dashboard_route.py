@@ -1,42 +1,70 @@
-from flask import Blueprint, render_template, session
+import json
+import queue
+from flask import Blueprint, Response, render_template, request, session, current_app, stream_with_context
 from datetime import datetime
-from sqlalchemy import func
-from models import db, Expense
-from utils.decorators import login_required
+from functools import partial
+from sqlalchemy import case, func, select
+from models import db, Expense, Budget, User
+from utils.decorators import login_required, read_only, etag_by_data_version
+from utils.archive import archived_totals_columns
+from utils.budgets import current_budgets
+from utils.data_version import get_data_version
+from utils.fx import DEFAULT_CURRENCY, converted_amount, join_rates, unconverted_count
+from utils.partitioning import recent_since
+from utils.query_pool import gather
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 
-@dashboard_bp.route("/")
-@login_required
-def index():
-    """Main dashboard with statistics"""
-    user_id = session.get("user_id")
-
-    total_expenses = (
-        db.session.query(func.sum(Expense.amount)).filter_by(user_id=user_id).scalar()
-        or 0
-    )
-    total_debts = (
-        db.session.query(func.sum(Expense.amount))
-        .filter(Expense.user_id == user_id, Expense.due_date.isnot(None))
-        .scalar()
-        or 0
+def _dashboard_totals(user_id, base_currency):
+    """Converted totals and counts shown in the dashboard cards"""
+    # Totals are converted into the user's base currency inside one aggregate
+    amount = converted_amount(base_currency)
+    is_debt = Expense.due_date.isnot(None)
+    # Archived history only survives as monthly totals; they are folded back in
+    # through subqueries of the same statement
+    total_expenses, total_debts, expenses_count, debts_count, unconverted, archived_total, archived_count = (
+        join_rates(
+            db.session.query(
+                func.sum(amount),
+                func.sum(case((is_debt, amount))),
+                func.count(Expense.id),
+                func.count(case((Expense.due_date >= datetime.utcnow().date(), 1))),
+                unconverted_count(base_currency),
+                *archived_totals_columns(user_id, base_currency),
+            ),
+            base_currency,
+        )
+        .filter(Expense.user_id == user_id)
+        .one()
     )
+    return {
+        "total_expenses": (total_expenses or 0) + archived_total,
+        "total_debts": total_debts or 0,
+        "expenses_count": expenses_count + archived_count,
+        "debts_count": debts_count,
+        "unconverted": unconverted,
+    }
 
-    expenses_count = Expense.query.filter_by(user_id=user_id).count()
-    debts_count = Expense.query.filter(
-        Expense.user_id == user_id, Expense.due_date.isnot(None), Expense.due_date >= datetime.utcnow().date(),
-    ).count()
 
-    recent_expenses = (
-        Expense.query.filter_by(user_id=user_id)
-        .order_by(Expense.created_at.desc())
-        .limit(5)
-        .all()
-    )
+def _recent_expenses(user_id, limit=5):
+    """The most recently entered expenses, whatever date they are booked on.
+
+    The newest partitions are tried first through a date bound; only when they
+    hold fewer than limit expenses does the read fall back to all of them, so
+    an account with older entries only still sees its latest ones.
+    """
+    latest = Expense.query.filter_by(user_id=user_id).order_by(Expense.created_at.desc())
+    recent = latest.filter(
+        Expense.date >= recent_since(days=current_app.config["RECENT_EXPENSES_DAYS"])
+    ).limit(limit).all()
+    if len(recent) < limit:
+        return latest.limit(limit).all()
+    return recent
+
 
-    upcoming_debts = (
+def _upcoming_debts(user_id):
+    return (
         Expense.query.filter(
             Expense.user_id == user_id,
             Expense.due_date.isnot(None),
@@ -47,12 +75,108 @@ def index():
         .all()
     )
 
+
+def _budgets(user_id):
+    # Budgets carry their running spend, so over-budget state is a plain read
+    return current_budgets(user_id, Budget.category.asc())
+
+
+@dashboard_bp.route("/")
+@login_required
+@read_only
+@etag_by_data_version
+def index():
+    """Main dashboard with statistics"""
+    user_id = session.get("user_id")
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+
+    # The four reads are independent; they run side by side when connections are free
+    totals, recent_expenses, upcoming_debts, budgets = gather(
+        partial(_dashboard_totals, user_id, base_currency),
+        partial(_recent_expenses, user_id),
+        partial(_upcoming_debts, user_id),
+        partial(_budgets, user_id),
+    )
+    over_budget = [b for b in budgets if b.is_over_budget]
+
     return render_template(
         "index.html",
-        total_expenses=total_expenses,
-        total_debts=total_debts,
-        expenses_count=expenses_count,
-        debts_count=debts_count,
+        **totals,
         recent_expenses=recent_expenses,
         upcoming_debts=upcoming_debts,
+        budgets=budgets,
+        over_budget=over_budget,
+        base_currency=base_currency,
+        data_version=get_data_version(user_id),
+    )
+
+
+def _live_state(user_id, base_currency):
+    """The dashboard values pushed to live clients, as JSON-ready data"""
+    state = _dashboard_totals(user_id, base_currency)
+    state["total_expenses"] = round(state["total_expenses"], 2)
+    state["total_debts"] = round(state["total_debts"], 2)
+    state["recent_expenses"] = [
+        {
+            "name": e.name,
+            "amount": round(e.amount, 2),
+            "currency": e.currency,
+            "category": e.category,
+            "date": e.date.isoformat(),
+        }
+        for e in _recent_expenses(user_id)
+    ]
+    return state
+
+
+@dashboard_bp.route("/events")
+@login_required
+def events():
+    """Server-Sent Events stream of dashboard changes for the current user.
+
+    Reads stay on the primary: the signal arrives as soon as the write commits,
+    before replicas may have it. Each event carries only the values that changed.
+    """
+    user_id = session.get("user_id")
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+    since = request.args.get("since", type=int)
+    broker = current_app.extensions["live_updates"]
+    keepalive = current_app.config.get("SSE_KEEPALIVE_SECONDS", 15)
+
+    signals = broker.subscribe(user_id)
+    if signals is None:
+        return "Too many live connections", 503, {"Retry-After": "30"}
+
+    def _current_version():
+        return db.session.scalar(select(User.data_version).where(User.id == user_id)) or 0
+
+    def stream():
+        sent = {}
+        yield "retry: 5000\n\n"
+        # A client that rendered an older version catches up immediately
+        pending = since is None or since != _current_version()
+        while True:
+            if not pending:
+                try:
+                    signals.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+            pending = False
+
+            version = _current_version()
+            state = _live_state(user_id, base_currency)
+            db.session.close()  # Hand the connection back while idle
+            delta = {key: value for key, value in state.items() if sent.get(key) != value}
+            sent.update(state)
+            if delta:
+                yield f"event: update\nid: {version}\ndata: {json.dumps(delta)}\n\n"
+
+    response = Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+    # Runs when the client goes away, even if the stream never started
+    response.call_on_close(lambda: broker.unsubscribe(user_id, signals))
+    return response
@@ -1,16 +1,40 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
 from datetime import datetime
-from sqlalchemy import func
-from models import db, Expense
-from utils.decorators import login_required
+from functools import partial
+from sqlalchemy import Integer, any_, bindparam, case, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import aliased
+from models import db, Attachment, Expense
+from utils.archive import archived_by_category, archived_by_month
+from utils.balances import apply_balance_delta, rebuild_balances
+from utils.budgets import apply_budget_delta, apply_budget_deltas, refresh_user_budgets
+from utils.categorize import expense_text, get_matcher
+from utils.changelog import DELETE, UPSERT, record_changes
+from utils.data_version import bump_data_version, get_data_version
+from utils.decorators import login_required, read_only, etag_by_data_version
+from utils.fx import DEFAULT_CURRENCY, converted_amount, join_rates, parse_currency, unconverted_count
+from utils.lookups import categories, merchants
+from utils.partitioning import year_predicates
+from utils.projections import project_expenses
+from utils.query_pool import gather
+from utils.snapshots import load_snapshot, snapshots_enabled, summarize
+from utils.timeseries import invalidate_buckets
 
 expense_bp = Blueprint("expenses", __name__)
 
+# Second reference to the row being updated; its columns hold the pre-update values
+_previous = aliased(Expense, name="previous")
+
+# Category of imported expenses that name no category and match no rule
+UNCATEGORIZED = "Uncategorized"
+
 
 @expense_bp.route("/expenses/new", methods=["GET", "POST"])
 @login_required
 def new_expense():
     """Create a new expense"""
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+
     if request.method == "POST":
         try:
             name = request.form.get("name")
@@ -21,6 +45,9 @@ def new_expense():
             element = request.form.get("element")
             comment = request.form.get("comment")
 
+            if name and not category:
+                category = get_matcher(session.get("user_id")).match(expense_text(name, element))
+
             if not name or not amount or not category or not date_str:
                 flash("Please fill in all required fields", "warning")
                 return redirect(url_for("expenses.new_expense"))
@@ -28,6 +55,7 @@ def new_expense():
             expense = Expense(
                 name=name,
                 amount=float(amount),
+                currency=parse_currency(request.form.get("currency"), base_currency),
                 category=category,
                 date=datetime.strptime(date_str, "%Y-%m-%d").date(),
                 element=element if element else None,
@@ -39,6 +67,13 @@ def new_expense():
                 expense.due_date = datetime.strptime(due_date_str, "%Y-%m-%d").date()
 
             db.session.add(expense)
+            apply_budget_delta(expense.user_id, expense.category, expense.date,
+                               expense.amount, expense.currency, base_currency)
+            apply_balance_delta(expense.user_id, expense.date, expense.amount, expense.currency,
+                                base_currency, expense.is_debt)
+            invalidate_buckets(expense.user_id, expense.date)
+            bump_data_version(expense.user_id)
+            record_changes(expense.user_id, [expense.id], UPSERT)
             db.session.commit()
             flash("Expense created successfully!", "success")
             return redirect(url_for("dashboard.index"))
@@ -51,74 +86,241 @@ def new_expense():
             flash(f"Error creating expense: {str(e)}", "danger")
 
     return render_template(
-        "new_expense.html", today=datetime.now().strftime("%Y-%m-%d")
+        "new_expense.html",
+        today=datetime.now().strftime("%Y-%m-%d"),
+        base_currency=base_currency,
     )
 
 
+def _parse_import_line(line):
+    """Parse one pasted `YYYY-MM-DD, name, amount[, category]` line"""
+    fields = [f.strip() for f in line.split(",")]
+    if len(fields) not in (3, 4) or not fields[1]:
+        raise ValueError(line)
+    return {
+        "date": datetime.strptime(fields[0], "%Y-%m-%d").date(),
+        "name": fields[1],
+        "amount": float(fields[2]),
+        "category": fields[3] if len(fields) == 4 else None,
+    }
+
+
+@expense_bp.route("/expenses/import", methods=["GET", "POST"])
+@login_required
+def import_expenses():
+    """Create many expenses from pasted lines, categorizing them with the user's rules"""
+    user_id = session.get("user_id")
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+
+    if request.method == "POST":
+        lines = [line for line in (request.form.get("lines") or "").splitlines() if line.strip()]
+        try:
+            rows = [_parse_import_line(line) for line in lines]
+        except ValueError:
+            flash("Invalid data format. Use one line per expense: YYYY-MM-DD, name, amount[, category]", "danger")
+            return render_template("import_expenses.html", lines=request.form.get("lines"))
+
+        if not rows:
+            flash("Please paste at least one expense", "warning")
+            return redirect(url_for("expenses.import_expenses"))
+
+        # One automaton pass per row, however many rules the user has
+        matcher = get_matcher(user_id)
+        uncategorized = 0
+        for row in rows:
+            row["user_id"] = user_id
+            row["currency"] = base_currency
+            category = row.pop("category") or matcher.match(expense_text(row["name"], None))
+            if not category:
+                category = UNCATEGORIZED
+                uncategorized += 1
+            row["category_id"] = categories.id_for(category)
+
+        try:
+            new_ids = db.session.execute(insert(Expense).returning(Expense.id), rows).scalars().all()
+            refresh_user_budgets(user_id)
+            days = [row["date"] for row in rows]
+            rebuild_balances(user_id, since=min(days))
+            invalidate_buckets(user_id, min(days), max(days))
+            bump_data_version(user_id)
+            record_changes(user_id, new_ids, UPSERT)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error importing expenses: {str(e)}", "danger")
+            return render_template("import_expenses.html", lines=request.form.get("lines"))
+
+        flash(f"{len(new_ids)} expense(s) imported", "success")
+        if uncategorized:
+            flash(f"{uncategorized} expense(s) matched no rule and were filed under {UNCATEGORIZED}", "info")
+        return redirect(url_for("expenses.expenses_list"))
+
+    return render_template("import_expenses.html", lines="")
+
+
 @expense_bp.route("/expenses")
 @login_required
+@read_only
+@etag_by_data_version
 def expenses_list():
-    """List all expenses"""
+    """List all expenses, optionally for a single year"""
     user_id = session.get("user_id")
-    expenses = (
-        Expense.query.filter_by(user_id=user_id).order_by(Expense.date.desc()).all()
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+    year = request.args.get("year", type=int)
+    # A year filter lets Postgres prune every other yearly partition
+    criteria = [Expense.user_id == user_id]
+    if year:
+        criteria.extend(year_predicates(Expense.date, year))
+
+    # Lazy projection: rows are only fetched when the table fragment is not cached
+    expenses = project_expenses(*criteria, order_by=[Expense.date.desc()])
+
+    total, unconverted = (
+        join_rates(
+            db.session.query(func.sum(converted_amount(base_currency)), unconverted_count(base_currency)),
+            base_currency,
+        )
+        .filter(*criteria)
+        .one()
+    )
+
+    return render_template(
+        "expenses.html",
+        expenses=expenses,
+        total=total or 0,
+        unconverted=unconverted,
+        base_currency=base_currency,
+        data_version=get_data_version(user_id),
+        year=year,
     )
 
-    total = sum(e.amount for e in expenses)
 
-    return render_template("expenses.html", expenses=expenses, total=total)
+def _scoped_write_criteria(id, user_id):
+    """WHERE clause for a single-statement write: id, owner and, if sent, version"""
+    criteria = [Expense.id == id, Expense.user_id == user_id]
+    version = request.form.get("version", type=int)
+    if version is not None:
+        criteria.append(Expense.version == version)
+    return criteria
+
+
+def _rejected_write_reason(id, user_id):
+    """Explain why a scoped write matched no row; only runs on the failure path"""
+    owner_id = db.session.scalar(select(Expense.user_id).where(Expense.id == id))
+    if owner_id is None:
+        abort(404)
+    return "forbidden" if owner_id != user_id else "conflict"
 
 
 @expense_bp.route("/expenses/<int:id>/edit", methods=["GET", "POST"])
 @login_required
 def edit_expense(id):
     """Edit an existing expense"""
-    expense = Expense.query.get_or_404(id)
-
-    if expense.user_id != session.get("user_id"):
-        flash("You don't have permission to edit this expense", "danger")
-        return redirect(url_for("expenses.expenses_list"))
+    user_id = session.get("user_id")
+    status = 200
 
     if request.method == "POST":
         try:
-            expense.name = request.form.get("name")
-            expense.amount = float(request.form.get("amount"))
-            expense.category = request.form.get("category")
-            expense.date = datetime.strptime(
-                request.form.get("date"), "%Y-%m-%d"
-            ).date()
-            expense.element = request.form.get("element")
-            expense.comment = request.form.get("comment")
-
+            base_currency = session.get("base_currency", DEFAULT_CURRENCY)
             due_date_str = request.form.get("due_date")
-            expense.due_date = (
-                datetime.strptime(due_date_str, "%Y-%m-%d").date()
-                if due_date_str
-                else None
+            values = dict(
+                name=request.form.get("name"),
+                amount=float(request.form.get("amount")),
+                currency=parse_currency(request.form.get("currency"), base_currency),
+                category_id=categories.id_for(request.form.get("category")),
+                date=datetime.strptime(request.form.get("date"), "%Y-%m-%d").date(),
+                merchant_id=merchants.id_for(request.form.get("element")),
+                comment=request.form.get("comment"),
+                due_date=(
+                    datetime.strptime(due_date_str, "%Y-%m-%d").date()
+                    if due_date_str
+                    else None
+                ),
             )
 
-            db.session.commit()
-            flash("Expense updated successfully!", "success")
-            return redirect(url_for("expenses.expenses_list"))
+            # One UPDATE checks ownership and version and returns the replaced values
+            previous = db.session.execute(
+                update(Expense)
+                .where(*_scoped_write_criteria(id, user_id), _previous.id == Expense.id)
+                .values(**values, version=Expense.version + 1)
+                .returning(_previous.category_id, _previous.date, _previous.amount, _previous.currency,
+                           _previous.due_date)
+                .execution_options(synchronize_session=False)
+            ).first()
+
+            if previous is None:
+                db.session.rollback()
+                if _rejected_write_reason(id, user_id) == "forbidden":
+                    flash("You don't have permission to edit this expense", "danger")
+                    return redirect(url_for("expenses.expenses_list"))
+                flash("This expense was changed in another window. "
+                      "Review the current values and save again.", "warning")
+                status = 409
+            else:
+                # Move the old amount out of its budget period and the new one in, in one UPDATE
+                apply_budget_deltas(user_id, [
+                    (categories.name_for(previous.category_id), previous.date, -previous.amount,
+                     previous.currency),
+                    (request.form.get("category"), values["date"], values["amount"], values["currency"]),
+                ], base_currency)
+                apply_balance_delta(user_id, previous.date, -previous.amount, previous.currency,
+                                    base_currency, previous.due_date is not None)
+                apply_balance_delta(user_id, values["date"], values["amount"], values["currency"],
+                                    base_currency, values["due_date"] is not None)
+                invalidate_buckets(user_id, previous.date)
+                invalidate_buckets(user_id, values["date"])
+                bump_data_version(user_id)
+                record_changes(user_id, [id], UPSERT)
+
+                db.session.commit()
+                flash("Expense updated successfully!", "success")
+                return redirect(url_for("expenses.expenses_list"))
         except Exception as e:
             db.session.rollback()
             flash(f"Error updating expense: {str(e)}", "danger")
 
-    return render_template("edit_expense.html", expense=expense)
+    expense = Expense.query.get_or_404(id)
+
+    if expense.user_id != user_id:
+        flash("You don't have permission to edit this expense", "danger")
+        return redirect(url_for("expenses.expenses_list"))
+
+    attachments = Attachment.query.filter_by(user_id=user_id, expense_id=id).order_by(Attachment.id).all()
+    return render_template("edit_expense.html", expense=expense, attachments=attachments), status
 
 
 @expense_bp.route("/expenses/<int:id>/delete", methods=["POST"])
 @login_required
 def delete_expense(id):
     """Delete an expense"""
-    expense = Expense.query.get_or_404(id)
-
-    if expense.user_id != session.get("user_id"):
-        flash("You don't have permission to delete this expense", "danger")
-        return redirect(url_for("expenses.expenses_list"))
+    user_id = session.get("user_id")
 
     try:
-        db.session.delete(expense)
+        deleted = db.session.execute(
+            delete(Expense)
+            .where(*_scoped_write_criteria(id, user_id))
+            .returning(Expense.category_id, Expense.date, Expense.amount, Expense.currency, Expense.due_date)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if deleted is None:
+            db.session.rollback()
+            if _rejected_write_reason(id, user_id) == "forbidden":
+                flash("You don't have permission to delete this expense", "danger")
+            else:
+                flash("This expense was changed in another window and was not deleted. "
+                      "Review it and try again.", "warning")
+            return redirect(url_for("expenses.expenses_list"))
+
+        base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+        apply_budget_delta(user_id, categories.name_for(deleted.category_id), deleted.date, -deleted.amount,
+                           deleted.currency, base_currency)
+        apply_balance_delta(user_id, deleted.date, -deleted.amount, deleted.currency, base_currency,
+                            deleted.due_date is not None)
+        invalidate_buckets(user_id, deleted.date)
+        db.session.execute(delete(Attachment).where(Attachment.user_id == user_id, Attachment.expense_id == id))
+        bump_data_version(user_id)
+        record_changes(user_id, [id], DELETE)
         db.session.commit()
         flash("Expense deleted successfully", "success")
     except Exception as e:
@@ -128,67 +330,241 @@ def delete_expense(id):
     return redirect(url_for("expenses.expenses_list"))
 
 
+@expense_bp.route("/expenses/bulk", methods=["POST"])
+@login_required
+def bulk_expenses():
+    """Apply one action to many selected expenses in a single statement"""
+    user_id = session.get("user_id")
+    action = request.form.get("action")
+
+    try:
+        ids = sorted({int(i) for i in request.form.getlist("ids")})
+    except ValueError:
+        flash("Invalid selection", "danger")
+        return redirect(url_for("expenses.expenses_list"))
+
+    if not ids:
+        flash("Please select at least one expense", "warning")
+        return redirect(url_for("expenses.expenses_list"))
+
+    # Ownership is enforced by the WHERE clause; no rows are loaded into the session
+    owned = (
+        Expense.user_id == user_id,
+        Expense.id == any_(bindparam("ids", ids, type_=ARRAY(Integer))),
+    )
+
+    try:
+        if action == "delete":
+            stmt = delete(Expense).where(*owned)
+        elif action == "recategorize":
+            category = request.form.get("category")
+            if not category:
+                flash("Please enter a category", "warning")
+                return redirect(url_for("expenses.expenses_list"))
+            stmt = update(Expense).where(*owned).values(
+                category_id=categories.id_for(category), version=Expense.version + 1
+            )
+        elif action == "set_due_date":
+            due_date = datetime.strptime(request.form.get("due_date") or "", "%Y-%m-%d").date()
+            stmt = update(Expense).where(*owned).values(due_date=due_date, version=Expense.version + 1)
+        elif action == "clear_due_date":
+            stmt = update(Expense).where(*owned).values(due_date=None, version=Expense.version + 1)
+        else:
+            flash("Unknown bulk action", "danger")
+            return redirect(url_for("expenses.expenses_list"))
+
+        changed = db.session.execute(
+            stmt.returning(Expense.id, Expense.date).execution_options(synchronize_session=False)
+        ).all()
+        changed_ids = [row.id for row in changed]
+        affected = len(changed_ids)
+
+        if affected:
+            if action in ("delete", "recategorize"):
+                refresh_user_budgets(user_id)
+            days = [row.date for row in changed]
+            if action != "recategorize":
+                # Deletes change the totals and due dates the open debt
+                rebuild_balances(user_id, since=min(days))
+            if action in ("delete", "recategorize"):
+                invalidate_buckets(user_id, min(days), max(days))
+            if action == "delete":
+                db.session.execute(delete(Attachment).where(
+                    Attachment.user_id == user_id, Attachment.expense_id.in_(changed_ids)
+                ))
+            bump_data_version(user_id)
+            record_changes(user_id, changed_ids, DELETE if action == "delete" else UPSERT)
+        db.session.commit()
+        flash(f"{affected} expense(s) updated" if action != "delete"
+              else f"{affected} expense(s) deleted", "success")
+    except ValueError:
+        db.session.rollback()
+        flash("Invalid data format. Please check your inputs.", "danger")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error applying bulk action: {str(e)}", "danger")
+
+    return redirect(url_for("expenses.expenses_list"))
+
+
 @expense_bp.route("/debts")
 @login_required
+@read_only
+@etag_by_data_version
 def debts_list():
     """List all debts (expenses with a due date)"""
     user_id = session.get("user_id")
-    debts = (
-        Expense.query.filter(Expense.user_id == user_id, Expense.due_date.isnot(None))
-        .order_by(Expense.due_date.asc())
-        .all()
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+    today = datetime.utcnow().date()
+    # Lazy projection: rows are only fetched when the table fragment is not cached
+    debts = project_expenses(
+        Expense.user_id == user_id, Expense.due_date.isnot(None),
+        order_by=[Expense.due_date.asc()], today=today,
+    )
+    amount = converted_amount(base_currency)
+    is_overdue = Expense.due_date < today
+    total_debts, total_overdue, overdue_count, unconverted = (
+        join_rates(
+            db.session.query(
+                func.sum(amount),
+                func.sum(case((is_overdue, amount), else_=0)),
+                func.count(case((is_overdue, Expense.id))),
+                unconverted_count(base_currency),
+            ),
+            base_currency,
+        )
+        .filter(Expense.user_id == user_id, Expense.due_date.isnot(None))
+        .one()
     )
-
-    total_debts = sum(d.amount for d in debts)
-    overdue_debts = [d for d in debts if d.is_overdue]
-    total_overdue = sum(d.amount for d in overdue_debts)
 
     return render_template(
         "debts.html",
         debts=debts,
-        total_debts=total_debts,
-        overdue_count=len(overdue_debts),
-        total_overdue=total_overdue,
+        total_debts=total_debts or 0,
+        overdue_count=overdue_count,
+        total_overdue=total_overdue or 0,
+        unconverted=unconverted,
+        base_currency=base_currency,
+        data_version=get_data_version(user_id),
+        today=today,
     )
 
 
-@expense_bp.route("/summary")
-@login_required
-def summary():
-    """General summary of expenses and debts"""
-    user_id = session.get("user_id")
-
-    all_expenses = (
-        Expense.query.filter_by(user_id=user_id).order_by(Expense.date.desc()).all()
-    )
-
-    debts = [e for e in all_expenses if e.is_debt]
-    paid_expenses = [e for e in all_expenses if not e.is_debt]
+def _summary_aggregates(criteria, base_currency):
+    """Per-category, per-month and paid/debt totals, and the unconvertible row count, computed in SQL"""
+    # Amounts are converted into the base currency inside the aggregates
+    amount = converted_amount(base_currency)
 
     categories_data = (
-        db.session.query(
-            Expense.category,
-            func.sum(Expense.amount).label("total"),
-            func.count(Expense.id).label("count"),
+        join_rates(
+            db.session.query(
+                Expense.category_id,
+                func.sum(amount).label("total"),
+                func.count(Expense.id).label("count"),
+            ),
+            base_currency,
         )
-        .filter_by(user_id=user_id)
-        .group_by(Expense.category)
+        .filter(*criteria)
+        .group_by(Expense.category_id)
         .all()
     )
 
     monthly_data = (
-        db.session.query(
-            func.to_char(func.date_trunc('month', Expense.date), 'YYYY-MM').label('month'),
-            func.sum(Expense.amount).label('total'),
+        join_rates(
+            db.session.query(
+                func.to_char(func.date_trunc('month', Expense.date), 'YYYY-MM').label('month'),
+                func.sum(amount).label('total'),
+            ),
+            base_currency,
         )
-        .filter_by(user_id=user_id)
+        .filter(*criteria)
         .group_by("month")
         .order_by("month")
         .all()
     )
 
-    total_paid = sum(e.amount for e in paid_expenses)
-    total_debts = sum(d.amount for d in debts)
+    total_paid, total_debts, unconverted = (
+        join_rates(
+            db.session.query(
+                func.sum(case((Expense.due_date.is_(None), amount), else_=0)),
+                func.sum(case((Expense.due_date.isnot(None), amount), else_=0)),
+                unconverted_count(base_currency),
+            ),
+            base_currency,
+        )
+        .filter(*criteria)
+        .one()
+    )
+    return categories_data, monthly_data, total_paid or 0, total_debts or 0, unconverted
+
+
+def _snapshot_aggregates(user_id, year):
+    """The same totals as _summary_aggregates, from the user's columnar snapshot"""
+    return summarize(load_snapshot(user_id), year)
+
+
+def _merge_archived_categories(rows, archived):
+    """Add archived {category_id: (total, count)} onto live per-category rows.
+
+    Both sides are keyed by category id; names are only looked up for the
+    merged result.
+    """
+    merged = {r.category_id: [r.total or 0, r.count] for r in rows}
+    for category_id, (total, count) in archived.items():
+        entry = merged.setdefault(category_id, [0, 0])
+        entry[0] += total
+        entry[1] += count
+    names = categories.names_for(merged)
+    return sorted(
+        ({"category": names[i], "total": total, "count": count} for i, (total, count) in merged.items()),
+        key=lambda r: r["category"],
+    )
+
+
+def _merge_archived_months(rows, archived):
+    """Add archived {month: total} onto live per-month rows"""
+    merged = {r.month: r.total or 0 for r in rows}
+    for month, total in archived.items():
+        merged[month] = merged.get(month, 0) + total
+    return [{"month": month, "total": merged[month]} for month in sorted(merged)]
+
+
+@expense_bp.route("/summary")
+@login_required
+@read_only
+@etag_by_data_version
+def summary():
+    """General summary of expenses and debts, optionally for a single year"""
+    user_id = session.get("user_id")
+    base_currency = session.get("base_currency", DEFAULT_CURRENCY)
+    year = request.args.get("year", type=int)
+    criteria = [Expense.user_id == user_id]
+    if year:
+        criteria.extend(year_predicates(Expense.date, year))
+
+    # Aggregates come from the user's columnar snapshot unless ANALYTICS_SNAPSHOTS is off
+    if snapshots_enabled():
+        aggregates = partial(_snapshot_aggregates, user_id, year)
+    else:
+        aggregates = partial(_summary_aggregates, criteria, base_currency)
+
+    # Archived expenses are never debts and only survive as monthly totals
+    all_expenses, aggregates, archived_categories, archived_months = gather(
+        lambda: list(project_expenses(*criteria, order_by=[Expense.date.desc()])),
+        aggregates,
+        partial(archived_by_category, user_id, base_currency, year),
+        partial(archived_by_month, user_id, base_currency, year),
+    )
+    categories_data, monthly_data, total_paid, total_debts, unconverted = aggregates
+    archived_total = sum(total for total, _ in archived_categories.values())
+    archived_count = sum(count for _, count in archived_categories.values())
+
+    debts = [e for e in all_expenses if e.is_debt]
+    paid_expenses = [e for e in all_expenses if not e.is_debt]
+
+    total_paid += archived_total
+    categories_data = _merge_archived_categories(categories_data, archived_categories)
+    monthly_data = _merge_archived_months(monthly_data, archived_months)
     grand_total = total_paid + total_debts
 
     return render_template(
@@ -200,4 +576,8 @@ def summary():
         total_paid=total_paid,
         total_debts=total_debts,
         grand_total=grand_total,
+        base_currency=base_currency,
+        year=year,
+        archived_count=archived_count,
+        unconverted=unconverted,
     )
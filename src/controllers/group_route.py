@@ -0,0 +1,195 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort, jsonify
+from datetime import datetime
+from sqlalchemy import select
+from models import db, ExpenseGroup, GroupMember, SharedExpense
+from utils.decorators import login_required, read_only
+from utils.fx import DEFAULT_CURRENCY, parse_currency
+from utils.ledger import add_shared_expense, remove_shared_expense, settle, split_evenly
+from utils.sharding import user_id_for
+
+group_bp = Blueprint("groups", __name__)
+
+
+def _group_or_404(id):
+    """The group with its members, if the current user belongs to it"""
+    group = db.session.get(ExpenseGroup, id)
+    if group is None:
+        abort(404)
+    members = (
+        GroupMember.query.filter_by(group_id=id).order_by(GroupMember.username.asc()).all()
+    )
+    if session.get("user_id") not in {m.user_id for m in members}:
+        abort(404)
+    return group, members
+
+
+def _settlement(members):
+    names = {m.user_id: m.username for m in members}
+    transfers = settle({m.user_id: m.balance for m in members})
+    return [{"from": names[debtor], "to": names[creditor], "amount": amount}
+            for debtor, creditor, amount in transfers]
+
+
+@group_bp.route("/groups", methods=["GET", "POST"])
+@login_required
+def groups_list():
+    """List the user's groups and create new ones"""
+    user_id = session.get("user_id")
+
+    if request.method == "POST":
+        name = (request.form.get("name") or "").strip()
+        usernames = {u.strip() for u in (request.form.get("members") or "").split(",") if u.strip()}
+        if not name:
+            flash("Please fill in all required fields", "warning")
+            return redirect(url_for("groups.groups_list"))
+
+        try:
+            currency = parse_currency(request.form.get("currency"), session.get("base_currency", DEFAULT_CURRENCY))
+            members = {user_id: session.get("username")}
+            for username in usernames - {session.get("username")}:
+                member_id = user_id_for(username)
+                if member_id is None:
+                    flash(f"Unknown user: {username}", "warning")
+                    return redirect(url_for("groups.groups_list"))
+                members[member_id] = username
+
+            group = ExpenseGroup(name=name, currency=currency, created_by=user_id)
+            db.session.add(group)
+            db.session.flush()
+            db.session.add_all(
+                GroupMember(group_id=group.id, user_id=member_id, username=username)
+                for member_id, username in members.items()
+            )
+            db.session.commit()
+            flash("Group created successfully!", "success")
+            return redirect(url_for("groups.group_detail", id=group.id))
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error creating group: {str(e)}", "danger")
+        return redirect(url_for("groups.groups_list"))
+
+    groups = db.session.execute(
+        select(ExpenseGroup, GroupMember.balance)
+        .join(GroupMember, GroupMember.group_id == ExpenseGroup.id)
+        .where(GroupMember.user_id == user_id)
+        .order_by(ExpenseGroup.name.asc())
+    ).all()
+    return render_template("groups.html", groups=groups)
+
+
+@group_bp.route("/groups/<int:id>")
+@login_required
+@read_only
+def group_detail(id):
+    """Show a group's balances, who owes whom and its recent ledger"""
+    group, members = _group_or_404(id)
+    entries = (
+        SharedExpense.query.filter_by(group_id=id)
+        .order_by(SharedExpense.date.desc(), SharedExpense.id.desc())
+        .limit(50)
+        .all()
+    )
+    return render_template(
+        "group.html",
+        group=group,
+        members=members,
+        names={m.user_id: m.username for m in members},
+        transfers=_settlement(members),
+        entries=entries,
+        today=datetime.utcnow().date(),
+    )
+
+
+@group_bp.route("/groups/<int:id>/expenses", methods=["POST"])
+@login_required
+def add_group_expense(id):
+    """Split an expense paid by one member evenly between the chosen members"""
+    group, members = _group_or_404(id)
+    member_ids = {m.user_id for m in members}
+
+    try:
+        name = (request.form.get("name") or "").strip()
+        amount = float(request.form.get("amount") or 0)
+        day = datetime.strptime(request.form.get("date"), "%Y-%m-%d").date()
+        paid_by = request.form.get("paid_by", type=int, default=session.get("user_id"))
+        participants = sorted(int(p) for p in request.form.getlist("participants")) or sorted(member_ids)
+        if not name or amount <= 0:
+            flash("Please fill in all required fields", "warning")
+        elif paid_by not in member_ids or not member_ids.issuperset(participants):
+            flash("Only group members can share an expense", "warning")
+        else:
+            add_shared_expense(group.id, paid_by, name, amount, day, split_evenly(amount, participants))
+            db.session.commit()
+            flash("Shared expense added successfully!", "success")
+    except (TypeError, ValueError):
+        db.session.rollback()
+        flash("Invalid data format. Please check your inputs.", "danger")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error adding shared expense: {str(e)}", "danger")
+
+    return redirect(url_for("groups.group_detail", id=id))
+
+
+@group_bp.route("/groups/<int:id>/payments", methods=["POST"])
+@login_required
+def record_payment(id):
+    """Record one member paying another back"""
+    group, members = _group_or_404(id)
+    names = {m.user_id: m.username for m in members}
+
+    try:
+        payer = request.form.get("from_user", type=int)
+        payee = request.form.get("to_user", type=int)
+        amount = float(request.form.get("amount") or 0)
+        if payer not in names or payee not in names or payer == payee or amount <= 0:
+            flash("Please pick two different members and a positive amount", "warning")
+        else:
+            add_shared_expense(group.id, payer, f"{names[payer]} paid {names[payee]}", amount,
+                               datetime.utcnow().date(), {payee: amount}, kind="payment")
+            db.session.commit()
+            flash("Payment recorded successfully!", "success")
+    except ValueError:
+        db.session.rollback()
+        flash("Invalid data format. Please check your inputs.", "danger")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error recording payment: {str(e)}", "danger")
+
+    return redirect(url_for("groups.group_detail", id=id))
+
+
+@group_bp.route("/groups/<int:id>/entries/<int:entry_id>/delete", methods=["POST"])
+@login_required
+def delete_group_entry(id, entry_id):
+    """Delete a ledger entry and reverse its effect on the balances"""
+    _group_or_404(id)
+    entry = db.session.get(SharedExpense, entry_id)
+    if entry is None or entry.group_id != id:
+        abort(404)
+
+    try:
+        remove_shared_expense(entry)
+        db.session.commit()
+        flash("Entry deleted successfully", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error deleting entry: {str(e)}", "danger")
+
+    return redirect(url_for("groups.group_detail", id=id))
+
+
+@group_bp.route("/api/groups/<int:id>/settlement")
+@login_required
+@read_only
+def group_settlement(id):
+    """Net balances of a group and the transfers that settle them"""
+    group, members = _group_or_404(id)
+    return jsonify(
+        currency=group.currency,
+        balances={m.username: round(m.balance, 2) for m in members},
+        transfers=_settlement(members),
+    )
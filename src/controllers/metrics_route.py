@@ -0,0 +1,12 @@
+from flask import Blueprint
+from utils.decorators import admin_required
+from utils.metrics import render_prometheus
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+@admin_required
+def metrics():
+    """In-process metrics in the Prometheus text format"""
+    return render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
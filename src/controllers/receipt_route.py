@@ -0,0 +1,97 @@
+import os
+from flask import Blueprint, request, redirect, url_for, flash, session, abort, send_file
+from sqlalchemy import select
+from models import db, Attachment, Expense
+from utils.decorators import login_required, read_only
+from utils.receipts import ALLOWED_TYPES, ReceiptTooLarge, blob_path, store_blob
+
+receipt_bp = Blueprint("receipts", __name__)
+
+
+def _owned_attachment(id):
+    attachment = db.session.get(Attachment, id)
+    if attachment is None or attachment.user_id != session.get("user_id"):
+        abort(404)
+    return attachment
+
+
+@receipt_bp.route("/expenses/<int:id>/receipts", methods=["POST"])
+@login_required
+def upload_receipt(id):
+    """Attach an uploaded receipt to an expense, storing its bytes once per content"""
+    user_id = session.get("user_id")
+    owner_id = db.session.scalar(select(Expense.user_id).where(Expense.id == id))
+    if owner_id is None:
+        abort(404)
+    if owner_id != user_id:
+        flash("You don't have permission to edit this expense", "danger")
+        return redirect(url_for("expenses.expenses_list"))
+
+    upload = request.files.get("receipt")
+    if upload is None or not upload.filename:
+        flash("Please choose a file to upload", "warning")
+    elif upload.mimetype not in ALLOWED_TYPES:
+        flash("Receipts must be images or PDF files", "warning")
+    else:
+        try:
+            # Werkzeug spools large multipart parts to disk; this copies them on in chunks
+            sha256, size = store_blob(upload.stream)
+            db.session.add(Attachment(
+                user_id=user_id, expense_id=id, sha256=sha256, filename=upload.filename[:255],
+                content_type=upload.mimetype, size=size,
+            ))
+            db.session.commit()
+            flash("Receipt attached successfully!", "success")
+        except ReceiptTooLarge as e:
+            flash(str(e), "warning")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error attaching receipt: {str(e)}", "danger")
+
+    return redirect(url_for("expenses.edit_expense", id=id))
+
+
+@receipt_bp.route("/receipts/<int:id>")
+@login_required
+@read_only
+def download_receipt(id):
+    """Serve a receipt straight from disk, with conditional and range requests"""
+    attachment = _owned_attachment(id)
+    path = blob_path(attachment.sha256)
+    if not os.path.exists(path):
+        abort(404)
+
+    # send_file hands the open file to the server's file wrapper (sendfile where
+    # available) and answers Range requests with 206 partial content
+    response = send_file(
+        path,
+        mimetype=attachment.content_type,
+        download_name=attachment.filename,
+        as_attachment=request.args.get("download") == "1",
+        conditional=True,
+        etag=attachment.sha256,
+        max_age=86400,
+    )
+    # Receipts are personal: browsers may keep them, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+@receipt_bp.route("/receipts/<int:id>/delete", methods=["POST"])
+@login_required
+def delete_receipt(id):
+    """Detach a receipt; its blob is removed by `flask receipts gc` once unreferenced"""
+    attachment = _owned_attachment(id)
+    expense_id = attachment.expense_id
+
+    try:
+        db.session.delete(attachment)
+        db.session.commit()
+        flash("Receipt removed", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error removing receipt: {str(e)}", "danger")
+
+    return redirect(url_for("expenses.edit_expense", id=expense_id))
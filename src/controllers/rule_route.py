@@ -0,0 +1,57 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from sqlalchemy.exc import IntegrityError
+from models import db, CategoryRule
+from utils.decorators import login_required
+
+rule_bp = Blueprint("rules", __name__)
+
+
+@rule_bp.route("/rules", methods=["GET", "POST"])
+@login_required
+def rules_list():
+    """List categorization rules and create new ones"""
+    user_id = session.get("user_id")
+
+    if request.method == "POST":
+        keyword = (request.form.get("keyword") or "").strip().lower()
+        category = (request.form.get("category") or "").strip()
+
+        if not keyword or not category:
+            flash("Please fill in all required fields", "warning")
+            return redirect(url_for("rules.rules_list"))
+
+        try:
+            db.session.add(CategoryRule(user_id=user_id, keyword=keyword, category=category))
+            db.session.commit()
+            flash("Rule created successfully!", "success")
+        except IntegrityError:
+            db.session.rollback()
+            flash("A rule for this keyword already exists", "warning")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"Error creating rule: {str(e)}", "danger")
+        return redirect(url_for("rules.rules_list"))
+
+    rules = CategoryRule.query.filter_by(user_id=user_id).order_by(CategoryRule.keyword.asc()).all()
+    return render_template("rules.html", rules=rules)
+
+
+@rule_bp.route("/rules/<int:id>/delete", methods=["POST"])
+@login_required
+def delete_rule(id):
+    """Delete a categorization rule"""
+    rule = CategoryRule.query.get_or_404(id)
+
+    if rule.user_id != session.get("user_id"):
+        flash("You don't have permission to delete this rule", "danger")
+        return redirect(url_for("rules.rules_list"))
+
+    try:
+        db.session.delete(rule)
+        db.session.commit()
+        flash("Rule deleted successfully", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error deleting rule: {str(e)}", "danger")
+
+    return redirect(url_for("rules.rules_list"))
@@ -0,0 +1,75 @@
+from flask import Blueprint, current_app, jsonify, request, session
+from models import db
+from utils.balances import rebuild_balances
+from utils.budgets import refresh_user_budgets
+from utils.changelog import DELETE, UPSERT, SyncConflict, apply_client_changes, changes_since
+from utils.data_version import bump_data_version
+from utils.decorators import login_required
+from utils.fx import DEFAULT_CURRENCY
+from utils.timeseries import invalidate_buckets
+
+sync_bp = Blueprint("sync", __name__)
+
+
+def _invalid_change(change):
+    """Why an uploaded change is malformed, or None when its shape is fine"""
+    if not isinstance(change, dict):
+        return "each change must be an object"
+    if change.get("op") not in (UPSERT, DELETE):
+        return f"op must be {UPSERT!r} or {DELETE!r}"
+    for key in ("id", "version"):
+        value = change.get(key)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f"{key} must be an integer"
+    return None
+
+
+@sync_bp.route("/sync", methods=["GET"])
+@login_required
+def pull():
+    """Changes since a cursor, in batches; clients repeat while has_more is true"""
+    user_id = session.get("user_id")
+    cursor = request.args.get("since", default=0, type=int)
+    limit = min(
+        request.args.get("limit", default=current_app.config["SYNC_BATCH_SIZE"], type=int),
+        current_app.config["SYNC_BATCH_SIZE"],
+    )
+
+    changes, next_cursor, has_more = changes_since(user_id, cursor, max(1, limit))
+    return jsonify(changes=changes, cursor=next_cursor, has_more=has_more)
+
+
+@sync_bp.route("/sync", methods=["POST"])
+@login_required
+def push():
+    """Apply a batch of client changes in one transaction, all or nothing"""
+    user_id = session.get("user_id")
+    payload = request.get_json(silent=True)
+    changes = payload.get("changes") if isinstance(payload, dict) else None
+    if not isinstance(changes, list) or not changes:
+        return jsonify(error="Expected a non-empty list of changes"), 400
+    if len(changes) > current_app.config["SYNC_MAX_UPLOAD"]:
+        return jsonify(error="Too many changes in one batch"), 413
+    for change in changes:
+        problem = _invalid_change(change)
+        if problem:
+            return jsonify(error=f"Invalid change: {problem}"), 400
+
+    try:
+        created, changed = apply_client_changes(
+            user_id, changes, session.get("base_currency", DEFAULT_CURRENCY)
+        )
+        if changed:
+            refresh_user_budgets(user_id)
+            rebuild_balances(user_id)
+            invalidate_buckets(user_id)
+            bump_data_version(user_id)
+        db.session.commit()
+    except SyncConflict as e:
+        db.session.rollback()
+        return jsonify(error="Some expenses changed on the server", conflicts=e.ids), 409
+    except (KeyError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify(error=f"Invalid change: {e}"), 400
+
+    return jsonify(created=created)
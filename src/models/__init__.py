@@ -1,6 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
+from .routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 from .user import User
+from .category import Category
+from .merchant import Merchant
 from .expense import Expense
+from .budget import Budget
+from .fx_rate import FxRate
+from .archived_expense import ArchivedExpense
+from .expense_monthly_total import ExpenseMonthlyTotal
+from .platform_stats import PlatformStats
+from .expense_change import ExpenseChange
+from .category_rule import CategoryRule
+from .debt_reminder import DebtReminder
+from .shard_directory import ShardDirectory
+from .daily_balance import DailyBalance
+from .timeseries_bucket import TimeseriesBucket
+from .expense_group import ExpenseGroup
+from .group_member import GroupMember
+from .shared_expense import SharedExpense
+from .expense_split import ExpenseSplit
+from .attachment import Attachment
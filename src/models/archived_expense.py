@@ -0,0 +1,25 @@
+from datetime import datetime
+from . import db
+
+
+class ArchivedExpense(db.Model):
+    """Cold copy of an expense moved out of the live table by the archive command"""
+
+    __tablename__ = "expenses_archive"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    due_date = db.Column(db.Date, nullable=True)
+    merchant_id = db.Column(db.Integer, db.ForeignKey("merchants.id"), nullable=True)
+    comment = db.Column(db.Text, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ArchivedExpense {self.name} - ${self.amount}>"
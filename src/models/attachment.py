@@ -0,0 +1,28 @@
+from datetime import datetime
+from . import db
+
+
+class Attachment(db.Model):
+    """A receipt file attached to an expense.
+
+    The bytes live on disk under their SHA-256 (see utils/receipts.py), so
+    identical receipts share one blob; rows only reference it.
+    """
+
+    __tablename__ = "attachments"
+    __table_args__ = (
+        db.Index("ix_attachments_user_expense", "user_id", "expense_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    # No foreign key: expenses are partitioned by date and may move to the archive
+    expense_id = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Attachment {self.filename} ({self.sha256[:12]})>"
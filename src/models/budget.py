@@ -0,0 +1,38 @@
+from datetime import datetime
+from . import db
+
+
+class Budget(db.Model):
+    __tablename__ = "budgets"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "category", "period", name="uq_budget_user_category_period"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    category = db.Column(db.String(50), nullable=False)
+    period = db.Column(db.String(10), nullable=False, default="monthly")
+    limit_amount = db.Column(db.Float, nullable=False)
+
+    # Running state for the current period, maintained incrementally on writes
+    period_start = db.Column(db.Date, nullable=False)
+    period_end = db.Column(db.Date, nullable=False)  # Exclusive
+    spent = db.Column(db.Float, nullable=False, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def remaining(self):
+        return self.limit_amount - self.spent
+
+    @property
+    def is_over_budget(self):
+        return self.spent > self.limit_amount
+
+    @property
+    def usage_percent(self):
+        if not self.limit_amount:
+            return 0
+        return round(self.spent / self.limit_amount * 100)
+
+    def __repr__(self):
+        return f"<Budget {self.category} ({self.period}) - ${self.spent}/${self.limit_amount}>"
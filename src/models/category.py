@@ -0,0 +1,13 @@
+from . import db
+
+
+class Category(db.Model):
+    """Distinct category name; expenses reference it by a small integer id"""
+
+    __tablename__ = "categories"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Category {self.name}>"
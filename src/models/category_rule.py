@@ -0,0 +1,18 @@
+from datetime import datetime
+from . import db
+
+
+class CategoryRule(db.Model):
+    """Per-user rule assigning `category` to expenses whose name or item contains `keyword`"""
+
+    __tablename__ = "category_rules"
+    __table_args__ = (db.UniqueConstraint("user_id", "keyword", name="uq_category_rules_user_keyword"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    keyword = db.Column(db.String(100), nullable=False)  # Stored lowercase
+    category = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CategoryRule {self.keyword} -> {self.category}>"
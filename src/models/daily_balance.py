@@ -0,0 +1,17 @@
+from . import db
+
+
+class DailyBalance(db.Model):
+    """Per-user running totals for each day with expenses, in the user's base currency"""
+
+    __tablename__ = "daily_balances"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    daily_total = db.Column(db.Float, nullable=False, default=0.0)
+    # Running sums over every day up to and including this one
+    cumulative_total = db.Column(db.Float, nullable=False, default=0.0)
+    open_debt = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<DailyBalance {self.user_id} {self.day} {self.cumulative_total}>"
@@ -0,0 +1,27 @@
+from datetime import datetime
+from . import db
+
+
+class DebtReminder(db.Model):
+    """Outbox of debt reminders; rows are written once per debt, due date and kind"""
+
+    __tablename__ = "debt_reminders"
+    __table_args__ = (
+        db.UniqueConstraint("expense_id", "due_date", "kind", name="uq_debt_reminders_expense_due_kind"),
+        # Delivery only ever scans the rows still waiting to be sent
+        db.Index("ix_debt_reminders_pending", "id", postgresql_where=db.text("sent_at IS NULL")),
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    expense_id = db.Column(db.Integer, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(8), nullable=False)  # "due_soon" or "overdue"
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f"<DebtReminder {self.kind} {self.expense_id} {self.due_date}>"
@@ -1,20 +1,76 @@
 from datetime import datetime
+from sqlalchemy import DDL, PrimaryKeyConstraint, event, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
 from . import db
+from .category import Category
+from .merchant import Merchant
 
 
 class Expense(db.Model):
     __tablename__ = "expenses"
+    # On Postgres the table is range-partitioned by date (see utils/partitioning.py).
+    # Partitioned tables need the partition key in the primary key, so there the
+    # table key is emitted as (id, date) (see _partitioned_primary_key below); the
+    # model and every other database key rows by id alone.
+    __table_args__ = (
+        db.Index("ix_expenses_user_date", "user_id", "date"),
+        # Only debts carry a due date; the reminder job walks them in (due_date, id) order
+        db.Index("ix_expenses_due_date", "due_date", "id", postgresql_where=db.text("due_date IS NOT NULL")),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(100), nullable=False)
     amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default="USD", server_default="USD")
+    # Small integer keys into the lookup tables instead of repeated strings
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), nullable=False)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     due_date = db.Column(db.Date, nullable=True)
-    element = db.Column(db.String(100), nullable=True)
+    merchant_id = db.Column(db.Integer, db.ForeignKey("merchants.id"), nullable=True)
     comment = db.Column(db.Text, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Incremented on every write; edits and deletes send it back for optimistic locking
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    # Names resolve through the per-process lookup caches. In queries they become
+    # correlated subqueries; hot paths select and group by the ids instead. New
+    # names set here are inserted in the session's own transaction.
+    @hybrid_property
+    def category(self):
+        from utils.lookups import categories
+
+        return categories.name_for(self.category_id)
+
+    @category.inplace.setter
+    def _category_setter(self, name):
+        from utils.lookups import categories
+
+        self.category_id = categories.id_in_session(name)
+
+    @category.inplace.expression
+    @classmethod
+    def _category_expression(cls):
+        return select(Category.name).where(Category.id == cls.category_id).scalar_subquery()
+
+    @hybrid_property
+    def element(self):
+        from utils.lookups import merchants
+
+        return merchants.name_for(self.merchant_id)
+
+    @element.inplace.setter
+    def _element_setter(self, name):
+        from utils.lookups import merchants
+
+        self.merchant_id = merchants.id_in_session(name)
+
+    @element.inplace.expression
+    @classmethod
+    def _element_expression(cls):
+        return select(Merchant.name).where(Merchant.id == cls.merchant_id).scalar_subquery()
 
     @property
     def is_debt(self):
@@ -33,3 +89,20 @@ class Expense(db.Model):
 
     def __repr__(self):
         return f"<Expense {self.name} - ${self.amount}>"
+
+
+# Rows outside every yearly partition land here until a partition is created for them
+event.listen(
+    Expense.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS expenses_default PARTITION OF expenses DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _partitioned_primary_key(constraint, compiler, **kw):
+    if constraint.table is Expense.__table__:
+        return "PRIMARY KEY (id, date)"
+    return compiler.visit_primary_key_constraint(constraint, **kw)
@@ -0,0 +1,18 @@
+from datetime import datetime
+from . import db
+
+
+class ExpenseChange(db.Model):
+    """Append-only log of expense writes; `seq` is the cursor handed to sync clients"""
+
+    __tablename__ = "expense_changes"
+    __table_args__ = (db.Index("ix_expense_changes_user_seq", "user_id", "seq"),)
+
+    seq = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    expense_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(6), nullable=False)  # "upsert" or "delete"
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ExpenseChange {self.seq} {self.op} {self.expense_id}>"
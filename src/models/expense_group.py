@@ -0,0 +1,19 @@
+from datetime import datetime
+from . import db
+
+
+class ExpenseGroup(db.Model):
+    """A set of users sharing expenses in one currency"""
+
+    __tablename__ = "expense_groups"
+    # Members may live on different shards, so groups and their ledger stay on the primary
+    __table_args__ = {"info": {"global": True}}
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default="USD", server_default="USD")
+    created_by = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ExpenseGroup {self.name}>"
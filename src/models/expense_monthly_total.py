@@ -0,0 +1,20 @@
+from . import db
+
+
+class ExpenseMonthlyTotal(db.Model):
+    """Pre-aggregated totals of archived expenses per user, month, category and currency"""
+
+    __tablename__ = "expense_monthly_totals"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)  # First day of the month
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"), primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Total converted with the daily rates at archive time
+    base_currency = db.Column(db.String(3), nullable=False)
+    base_total = db.Column(db.Float, nullable=True)
+
+    def __repr__(self):
+        return f"<ExpenseMonthlyTotal {self.user_id} {self.month} {self.category_id} {self.total}>"
@@ -0,0 +1,16 @@
+from . import db
+
+
+class ExpenseSplit(db.Model):
+    """The share of a shared expense one member owes"""
+
+    __tablename__ = "expense_splits"
+    __table_args__ = {"info": {"global": True}}
+
+    shared_expense_id = db.Column(db.Integer, db.ForeignKey("shared_expenses.id", ondelete="CASCADE"),
+                                  primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    share = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<ExpenseSplit {self.user_id}: {self.share}>"
@@ -0,0 +1,13 @@
+from . import db
+
+
+class FxRate(db.Model):
+    __tablename__ = "fx_rates"
+
+    # Value of one unit of `currency` expressed in the pivot currency on `rate_date`
+    currency = db.Column(db.String(3), primary_key=True)
+    rate_date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f"<FxRate {self.currency} {self.rate_date} {self.rate}>"
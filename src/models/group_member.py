@@ -0,0 +1,18 @@
+from . import db
+
+
+class GroupMember(db.Model):
+    """A user's membership of a group and their net balance in it"""
+
+    __tablename__ = "group_members"
+    __table_args__ = {"info": {"global": True}}
+
+    group_id = db.Column(db.Integer, db.ForeignKey("expense_groups.id", ondelete="CASCADE"), primary_key=True)
+    # No foreign key: users may live on another shard
+    user_id = db.Column(db.Integer, primary_key=True, index=True)
+    username = db.Column(db.String(80), nullable=False)
+    # What the group owes this member (negative: what they owe), maintained incrementally on writes
+    balance = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+
+    def __repr__(self):
+        return f"<GroupMember {self.username} in {self.group_id}: {self.balance}>"
@@ -0,0 +1,13 @@
+from . import db
+
+
+class Merchant(db.Model):
+    """Distinct merchant (the expense "item"); expenses reference it by id"""
+
+    __tablename__ = "merchants"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"<Merchant {self.name}>"
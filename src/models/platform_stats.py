@@ -0,0 +1,20 @@
+from datetime import datetime
+from . import db
+
+
+class PlatformStats(db.Model):
+    """Precomputed cross-user analytics, refreshed on a schedule by `flask analytics refresh`"""
+
+    __tablename__ = "platform_stats"
+    # Platform-wide, so it stays on the primary even when users are sharded
+    __table_args__ = {"info": {"global": True}}
+
+    id = db.Column(db.Integer, primary_key=True)
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    currency = db.Column(db.String(3), nullable=False)
+    shards = db.Column(db.Integer, nullable=False)
+    duration_ms = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+
+    def __repr__(self):
+        return f"<PlatformStats {self.computed_at}>"
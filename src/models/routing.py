@@ -0,0 +1,94 @@
+import random
+import time
+from flask import g, has_app_context, has_request_context, current_app, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.dml import UpdateBase
+from utils.metrics import increment
+
+# Shard key of the primary database, which also holds the global tables
+DEFAULT_SHARD = "default"
+
+
+def init_replicas(app):
+    """Create one engine per URL in SQLALCHEMY_REPLICA_URIS"""
+    app.extensions["db_replicas"] = {
+        f"replica_{i}": create_engine(url, pool_pre_ping=True)
+        for i, url in enumerate(app.config.get("SQLALCHEMY_REPLICA_URIS") or ())
+    }
+
+
+def _replicas():
+    return current_app.extensions.get("db_replicas") or {}
+
+
+def _is_global(mapper, clause):
+    """True for statements on tables marked info={"global": True}, which only live on the primary"""
+    table = mapper.local_table if mapper is not None else getattr(clause, "table", None)
+    return table is not None and table.info.get("global", False)
+
+
+def _shard_engine(mapper, clause):
+    """Engine of the shard bound with utils.sharding, or None to use the primary"""
+    key = g.get("shard_key")
+    if key is None or key == DEFAULT_SHARD or _is_global(mapper, clause):
+        return None
+    increment("db_route_total", target=key, reason="shard")
+    return current_app.extensions["db_shards"][key]
+
+
+class RoutingSession(Session):
+    """Session sending reads of @read_only views to a replica and everything else to the primary.
+
+    Flushes and INSERT/UPDATE/DELETE statements always use the primary. After a
+    request commits a write, the user's reads stay on the primary for
+    REPLICA_STICKY_SECONDS so they see their own changes despite replica lag.
+    When a non-default shard is bound (g.shard_key), every statement except
+    those on global tables goes to that shard instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wrote = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            shard = _shard_engine(mapper, clause)
+            if shard is not None:
+                return shard
+        if bind is None and has_request_context():
+            key, reason = self._route(clause)
+            increment("db_route_total", target=key or "primary", reason=reason)
+            if key is not None:
+                return _replicas()[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _route(self, clause):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._wrote = True
+            return None, "write"
+        if not g.get("read_only"):
+            return None, "default"
+        if http_session.get("primary_until", 0) > time.time():
+            return None, "sticky"
+
+        if "replica_key" not in g:
+            replicas = list(_replicas())
+            g.replica_key = random.choice(replicas) if replicas else None
+        if g.replica_key is None:
+            return None, "no_replica"
+        return g.replica_key, "read_only"
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if session._wrote and has_request_context() and _replicas():
+        http_session["primary_until"] = time.time() + current_app.config.get(
+            "REPLICA_STICKY_SECONDS", 5
+        )
+    session._wrote = False
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    session._wrote = False
@@ -0,0 +1,21 @@
+from . import db
+
+
+class ShardDirectory(db.Model):
+    """Global map of users to the database shard holding their rows.
+
+    Lives on the primary only. Its id sequence hands out user ids for every
+    shard, and logins resolve usernames here before touching any shard.
+    """
+
+    __tablename__ = "shard_directory"
+    __table_args__ = {"info": {"global": True}}
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    shard = db.Column(db.String(32), nullable=False, default="default", server_default="default")
+    # Set while the rebalancer copies the user's rows; their requests get a 503
+    moving = db.Column(db.Boolean, nullable=False, default=False, server_default="false")
+
+    def __repr__(self):
+        return f"<ShardDirectory {self.username} -> {self.shard}>"
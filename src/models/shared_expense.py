@@ -0,0 +1,25 @@
+from datetime import datetime
+from . import db
+
+
+class SharedExpense(db.Model):
+    """One ledger entry of a group: an expense paid for others, or a repayment"""
+
+    __tablename__ = "shared_expenses"
+    __table_args__ = {"info": {"global": True}}
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey("expense_groups.id", ondelete="CASCADE"),
+                         nullable=False, index=True)
+    paid_by = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(8), nullable=False, default="expense")  # "expense" or "payment"
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    splits = db.relationship("ExpenseSplit", lazy="selectin", cascade="all, delete-orphan",
+                             passive_deletes=True)
+
+    def __repr__(self):
+        return f"<SharedExpense {self.name} - {self.amount}>"
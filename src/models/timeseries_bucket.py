@@ -0,0 +1,21 @@
+from . import db
+
+
+class TimeseriesBucket(db.Model):
+    """Cached spend of one fully closed chart bucket, per category id, in one currency.
+
+    Closed periods never change unless a backdated expense lands in them, so rows
+    stay until such a write deletes them.
+    """
+
+    __tablename__ = "timeseries_buckets"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    granularity = db.Column(db.String(5), primary_key=True)  # day, week, month or year
+    currency = db.Column(db.String(3), primary_key=True)
+    bucket_start = db.Column(db.Date, primary_key=True)
+    bucket_end = db.Column(db.Date, nullable=False)  # Exclusive
+    totals = db.Column(db.JSON, nullable=False)  # {"<category id>": total}; {} when nothing was spent
+
+    def __repr__(self):
+        return f"<TimeseriesBucket {self.user_id} {self.granularity} {self.bucket_start}>"
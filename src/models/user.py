@@ -10,6 +10,9 @@ class User(db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
+    base_currency = db.Column(db.String(3), nullable=False, default="USD", server_default="USD")
+    # Bumped on every write to the user's expenses; keys rendered-fragment caches
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     expenses = db.relationship(
@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from flask import current_app
+from sqlalchemy import case, create_engine, func, select
+from sqlalchemy.pool import NullPool
+from models import db, Expense, ExpenseMonthlyTotal, PlatformStats, ShardDirectory, User
+from utils.archive import archived_amount
+from utils.fx import DEFAULT_CURRENCY, converted_amount, join_rates
+from utils.lookups import categories as category_names
+
+TOP_CATEGORIES = 10
+_KEEP_RESULTS = 30
+
+
+def shard_ranges(max_user_id, shards):
+    """Split user ids 1..max_user_id into at most `shards` half-open [first, last) ranges"""
+    if max_user_id < 1:
+        return []
+    size = -(-max_user_id // max(1, shards))
+    return [(first, min(first + size, max_user_id + 1)) for first in range(1, max_user_id + 1, size)]
+
+
+def shard_stats(database_uri, first_user, last_user, currency, today):
+    """Aggregate one user-id range on a private connection; runs in a worker process"""
+    engine = create_engine(database_uri, poolclass=NullPool)
+    in_shard = (Expense.user_id >= first_user, Expense.user_id < last_user)
+    amount = converted_amount(currency)
+    is_debt = Expense.due_date.isnot(None)
+    is_overdue = Expense.due_date < today
+
+    try:
+        with engine.connect() as conn:
+            users = conn.scalar(
+                select(func.count(User.id)).where(User.id >= first_user, User.id < last_user)
+            )
+            live = conn.execute(
+                join_rates(
+                    select(
+                        Expense.category_id,
+                        func.count(Expense.id),
+                        func.sum(amount),
+                        func.count(case((is_debt, 1))),
+                        func.sum(case((is_debt, amount))),
+                        func.count(case((is_overdue, 1))),
+                        func.sum(case((is_overdue, amount))),
+                    ),
+                    currency,
+                ).where(*in_shard).group_by(Expense.category_id)
+            ).all()
+            archived = conn.execute(
+                select(
+                    ExpenseMonthlyTotal.category_id,
+                    func.sum(ExpenseMonthlyTotal.count),
+                    func.sum(archived_amount(currency)),
+                )
+                .where(ExpenseMonthlyTotal.user_id >= first_user, ExpenseMonthlyTotal.user_id < last_user)
+                .group_by(ExpenseMonthlyTotal.category_id)
+            ).all()
+    finally:
+        engine.dispose()
+
+    stats = {
+        "users": users,
+        "categories": {},
+        "debts_count": 0,
+        "debts_total": 0.0,
+        "overdue_count": 0,
+        "overdue_total": 0.0,
+    }
+    # Keyed by category id; names are attached once the shards are merged
+    for category_id, count, total, debts, debts_total, overdue, overdue_total in live:
+        stats["categories"][category_id] = [total or 0.0, count]
+        stats["debts_count"] += debts
+        stats["debts_total"] += debts_total or 0.0
+        stats["overdue_count"] += overdue
+        stats["overdue_total"] += overdue_total or 0.0
+    for category_id, count, total in archived:
+        entry = stats["categories"].setdefault(category_id, [0.0, 0])
+        entry[0] += total or 0.0
+        entry[1] += count
+    return stats
+
+
+def merge_shard_stats(results, currency=DEFAULT_CURRENCY, top=TOP_CATEGORIES):
+    """Combine per-shard results into the platform-wide payload"""
+    categories = {}
+    merged = {
+        "currency": currency,
+        "users": 0,
+        "expenses_count": 0,
+        "expenses_total": 0.0,
+        "debts_count": 0,
+        "debts_total": 0.0,
+        "overdue_count": 0,
+        "overdue_total": 0.0,
+    }
+    for stats in results:
+        for key in ("users", "debts_count", "debts_total", "overdue_count", "overdue_total"):
+            merged[key] += stats[key]
+        for category, (total, count) in stats["categories"].items():
+            entry = categories.setdefault(category, [0.0, 0])
+            entry[0] += total
+            entry[1] += count
+            merged["expenses_total"] += total
+            merged["expenses_count"] += count
+    merged["top_categories"] = [
+        [category, total, count]
+        for category, (total, count) in sorted(categories.items(), key=lambda item: -item[1][0])[:top]
+    ]
+    return merged
+
+
+def compute_platform_stats(database_uris, shards=8, workers=None, currency=DEFAULT_CURRENCY, today=None):
+    """Aggregate every user in parallel shards and return (payload, shard count).
+
+    database_uris is one URI or a list of them (the primary and each user-data
+    shard); every user-id range is aggregated on every database.
+    """
+    today = today or date.today()
+    if isinstance(database_uris, str):
+        database_uris = [database_uris]
+    max_user_id = max(
+        db.session.scalar(select(func.max(User.id))) or 0,
+        db.session.scalar(select(func.max(ShardDirectory.user_id))) or 0,
+    )
+    ranges = [
+        (uri, first, last)
+        for first, last in shard_ranges(max_user_id, shards)
+        for uri in database_uris
+    ]
+    if not ranges:
+        return merge_shard_stats([], currency), 0
+
+    workers = workers or min(len(ranges), os.cpu_count() or 1)
+    # Spawned workers never inherit the parent's open connections
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [
+            pool.submit(shard_stats, uri, first, last, currency, today)
+            for uri, first, last in ranges
+        ]
+        results = [future.result() for future in futures]
+
+    payload = merge_shard_stats(results, currency)
+    names = category_names.names_for(row[0] for row in payload["top_categories"])
+    for row in payload["top_categories"]:
+        row[0] = names[row[0]]
+    return payload, len(ranges)
+
+
+def refresh_platform_stats(shards=8, workers=None, currency=DEFAULT_CURRENCY):
+    """Recompute the platform analytics and store them for the admin page"""
+    started = time.monotonic()
+    database_uris = [db.engine.url.render_as_string(hide_password=False)]
+    database_uris += current_app.config.get("SQLALCHEMY_SHARD_URIS") or []
+    payload, shard_count = compute_platform_stats(database_uris, shards, workers, currency)
+
+    stats = PlatformStats(
+        currency=currency,
+        shards=shard_count,
+        duration_ms=int((time.monotonic() - started) * 1000),
+        payload=payload,
+    )
+    db.session.add(stats)
+    db.session.flush()
+    db.session.query(PlatformStats).filter(
+        PlatformStats.id.notin_(
+            select(PlatformStats.id).order_by(PlatformStats.computed_at.desc()).limit(_KEEP_RESULTS)
+        )
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return stats
+
+
+def latest_platform_stats():
+    """The most recent stored analytics, or None before the first refresh"""
+    return PlatformStats.query.order_by(PlatformStats.computed_at.desc()).first()
@@ -0,0 +1,134 @@
+from datetime import date
+from sqlalchemy import case, func, select, text
+from models import db, ExpenseMonthlyTotal
+from utils.fx import latest_rate_join
+from utils.partitioning import year_bounds
+
+# Moves one batch of cold expenses and folds them into the monthly totals in a
+# single statement, so the live table, the archive and the aggregates never
+# disagree. Debts stay live: they are listed individually on /debts.
+_ARCHIVE_BATCH = text(f"""
+WITH moved AS (
+    DELETE FROM expenses
+    WHERE date < :cutoff AND due_date IS NULL
+      AND user_id >= :first_user AND user_id < :last_user
+    RETURNING *
+), archived AS (
+    INSERT INTO expenses_archive
+        (id, name, amount, currency, category_id, date, due_date, merchant_id, comment,
+         user_id, created_at, version, archived_at)
+    SELECT id, name, amount, currency, category_id, date, due_date, merchant_id, comment,
+           user_id, created_at, version, now()
+    FROM moved
+), bumped AS (
+    UPDATE users SET data_version = data_version + 1
+    WHERE id IN (SELECT DISTINCT user_id FROM moved)
+), totals AS (
+    INSERT INTO expense_monthly_totals
+        (user_id, month, category_id, currency, total, count, base_currency, base_total)
+    SELECT m.user_id, date_trunc('month', m.date)::date, m.category_id, m.currency,
+           sum(m.amount), count(*), u.base_currency,
+           sum(CASE WHEN m.currency = u.base_currency THEN m.amount
+                    ELSE m.amount * src.rate / base.rate END)
+    FROM moved m
+    JOIN users u ON u.id = m.user_id
+    {latest_rate_join("src", "m.currency", "m.date")}
+    {latest_rate_join("base", "u.base_currency", "m.date")}
+    GROUP BY m.user_id, date_trunc('month', m.date), m.category_id, m.currency, u.base_currency
+    ON CONFLICT (user_id, month, category_id, currency) DO UPDATE SET
+        total = expense_monthly_totals.total + EXCLUDED.total,
+        count = expense_monthly_totals.count + EXCLUDED.count,
+        base_total = CASE
+            WHEN expense_monthly_totals.base_currency = EXCLUDED.base_currency
+            THEN coalesce(expense_monthly_totals.base_total, 0) + coalesce(EXCLUDED.base_total, 0)
+        END
+)
+SELECT count(*) FROM moved
+""")
+
+
+def archive_cutoff(horizon_months, today=None):
+    """First day of the oldest month kept live; archiving always moves whole months"""
+    today = today or date.today()
+    months = today.year * 12 + (today.month - 1) - horizon_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def archive_expenses(horizon_months=12, batch_users=500, today=None):
+    """Move non-debt expenses dated before the horizon into the archive.
+
+    Users are processed in id ranges of batch_users, one transaction per range.
+    Returns the number of expenses archived.
+    """
+    cutoff = archive_cutoff(horizon_months, today)
+    max_user = db.session.scalar(text("SELECT max(id) FROM users")) or 0
+
+    archived = 0
+    for first_user in range(1, max_user + 1, batch_users):
+        archived += db.session.scalar(_ARCHIVE_BATCH, {
+            "cutoff": cutoff,
+            "first_user": first_user,
+            "last_user": first_user + batch_users,
+        })
+        db.session.commit()
+    return archived
+
+
+def archived_amount(base_currency):
+    """Archived totals in base_currency, exact when archived under the same base"""
+    return case(
+        (ExpenseMonthlyTotal.currency == base_currency, ExpenseMonthlyTotal.total),
+        (ExpenseMonthlyTotal.base_currency == base_currency, ExpenseMonthlyTotal.base_total),
+        else_=None,
+    )
+
+
+def _archived_criteria(user_id, year=None):
+    criteria = [ExpenseMonthlyTotal.user_id == user_id]
+    if year:
+        start, end = year_bounds(year)
+        criteria.extend((ExpenseMonthlyTotal.month >= start, ExpenseMonthlyTotal.month < end))
+    return criteria
+
+
+def archived_totals_columns(user_id, base_currency, year=None):
+    """(total, count) of a user's archived expenses as scalar subqueries, to fold into another statement"""
+    criteria = _archived_criteria(user_id, year)
+    return (
+        select(func.coalesce(func.sum(archived_amount(base_currency)), 0)).where(*criteria).scalar_subquery(),
+        select(func.coalesce(func.sum(ExpenseMonthlyTotal.count), 0)).where(*criteria).scalar_subquery(),
+    )
+
+
+def archived_totals(user_id, base_currency, year=None):
+    """Return (total, count) of a user's archived expenses"""
+    return tuple(db.session.execute(select(*archived_totals_columns(user_id, base_currency, year))).one())
+
+
+def archived_by_category(user_id, base_currency, year=None):
+    """Return {category_id: (total, count)} of a user's archived expenses"""
+    rows = (
+        db.session.query(
+            ExpenseMonthlyTotal.category_id,
+            func.sum(archived_amount(base_currency)),
+            func.sum(ExpenseMonthlyTotal.count),
+        )
+        .filter(*_archived_criteria(user_id, year))
+        .group_by(ExpenseMonthlyTotal.category_id)
+        .all()
+    )
+    return {category_id: (total or 0, count) for category_id, total, count in rows}
+
+
+def archived_by_month(user_id, base_currency, year=None):
+    """Return {"YYYY-MM": total} of a user's archived expenses"""
+    rows = (
+        db.session.query(
+            ExpenseMonthlyTotal.month,
+            func.sum(archived_amount(base_currency)),
+        )
+        .filter(*_archived_criteria(user_id, year))
+        .group_by(ExpenseMonthlyTotal.month)
+        .all()
+    )
+    return {month.strftime("%Y-%m"): total or 0 for month, total in rows}
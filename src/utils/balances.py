@@ -0,0 +1,147 @@
+from datetime import date
+from sqlalchemy import case, func, literal, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, DailyBalance
+from utils.fx import convert, latest_rate_join
+
+# Recomputes the daily balances of one user-id range from :since onward. Live and
+# archived expenses are converted with the latest rates on or before their day,
+# summed per day and turned into running totals by window functions that start
+# from the last balance kept before :since.
+_REBUILD_BALANCES = text(f"""
+WITH spent AS (
+    SELECT e.user_id, e.date AS day, e.due_date IS NOT NULL AS is_debt,
+           CASE WHEN e.currency = u.base_currency THEN e.amount
+                ELSE e.amount * src.rate / base.rate END AS amount
+    FROM (
+        SELECT user_id, date, amount, currency, due_date FROM expenses
+        WHERE user_id >= :first_user AND user_id < :last_user AND date >= :since
+        UNION ALL
+        SELECT user_id, date, amount, currency, due_date FROM expenses_archive
+        WHERE user_id >= :first_user AND user_id < :last_user AND date >= :since
+    ) e
+    JOIN users u ON u.id = e.user_id
+    {latest_rate_join("src", "e.currency", "e.date")}
+    {latest_rate_join("base", "u.base_currency", "e.date")}
+), daily AS (
+    SELECT user_id, day,
+           coalesce(sum(amount), 0) AS daily_total,
+           coalesce(sum(amount) FILTER (WHERE is_debt), 0) AS debt
+    FROM spent
+    GROUP BY user_id, day
+)
+INSERT INTO daily_balances (user_id, day, daily_total, cumulative_total, open_debt)
+SELECT d.user_id, d.day, d.daily_total,
+       coalesce(carry.cumulative_total, 0) + sum(d.daily_total) OVER running,
+       coalesce(carry.open_debt, 0) + sum(d.debt) OVER running
+FROM daily d
+LEFT JOIN LATERAL (
+    SELECT b.cumulative_total, b.open_debt FROM daily_balances b
+    WHERE b.user_id = d.user_id AND b.day < :since
+    ORDER BY b.day DESC
+    LIMIT 1
+) carry ON true
+WINDOW running AS (PARTITION BY d.user_id ORDER BY d.day)
+""")
+
+# First key of the per-user advisory lock serializing balance writes
+_LOCK_CLASS = 4047
+
+_CLEAR_BALANCES = text("""
+DELETE FROM daily_balances
+WHERE user_id >= :first_user AND user_id < :last_user AND day >= :since
+""")
+
+
+def _rebuild(first_user, last_user, since):
+    params = {"first_user": first_user, "last_user": last_user, "since": since or date.min}
+    db.session.execute(_CLEAR_BALANCES, params)
+    return db.session.execute(_REBUILD_BALANCES, params).rowcount
+
+
+def _lock_user(user_id):
+    db.session.execute(select(func.pg_advisory_xact_lock(_LOCK_CLASS, user_id)))
+
+
+def rebuild_balances(user_id, since=None):
+    """Recompute one user's balances from since (default: all) onward.
+
+    Used after bulk writes; runs inside the caller's transaction. Returns the
+    number of days written.
+    """
+    _lock_user(user_id)
+    return _rebuild(user_id, user_id + 1, since)
+
+
+def backfill_balances(batch_users=500):
+    """Rebuild every user's balance history, one transaction per batch_users id range"""
+    max_user = db.session.scalar(text("SELECT max(id) FROM users")) or 0
+    written = 0
+    for first_user in range(1, max_user + 1, batch_users):
+        written += _rebuild(first_user, first_user + batch_users, None)
+        db.session.commit()
+    return written
+
+
+def apply_balance_delta(user_id, day, amount, currency, base_currency, is_debt=False):
+    """Add one expense amount to the user's balances on day and every later day.
+
+    amount is converted into the user's base currency first; pass a negative
+    amount to remove an expense. Runs inside the caller's transaction, holding
+    the user's advisory lock until commit: a new day carries the totals of the
+    day before it, which must include every earlier write of the user.
+    """
+    delta = convert(amount, currency, base_currency, day)
+    if not delta:
+        return
+    _lock_user(user_id)
+
+    # A missing day starts from the running totals of the last day before it
+    def carried(column):
+        return func.coalesce(
+            select(column)
+            .where(DailyBalance.user_id == user_id, DailyBalance.day < day)
+            .order_by(DailyBalance.day.desc())
+            .limit(1)
+            .scalar_subquery(),
+            0.0,
+        )
+
+    db.session.execute(
+        pg_insert(DailyBalance)
+        .from_select(
+            ["user_id", "day", "daily_total", "cumulative_total", "open_debt"],
+            select(
+                literal(user_id), literal(day), literal(0.0),
+                carried(DailyBalance.cumulative_total), carried(DailyBalance.open_debt),
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+    db.session.execute(
+        update(DailyBalance)
+        .where(DailyBalance.user_id == user_id, DailyBalance.day >= day)
+        .values(
+            daily_total=case((DailyBalance.day == day, DailyBalance.daily_total + delta),
+                             else_=DailyBalance.daily_total),
+            cumulative_total=DailyBalance.cumulative_total + delta,
+            open_debt=DailyBalance.open_debt + (delta if is_debt else 0.0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def balance_history(user_id, start, end):
+    """Return (opening, days) for [start, end]: the running totals before start and each stored day"""
+    opening = db.session.execute(
+        select(DailyBalance.cumulative_total, DailyBalance.open_debt)
+        .where(DailyBalance.user_id == user_id, DailyBalance.day < start)
+        .order_by(DailyBalance.day.desc())
+        .limit(1)
+    ).first()
+    days = db.session.execute(
+        select(DailyBalance.day, DailyBalance.daily_total, DailyBalance.cumulative_total, DailyBalance.open_debt)
+        .where(DailyBalance.user_id == user_id, DailyBalance.day >= start, DailyBalance.day <= end)
+        .order_by(DailyBalance.day)
+    ).all()
+    return opening, days
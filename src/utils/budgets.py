@@ -0,0 +1,213 @@
+from datetime import date, timedelta
+from sqlalchemy import and_, case, func, or_, select, update
+from models import db, Budget, Category, Expense, User
+from utils.fx import convert, converted_amount, join_rates
+
+PERIODS = ("weekly", "monthly", "yearly")
+
+
+def period_bounds(period, day):
+    """Return the [start, end) date range of the budget period containing day"""
+    if period == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if period == "monthly":
+        start = day.replace(day=1)
+        if start.month == 12:
+            return start, start.replace(year=start.year + 1, month=1)
+        return start, start.replace(month=start.month + 1)
+    if period == "yearly":
+        start = day.replace(month=1, day=1)
+        return start, start.replace(year=start.year + 1)
+    raise ValueError(f"Unknown budget period: {period}")
+
+
+def _period_spend(user_id, category, start, end, base_currency):
+    """Scalar subquery summing a user's spend in one category over [start, end)"""
+    # Budgets name their category; resolve it once and compare integer keys per row
+    category_id = select(Category.id).where(Category.name == category).scalar_subquery()
+    stmt = select(func.coalesce(func.sum(converted_amount(base_currency)), 0.0)).select_from(Expense)
+    return (
+        join_rates(stmt, base_currency)
+        .where(
+            Expense.user_id == user_id,
+            Expense.category_id == category_id,
+            Expense.date >= start,
+            Expense.date < end,
+        )
+        .scalar_subquery()
+    )
+
+
+def _rolled_period(today):
+    """Return (stale, start, end) column expressions for a budget's period as of today.
+
+    A budget whose stored period has ended is stale and gets the bounds of the
+    period containing today; any other keeps its stored bounds. In the SET
+    clause of an UPDATE the columns still read the old row.
+    """
+    stale = Budget.period_end <= today
+    bounds = {period: period_bounds(period, today) for period in PERIODS}
+    start = case(
+        *((and_(stale, Budget.period == period), start) for period, (start, _) in bounds.items()),
+        else_=Budget.period_start,
+    )
+    end = case(
+        *((and_(stale, Budget.period == period), end) for period, (_, end) in bounds.items()),
+        else_=Budget.period_end,
+    )
+    return stale, start, end
+
+
+def apply_budget_delta(user_id, category, day, amount, currency, base_currency):
+    """Adjust the running spend of every budget whose current period contains the expense.
+
+    amount is converted into the user's base currency first; pass a negative
+    amount to remove an expense. See apply_budget_deltas.
+    """
+    apply_budget_deltas(user_id, [(category, day, amount, currency)], base_currency)
+
+
+def apply_budget_deltas(user_id, changes, base_currency):
+    """Adjust the user's budgets for several (category, day, amount, currency) changes in one UPDATE.
+
+    An edit passes the old amount negated and the new one together, so each
+    budget is adjusted or recomputed exactly once. A budget whose period has
+    ended is rolled into the current one by the same UPDATE, its spend
+    recomputed from the expenses table (which already holds the write), so it
+    never depends on the rollover job having run. When an amount has no rate
+    to convert it, the affected categories' budgets are recomputed instead.
+    Runs inside the caller's transaction so the budgets and the expense commit
+    together.
+    """
+    deltas = [(category, day, convert(amount, currency, base_currency, day))
+              for category, day, amount, currency in changes]
+    names = {category for category, _, _ in deltas}
+    if any(delta is None for _, _, delta in deltas):
+        # Recomputing counts exactly the rows the SQL totals can convert
+        _refresh_budgets(Budget.user_id == user_id, Budget.category.in_(names))
+        return
+    stale, start, end = _rolled_period(date.today())
+    matches = [
+        (and_(Budget.category == category, Budget.period_start <= day, Budget.period_end > day), delta)
+        for category, day, delta in deltas
+        if delta
+    ]
+    increment = sum((case((match, delta), else_=0.0) for match, delta in matches), 0.0)
+    db.session.execute(
+        update(Budget)
+        .where(
+            Budget.user_id == user_id,
+            Budget.category.in_(names),
+            or_(stale, *(match for match, _ in matches)),
+        )
+        .values(
+            period_start=start,
+            period_end=end,
+            spent=case(
+                (stale, _period_spend(user_id, Budget.category, start, end, base_currency)),
+                else_=Budget.spent + increment,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _refresh_budgets(*criteria):
+    """Recompute the spend of the matching budgets in one UPDATE, rolling ended periods forward"""
+    base_currency = select(User.base_currency).where(User.id == Budget.user_id).scalar_subquery()
+    _, start, end = _rolled_period(date.today())
+    db.session.execute(
+        update(Budget)
+        .where(*criteria)
+        .values(
+            period_start=start,
+            period_end=end,
+            spent=_period_spend(Budget.user_id, Budget.category, start, end, base_currency),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def current_budgets(user_id, *order_by):
+    """Return the user's budgets as of today without writing anything.
+
+    A budget whose stored period has ended is shown for the current period,
+    with its spend computed by the same query; the stored row catches up on
+    the next write to its category or the rollover job. The budgets come back
+    as detached Budget objects, safe to read from a replica.
+    """
+    stale, start, end = _rolled_period(date.today())
+    base_currency = select(User.base_currency).where(User.id == user_id).scalar_subquery()
+    spent = case(
+        (stale, _period_spend(user_id, Budget.category, start, end, base_currency)),
+        else_=Budget.spent,
+    )
+    rows = db.session.execute(
+        select(Budget.id, Budget.category, Budget.period, Budget.limit_amount, start, end, spent)
+        .where(Budget.user_id == user_id)
+        .order_by(*order_by)
+    )
+    return [
+        Budget(id=id, user_id=user_id, category=category, period=period, limit_amount=limit_amount,
+               period_start=period_start, period_end=period_end, spent=spent)
+        for id, category, period, limit_amount, period_start, period_end, spent in rows
+    ]
+
+
+def refresh_user_budgets(user_id):
+    """Recompute the current-period spend of all of one user's budgets in one UPDATE.
+
+    Used after bulk writes, where per-row deltas are not available.
+    """
+    _refresh_budgets(Budget.user_id == user_id)
+
+
+def refresh_all_budgets():
+    """Recompute every budget's spend, e.g. after exchange rates were loaded"""
+    _refresh_budgets()
+    db.session.commit()
+
+
+def initialize_budget(budget, today=None):
+    """Set the budget's current period and seed its spend with a single aggregate"""
+    start, end = period_bounds(budget.period, today or date.today())
+    budget.period_start = start
+    budget.period_end = end
+    base_currency = db.session.scalar(select(User.base_currency).where(User.id == budget.user_id))
+    budget.spent = db.session.scalar(
+        select(_period_spend(budget.user_id, budget.category, start, end, base_currency))
+    )
+
+
+def rollover_budgets(today=None):
+    """Move every budget whose period has ended into the current one, for all users.
+
+    Budgets also roll lazily when they are read or written; this catches up
+    the ones nobody touched. Issues one UPDATE per period kind; the new spend is recomputed from the expenses
+    table by a correlated subquery. Returns the number of budgets rolled over.
+    """
+    today = today or date.today()
+    base_currency = select(User.base_currency).where(User.id == Budget.user_id).scalar_subquery()
+    rolled = 0
+    for period in PERIODS:
+        start, end = period_bounds(period, today)
+        stale = (Budget.period == period, Budget.period_start != start)
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(select(Budget.user_id).where(*stale)))
+            .values(data_version=User.data_version + 1)
+        )
+        result = db.session.execute(
+            update(Budget)
+            .where(*stale)
+            .values(
+                period_start=start,
+                period_end=end,
+                spent=_period_spend(Budget.user_id, Budget.category, start, end, base_currency),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rolled += result.rowcount
+    db.session.commit()
+    return rolled
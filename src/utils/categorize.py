@@ -0,0 +1,154 @@
+import threading
+from collections import deque
+from sqlalchemy import bindparam, func, select, update
+from models import db, CategoryRule, Expense
+from utils.budgets import refresh_user_budgets
+from utils.changelog import UPSERT, record_changes
+from utils.data_version import bump_data_version
+from utils.lookups import categories, merchants
+from utils.timeseries import invalidate_buckets
+
+_MATCHER_CACHE_SIZE = 1000
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton mapping keywords found anywhere in a text to categories.
+
+    Matching is case-insensitive and runs in one pass over the text regardless of
+    the number of rules. When several keywords match, the longest wins, then the
+    rule listed first.
+    """
+
+    def __init__(self, rules):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # (length, -rule order, category) of the best keyword ending here
+
+        for order, (keyword, category) in enumerate(rules):
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            state = 0
+            for ch in keyword:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            candidate = (len(keyword), -order, category)
+            if self._best[state] is None or candidate > self._best[state]:
+                self._best[state] = candidate
+
+        # Breadth-first so every fail target is finished before it is inherited
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited > self._best[child]):
+                    self._best[child] = inherited
+
+    def match(self, text):
+        """Return the category of the best keyword contained in text, or None"""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        state, best = 0, None
+        for ch in (text or "").lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found = best_at[state]
+            if found is not None and (best is None or found > best):
+                best = found
+        return best[2] if best else None
+
+
+def expense_text(name, element):
+    """The text rules are matched against"""
+    return f"{name or ''} {element or ''}"
+
+
+def get_matcher(user_id):
+    """Return the user's compiled matcher, rebuilding it only when their rules changed.
+
+    The cache key is the rule count, highest id and newest creation time: adding
+    or deleting a rule changes it, so every worker process notices on its next
+    lookup, and a recreated database never matches an old entry.
+    """
+    fingerprint = tuple(db.session.execute(
+        select(func.count(CategoryRule.id), func.max(CategoryRule.id), func.max(CategoryRule.created_at))
+        .where(CategoryRule.user_id == user_id)
+    ).one())
+    with _matchers_lock:
+        cached = _matchers.get(user_id)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+    rules = db.session.execute(
+        select(CategoryRule.keyword, CategoryRule.category)
+        .where(CategoryRule.user_id == user_id)
+        .order_by(CategoryRule.id)
+    ).all()
+    matcher = KeywordMatcher(rules)
+    with _matchers_lock:
+        if len(_matchers) >= _MATCHER_CACHE_SIZE:
+            _matchers.clear()
+        _matchers[user_id] = (fingerprint, matcher)
+    return matcher
+
+
+def clear_matcher_cache():
+    with _matchers_lock:
+        _matchers.clear()
+
+
+def apply_rules(user_id, batch_size=1000):
+    """Re-categorize a user's existing expenses with their current rules.
+
+    Walks the expenses in id order in keyset batches, updating only rows whose
+    category changes; each batch commits on its own. Returns the number updated.
+    """
+    matcher = get_matcher(user_id)
+    set_category = (
+        update(Expense.__table__)
+        .where(Expense.id == bindparam("b_id"), Expense.date == bindparam("b_date"))
+        .values(category_id=bindparam("b_category_id"), version=Expense.version + 1)
+    )
+
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Expense.id, Expense.date, Expense.name, Expense.merchant_id, Expense.category_id)
+            .where(Expense.user_id == user_id, Expense.id > last_id)
+            .order_by(Expense.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        element_names = merchants.names_for({row.merchant_id for row in rows})
+        changes = []
+        for row in rows:
+            category = matcher.match(expense_text(row.name, element_names.get(row.merchant_id)))
+            category_id = categories.id_for(category) if category else None
+            if category_id and category_id != row.category_id:
+                changes.append({"b_id": row.id, "b_date": row.date, "b_category_id": category_id})
+        if changes:
+            db.session.execute(set_category, changes)
+            refresh_user_budgets(user_id)
+            days = [c["b_date"] for c in changes]
+            invalidate_buckets(user_id, min(days), max(days))
+            bump_data_version(user_id)
+            record_changes(user_id, [c["b_id"] for c in changes], UPSERT)
+            updated += len(changes)
+        db.session.commit()
+    return updated
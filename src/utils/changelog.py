@@ -0,0 +1,180 @@
+from datetime import datetime
+from sqlalchemy import Integer, any_, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from models import db, Expense, ExpenseChange
+from utils.fx import parse_currency
+from utils.lookups import categories, merchants
+
+UPSERT = "upsert"
+DELETE = "delete"
+# First key of the per-user advisory lock taken while appending to the log
+_LOCK_CLASS = 4040
+
+# Columns read for serialization; category and element are stored as lookup ids
+_SYNC_COLUMNS = (
+    Expense.id, Expense.version, Expense.name, Expense.amount, Expense.currency, Expense.category_id,
+    Expense.date, Expense.due_date, Expense.merchant_id, Expense.comment,
+)
+
+
+class SyncConflict(Exception):
+    """Raised when uploaded changes target rows modified since the client saw them"""
+
+    def __init__(self, ids):
+        super().__init__(f"Conflicting expenses: {ids}")
+        self.ids = ids
+
+
+def record_changes(user_id, expense_ids, op):
+    """Append change-log entries inside the caller's transaction.
+
+    The per-user advisory lock is held until commit, so each user's sequence
+    numbers are assigned in commit order and a cursor never skips a change that
+    committed late.
+    """
+    if not expense_ids:
+        return
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(select(func.pg_advisory_xact_lock(_LOCK_CLASS, user_id)))
+    db.session.execute(
+        insert(ExpenseChange),
+        [{"user_id": user_id, "expense_id": expense_id, "op": op} for expense_id in expense_ids],
+    )
+
+
+def serialize_expense(row):
+    """JSON form of a row selected with the sync columns"""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "amount": row.amount,
+        "currency": row.currency,
+        "category": categories.name_for(row.category_id),
+        "date": row.date.isoformat(),
+        "due_date": row.due_date.isoformat() if row.due_date else None,
+        "element": merchants.name_for(row.merchant_id),
+        "comment": row.comment,
+        "version": row.version,
+    }
+
+
+def changes_since(user_id, cursor, limit=500):
+    """Return (changes, next cursor, has_more) for log entries after cursor.
+
+    Several entries for one expense within a batch collapse into its current
+    state, or a tombstone if it no longer exists.
+    """
+    entries = db.session.execute(
+        select(ExpenseChange.seq, ExpenseChange.expense_id)
+        .where(ExpenseChange.user_id == user_id, ExpenseChange.seq > cursor)
+        .order_by(ExpenseChange.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Ordered by the last entry of each expense
+    latest = {}
+    for entry in entries:
+        latest.pop(entry.expense_id, None)
+        latest[entry.expense_id] = entry.seq
+
+    current = {}
+    if latest:
+        rows = db.session.execute(
+            select(*_SYNC_COLUMNS).where(
+                Expense.user_id == user_id,
+                Expense.id == any_(bindparam("ids", list(latest), type_=ARRAY(Integer))),
+            )
+        ).all()
+        current = {row.id: row for row in rows}
+
+    changes = [
+        {"op": UPSERT, "expense": serialize_expense(current[expense_id])}
+        if expense_id in current
+        else {"op": DELETE, "id": expense_id}
+        for expense_id in latest
+    ]
+    next_cursor = entries[-1].seq if entries else cursor
+    return changes, next_cursor, has_more
+
+
+def _parse_date(value, required=False):
+    if not value:
+        if required:
+            raise ValueError("date is required")
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _expense_values(data, base_currency):
+    """Validate the fields of one uploaded upsert"""
+    if not data.get("name") or not data.get("category"):
+        raise ValueError("name and category are required")
+    return {
+        "name": data["name"],
+        "amount": float(data["amount"]),
+        "currency": parse_currency(data.get("currency"), base_currency),
+        "category_id": categories.id_for(data["category"]),
+        "date": _parse_date(data.get("date"), required=True),
+        "due_date": _parse_date(data.get("due_date")),
+        "merchant_id": merchants.id_for(data.get("element")),
+        "comment": data.get("comment") or None,
+    }
+
+
+def apply_client_changes(user_id, changes, base_currency):
+    """Apply uploaded changes in the caller's transaction.
+
+    Returns ({client_id: server id} for created expenses, whether anything
+    changed). Rows sent with a version only change if it still matches;
+    otherwise SyncConflict is raised and the caller rolls the whole batch back.
+    Raises ValueError on bad input.
+    """
+    created, upserted, deleted, conflicts = {}, [], [], []
+
+    for change in changes:
+        op = change.get("op")
+        expense_id = change.get("id")
+        criteria = [Expense.id == expense_id, Expense.user_id == user_id]
+        if change.get("version") is not None:
+            criteria.append(Expense.version == int(change["version"]))
+
+        if op == UPSERT and expense_id is None:
+            values = _expense_values(change, base_currency)
+            new_id = db.session.execute(
+                insert(Expense).values(**values, user_id=user_id).returning(Expense.id)
+            ).scalar_one()
+            if change.get("client_id") is not None:
+                created[str(change["client_id"])] = new_id
+            upserted.append(new_id)
+        elif op == UPSERT:
+            values = _expense_values(change, base_currency)
+            updated = db.session.execute(
+                update(Expense)
+                .where(*criteria)
+                .values(**values, version=Expense.version + 1)
+                .returning(Expense.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if updated is None:
+                conflicts.append(expense_id)
+            else:
+                upserted.append(updated)
+        elif op == DELETE and expense_id is not None:
+            removed = db.session.execute(
+                delete(Expense).where(*criteria).returning(Expense.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if removed is not None:
+                deleted.append(removed)
+            elif db.session.scalar(select(Expense.id).where(*criteria[:2])) is not None:
+                conflicts.append(expense_id)  # Deleting an already deleted row is a no-op
+        else:
+            raise ValueError(f"Invalid change: {change}")
+
+    if conflicts:
+        raise SyncConflict(conflicts)
+    record_changes(user_id, upserted, UPSERT)
+    record_changes(user_id, deleted, DELETE)
+    return created, bool(upserted or deleted)
@@ -0,0 +1,367 @@
+import click
+from flask.cli import AppGroup, with_appcontext
+
+budgets_cli = AppGroup("budgets", help="Budget maintenance commands.")
+fx_cli = AppGroup("fx", help="Exchange rate commands.")
+partitions_cli = AppGroup("partitions", help="Expense table partition maintenance.")
+archive_cli = AppGroup("archive", help="Cold expense archiving.")
+analytics_cli = AppGroup("analytics", help="Admin analytics maintenance.")
+loadtest_cli = AppGroup("loadtest", help="Load generation against a running instance.")
+rules_cli = AppGroup("rules", help="Categorization rule commands.")
+reminders_cli = AppGroup("reminders", help="Debt reminder commands.")
+shards_cli = AppGroup("shards", help="User data shard maintenance.")
+balances_cli = AppGroup("balances", help="Daily balance history maintenance.")
+groups_cli = AppGroup("groups", help="Shared expense group maintenance.")
+receipts_cli = AppGroup("receipts", help="Receipt attachment storage maintenance.")
+lookups_cli = AppGroup("lookups", help="Category and merchant lookup table migration.")
+
+
+@budgets_cli.command("rollover")
+@click.option("--date", "on_date", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Evaluate periods as of this date (defaults to today).")
+@with_appcontext
+def rollover_command(on_date):
+    """Roll every user's budgets into their current period"""
+    from utils.budgets import rollover_budgets
+    from utils.sharding import for_each_shard
+
+    rolled = sum(rollover_budgets(on_date.date() if on_date else None) for _ in for_each_shard())
+    click.echo(f"Rolled over {rolled} budget(s).")
+
+
+@fx_cli.command("load")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--pivot", default="USD", show_default=True,
+              help="Currency the rates in the file are quoted against.")
+@with_appcontext
+def load_rates_command(path, pivot):
+    """Load daily exchange rates from a CSV file (date,currency,rate)"""
+    from utils.balances import backfill_balances
+    from utils.budgets import refresh_all_budgets
+    from utils.fx import load_rates
+    from utils.sharding import for_each_shard
+
+    # Every shard joins expenses against its own copy of the rates
+    stored = 0
+    for _ in for_each_shard():
+        stored = load_rates(path, pivot=pivot.upper())
+        # Balances and budget spend are stored converted; recompute them with the new rates
+        backfill_balances()
+        refresh_all_budgets()
+    click.echo(f"Stored {stored} daily rate(s).")
+
+
+@partitions_cli.command("ensure")
+@click.option("--years-ahead", default=1, show_default=True,
+              help="How many future yearly partitions to pre-create.")
+@click.option("--from-year", type=int, default=None,
+              help="First year to create (defaults to the oldest year in the default partition).")
+@with_appcontext
+def ensure_partitions_command(years_ahead, from_year):
+    """Pre-create yearly expense partitions"""
+    from utils.partitioning import ensure_partitions, is_partitioned
+    from utils.sharding import for_each_shard
+
+    for shard in for_each_shard():
+        if not is_partitioned():
+            click.echo(f"[{shard}] The expenses table is not partitioned; nothing to do.")
+            continue
+        created = ensure_partitions(years_ahead=years_ahead, from_year=from_year)
+        click.echo(f"[{shard}] Created {len(created)} partition(s): {', '.join(created) or '-'}")
+
+
+@partitions_cli.command("migrate")
+@with_appcontext
+def migrate_partitions_command():
+    """Rebuild a plain expenses table as the partitioned one and split it by year"""
+    from utils.partitioning import ensure_partitions, migrate_to_partitioned
+    from utils.sharding import for_each_shard
+
+    for shard in for_each_shard():
+        copied = migrate_to_partitioned()
+        if copied is None:
+            click.echo(f"[{shard}] The expenses table is already partitioned; nothing to do.")
+            continue
+        created = ensure_partitions()
+        click.echo(f"[{shard}] Copied {copied} expense(s) into {len(created)} yearly partition(s).")
+
+
+@partitions_cli.command("detach")
+@click.option("--before", "before_year", type=int, required=True,
+              help="Detach partitions for years earlier than this one.")
+@click.option("--drop", is_flag=True, help="Drop the detached tables as well.")
+@with_appcontext
+def detach_partitions_command(before_year, drop):
+    """Detach old yearly expense partitions"""
+    from utils.partitioning import detach_partitions
+    from utils.sharding import for_each_shard
+
+    for shard in for_each_shard():
+        detached = detach_partitions(before_year, drop=drop)
+        click.echo(f"[{shard}] Detached {len(detached)} partition(s): {', '.join(detached) or '-'}")
+
+
+@archive_cli.command("run")
+@click.option("--months", type=int, default=None,
+              help="Archive expenses older than this many months (defaults to ARCHIVE_HORIZON_MONTHS).")
+@click.option("--batch-users", default=500, show_default=True,
+              help="How many users to archive per transaction.")
+@with_appcontext
+def archive_run_command(months, batch_users):
+    """Move old non-debt expenses into the archive and monthly totals"""
+    from flask import current_app
+    from utils.archive import archive_expenses
+    from utils.sharding import for_each_shard
+
+    if months is None:
+        months = current_app.config["ARCHIVE_HORIZON_MONTHS"]
+    archived = sum(
+        archive_expenses(horizon_months=months, batch_users=batch_users) for _ in for_each_shard()
+    )
+    click.echo(f"Archived {archived} expense(s).")
+
+
+@analytics_cli.command("refresh")
+@click.option("--shards", type=int, default=None,
+              help="User-id shards to aggregate (defaults to ADMIN_ANALYTICS_SHARDS).")
+@click.option("--workers", type=int, default=None,
+              help="Worker processes (defaults to one per shard, up to the CPU count).")
+@with_appcontext
+def analytics_refresh_command(shards, workers):
+    """Recompute platform-wide analytics in parallel shards"""
+    from flask import current_app
+    from utils.admin_analytics import refresh_platform_stats
+
+    if shards is None:
+        shards = current_app.config["ADMIN_ANALYTICS_SHARDS"]
+    stats = refresh_platform_stats(shards=shards, workers=workers)
+    click.echo(f"Computed analytics over {stats.shards} shard(s) in {stats.duration_ms} ms.")
+
+
+@loadtest_cli.command("run")
+@click.option("--url", default="http://localhost:5000", show_default=True,
+              help="Base URL of the instance under test.")
+@click.option("--users", "user_counts", default="1,2,4,8,16", show_default=True,
+              help="Comma-separated simulated user counts, one stage each.")
+@click.option("--duration", default=30.0, show_default=True, help="Seconds per stage.")
+@click.option("--think-time", default=0.5, show_default=True,
+              help="Mean pause between a user's actions, in seconds.")
+@click.option("--mix", default="browse=80,create=10,edit=5,delete=5", show_default=True,
+              help="Relative weights of the simulated actions.")
+@click.option("--password", default="loadtest", show_default=True,
+              help="Password of the loadtest-N accounts.")
+@click.option("--create-users", is_flag=True,
+              help="Create the loadtest-N accounts in this app's database first.")
+@with_appcontext
+def loadtest_command(url, user_counts, duration, think_time, mix, password, create_users):
+    """Ramp simulated users through stages and report throughput and latency"""
+    from utils.loadtest import find_saturation, parse_mix, run_stage
+    from utils.sharding import create_user, find_user
+
+    counts = sorted({int(c) for c in user_counts.split(",") if c.strip()})
+    usernames = [f"loadtest-{i}" for i in range(1, max(counts) + 1)]
+    if create_users:
+        for username in usernames:
+            if find_user(username) is None:
+                create_user(username, password)
+
+    stages = []
+    for count in counts:
+        stats = run_stage(url, [(u, password) for u in usernames[:count]], duration,
+                          mix=parse_mix(mix), think_time=think_time)
+        stages.append((count, stats))
+        click.echo(f"\n{count} user(s): {stats.throughput:.1f} req/s, "
+                   f"p95 {stats.latency_percentile(95) * 1000:.0f} ms, "
+                   f"errors {stats.error_rate:.1%}")
+        click.echo(f"  {'endpoint':<28}{'reqs':>7}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'err':>7}")
+        for endpoint, reqs, rate, p50, p95, p99, errors in stats.endpoint_report():
+            click.echo(f"  {endpoint:<28}{reqs:>7}{rate:>8.1f}{p50:>8.0f}{p95:>8.0f}{p99:>8.0f}{errors:>7.1%}")
+
+    saturation = find_saturation(stages)
+    if saturation is None:
+        click.echo("\nNo saturation point reached; try more users.")
+    else:
+        click.echo(f"\nThroughput saturates at about {saturation} concurrent user(s).")
+
+
+@rules_cli.command("apply")
+@click.option("--user", "user_ids", type=int, multiple=True,
+              help="Only this user id (repeatable); defaults to every user with rules.")
+@click.option("--batch-size", default=1000, show_default=True,
+              help="Expenses examined per transaction.")
+@with_appcontext
+def rules_apply_command(user_ids, batch_size):
+    """Re-categorize existing expenses with their owners' rules"""
+    from models import db, CategoryRule
+    from utils.categorize import apply_rules
+    from utils.sharding import for_each_shard
+
+    wanted = set(user_ids)
+    total = users = 0
+    for _ in for_each_shard():
+        on_shard = db.session.scalars(
+            db.select(CategoryRule.user_id).distinct().order_by(CategoryRule.user_id)
+        ).all()
+        for user_id in on_shard:
+            if not wanted or user_id in wanted:
+                total += apply_rules(user_id, batch_size=batch_size)
+                users += 1
+    click.echo(f"Re-categorized {total} expense(s) for {users} user(s).")
+
+
+@reminders_cli.command("run")
+@click.option("--date", "on_date", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Run as of this date (defaults to today).")
+@click.option("--batch-size", default=1000, show_default=True,
+              help="Debts scanned and reminders delivered per transaction.")
+@click.option("--no-deliver", is_flag=True, help="Only queue reminders in the outbox.")
+@with_appcontext
+def reminders_run_command(on_date, batch_size, no_deliver):
+    """Queue reminders for debts due soon or overdue, then deliver the outbox"""
+    from flask import current_app
+    from utils.reminders import deliver_reminders, enqueue_reminders, get_sink
+    from utils.sharding import for_each_shard
+
+    config = current_app.config
+    sink = get_sink(config["REMINDER_SINK"])
+    for shard in for_each_shard():
+        queued = enqueue_reminders(
+            today=on_date.date() if on_date else None,
+            days_ahead=config["DEBT_REMINDER_DAYS"],
+            overdue_days=config["DEBT_REMINDER_OVERDUE_DAYS"],
+            batch_size=batch_size,
+        )
+        click.echo(f"[{shard}] Queued {queued} reminder(s).")
+        if not no_deliver:
+            sent, failed = deliver_reminders(sink, batch_size=batch_size)
+            click.echo(f"[{shard}] Delivered {sent} reminder(s), {failed} failed.")
+
+
+@shards_cli.command("move")
+@click.option("--user", "user_id", type=int, required=True, help="Id of the user to move.")
+@click.option("--to", "target", required=True, help="Target shard, e.g. shard_2 or default.")
+@click.option("--grace", default=2.0, show_default=True,
+              help="Seconds to let the user's in-flight requests finish before copying.")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows copied per insert.")
+@with_appcontext
+def shards_move_command(user_id, target, grace, batch_size):
+    """Move one user's data to another shard while the app keeps serving"""
+    from utils.sharding import move_user
+
+    copied = move_user(user_id, target, grace_seconds=grace, batch_size=batch_size)
+    click.echo(f"Moved {copied} row(s) of user {user_id} to {target}.")
+
+
+@shards_cli.command("list")
+@with_appcontext
+def shards_list_command():
+    """Show how many users each shard holds"""
+    from sqlalchemy import func
+    from models import db, ShardDirectory
+    from utils.sharding import shard_keys
+
+    counts = dict(db.session.execute(
+        db.select(ShardDirectory.shard, func.count()).group_by(ShardDirectory.shard)
+    ).all())
+    for key in shard_keys():
+        click.echo(f"{key:<12}{counts.get(key, 0):>8} user(s)")
+
+
+@balances_cli.command("backfill")
+@click.option("--batch-users", default=500, show_default=True,
+              help="How many users to rebuild per transaction.")
+@with_appcontext
+def balances_backfill_command(batch_users):
+    """Rebuild every user's daily balance history from their expenses"""
+    from utils.balances import backfill_balances
+    from utils.sharding import for_each_shard
+
+    written = sum(backfill_balances(batch_users=batch_users) for _ in for_each_shard())
+    click.echo(f"Wrote {written} daily balance(s).")
+
+
+@groups_cli.command("rebuild")
+@click.option("--group", "group_ids", type=int, multiple=True,
+              help="Group id to rebuild; repeatable. Defaults to every group.")
+@with_appcontext
+def groups_rebuild_command(group_ids):
+    """Recompute member balances from the full ledger of each group"""
+    from models import db, ExpenseGroup
+    from utils.ledger import rebuild_group_balances
+
+    group_ids = group_ids or db.session.scalars(db.select(ExpenseGroup.id)).all()
+    for group_id in group_ids:
+        rebuild_group_balances(group_id)
+        db.session.commit()
+    click.echo(f"Rebuilt balances of {len(group_ids)} group(s).")
+
+
+@receipts_cli.command("gc")
+@click.option("--grace-minutes", default=60, show_default=True,
+              help="Keep files written or reused this recently; uploads may not be committed yet.")
+@with_appcontext
+def receipts_gc_command(grace_minutes):
+    """Delete receipts of deleted expenses and the blobs nothing references"""
+    from utils.receipts import collect_garbage, referenced_blobs, remove_orphaned_attachments
+    from utils.sharding import for_each_shard
+
+    rows, referenced = 0, set()
+    for _ in for_each_shard():
+        rows += remove_orphaned_attachments()
+        referenced |= referenced_blobs()
+    removed, freed = collect_garbage(referenced, grace_seconds=grace_minutes * 60)
+    click.echo(f"Removed {rows} orphaned attachment(s) and {removed} file(s), freeing {freed} bytes.")
+
+
+@lookups_cli.command("migrate")
+@with_appcontext
+def migrate_lookups_command():
+    """Backfill category and merchant ids next to the legacy string columns"""
+    from utils.lookups import migrate_lookup_columns
+
+    migrated = migrate_lookup_columns()
+    click.echo(f"Backfilled {len(migrated)} column(s): {', '.join(migrated) or '-'}")
+
+
+@lookups_cli.command("verify")
+@with_appcontext
+def verify_lookups_command():
+    """Count rows whose lookup id does not match their legacy string"""
+    from utils.lookups import verify_lookup_columns
+
+    mismatches = verify_lookup_columns()
+    for name, rows in mismatches.items():
+        click.echo(f"  {name}: {rows} mismatched row(s)")
+    if any(mismatches.values()):
+        raise click.ClickException("Run `flask lookups migrate` before dropping the legacy columns.")
+    click.echo(f"Verified {len(mismatches)} legacy column(s).")
+
+
+@lookups_cli.command("drop-legacy")
+@with_appcontext
+def drop_legacy_lookups_command():
+    """Drop the legacy string columns once every row has been verified"""
+    from utils.lookups import drop_legacy_lookup_columns
+
+    try:
+        dropped = drop_legacy_lookup_columns()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Dropped {len(dropped)} column(s): {', '.join(dropped) or '-'}")
+
+
+def register_commands(app):
+    """Attach the management command groups to the app's CLI"""
+    app.cli.add_command(budgets_cli)
+    app.cli.add_command(fx_cli)
+    app.cli.add_command(partitions_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(loadtest_cli)
+    app.cli.add_command(rules_cli)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(balances_cli)
+    app.cli.add_command(groups_cli)
+    app.cli.add_command(receipts_cli)
+    app.cli.add_command(lookups_cli)
@@ -0,0 +1,135 @@
+import zlib
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class _GzipEncoder:
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self, level):
+        # Brotli quality runs 0-11; the shared gzip-style level is used as-is
+        self._obj = brotli.Compressor(quality=min(11, max(0, level)))
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class CompressionMiddleware:
+    """WSGI middleware compressing text responses with brotli or gzip.
+
+    Responses with a known Content-Length below min_size are passed through.
+    Responses without a Content-Length are treated as streams: each chunk is
+    compressed and flushed as it is produced, so nothing is buffered.
+    """
+
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def _choose_encoding(self, environ):
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return None
+        accept = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING"))
+        if brotli is not None and accept["br"]:
+            return "br"
+        if accept["gzip"]:
+            return "gzip"
+        return None
+
+    def _should_compress(self, status, headers):
+        code = int(status[:3])
+        if code < 200 or code in (204, 206, 304):
+            return False
+        content_type = ""
+        for name, value in headers:
+            lname = name.lower()
+            if lname == "content-encoding":
+                return False
+            if lname == "content-type":
+                content_type = value.lower()
+            if lname == "content-length" and int(value) < self.min_size:
+                return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def __call__(self, environ, start_response):
+        encoding = self._choose_encoding(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        captured = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured["args"] = (status, headers, exc_info)
+            return lambda data: None  # The legacy write() callable is not supported
+
+        app_iter = self.app(environ, capture_start_response)
+        status, headers, exc_info = captured["args"]
+
+        if not self._should_compress(status, headers):
+            start_response(status, headers, exc_info)
+            return app_iter
+
+        streaming = not any(name.lower() == "content-length" for name, _ in headers)
+        headers = [
+            (name, value)
+            for name, value in headers
+            if name.lower() not in ("content-length", "vary")
+        ]
+        vary = [value for name, value in captured["args"][1] if name.lower() == "vary"]
+        headers.append(("Vary", ", ".join(vary + ["Accept-Encoding"])))
+        headers.append(("Content-Encoding", encoding))
+        encoder = _BrotliEncoder(self.level) if encoding == "br" else _GzipEncoder(self.level)
+
+        if streaming:
+            start_response(status, headers, exc_info)
+            return self._stream(app_iter, encoder)
+
+        try:
+            body = b"".join(encoder.compress(chunk) for chunk in app_iter) + encoder.finish()
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        headers.append(("Content-Length", str(len(body))))
+        start_response(status, headers, exc_info)
+        return [body]
+
+    def _stream(self, app_iter, encoder):
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    yield encoder.compress(chunk) + encoder.flush()
+            yield encoder.finish()
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
@@ -0,0 +1,23 @@
+from flask import g
+from sqlalchemy import select, update
+from models import db, User
+from utils.live_updates import notify_change
+
+
+def bump_data_version(user_id):
+    """Mark the user's data as changed; runs inside the caller's transaction"""
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+    )
+    notify_change(user_id)
+    g.pop("data_versions", None)
+
+
+def get_data_version(user_id):
+    """Return the user's current data version (one primary-key lookup per request)"""
+    versions = g.setdefault("data_versions", {})
+    if user_id not in versions:
+        versions[user_id] = db.session.scalar(select(User.data_version).where(User.id == user_id)) or 0
+    return versions[user_id]
@@ -1,10 +1,22 @@
 from models import Expense, db, User
+from utils.lookups import unmigrated_lookup_columns
+from utils.partitioning import ensure_partitions, needs_partition_migration
+from utils.sharding import prepare_shards, sharding_enabled, sync_directory
 from datetime import datetime, timedelta
 
 def init_db(app):
     """Create the tables and the initial admin user"""
     with app.app_context():
         db.create_all()
+        # create_all skips existing tables; add indexes introduced since they were created
+        for index in Expense.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        pending = unmigrated_lookup_columns()
+        if pending:
+            print(f"Legacy lookup columns need `flask lookups migrate`: {', '.join(pending)}")
+        if needs_partition_migration():
+            print("The expenses table is not partitioned yet: run `flask partitions migrate`")
+        ensure_partitions()
 
         admin = User.query.filter_by(username="admin").first()
         if not admin:
@@ -16,6 +28,10 @@ def init_db(app):
         else:
             print("Database already initialized")
 
+        if sharding_enabled():
+            prepare_shards()
+            sync_directory()
+
 def seed_predefined_data(app):
     """Create 5 users with predefined expenses."""
     with app.app_context():
@@ -96,4 +112,6 @@ def seed_predefined_data(app):
                 total_expenses += 1
 
         db.session.commit()
-        print(f"Created {total_expenses} predefined expenses across all users.")
\ No newline at end of file
+        print(f"Created {total_expenses} predefined expenses across all users.")
+        if sharding_enabled():
+            sync_directory()
\ No newline at end of file
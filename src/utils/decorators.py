@@ -1,5 +1,6 @@
+from datetime import date
 from functools import wraps
-from flask import session, flash, redirect, url_for
+from flask import session, flash, redirect, url_for, request, current_app, make_response, g, abort
 
 
 def login_required(f):
@@ -13,3 +14,73 @@ def login_required(f):
         return f(*args, **kwargs)
 
     return decorated_function
+
+
+def admin_required(f):
+    """Decorator restricting a route to administrators"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if "user_id" not in session:
+            flash("Please log in first", "warning")
+            return redirect(url_for("auth.login"))
+        if not session.get("is_admin"):
+            abort(403)
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def read_only(f):
+    """Decorator marking a view as read-only so its queries may use a replica"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def etag_by_data_version(f):
+    """Decorator answering conditional GETs from the user's data version.
+
+    The weak ETag covers the endpoint, the user's data version, their base
+    currency and today's date (overdue flags change daily). A matching
+    If-None-Match returns 304 before the view runs any query or renders any
+    template. Pages carrying flashed messages are never tagged.
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method != "GET" or session.get("_flashes"):
+            return f(*args, **kwargs)
+
+        from utils.data_version import get_data_version
+
+        user_id = session.get("user_id")
+        etag = "-".join(
+            str(part)
+            for part in (
+                request.endpoint,
+                request.query_string.decode(),
+                user_id,
+                get_data_version(user_id),
+                session.get("base_currency", ""),
+                date.today().isoformat(),
+                current_app.config.get("ETAG_SALT", ""),
+            )
+        )
+
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return decorated_function
@@ -0,0 +1,166 @@
+import csv
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import case, delete, func, insert, select, true, update
+from models import db, Expense, FxRate, TimeseriesBucket, User
+
+DEFAULT_CURRENCY = "USD"
+
+_RATE_CACHE_SIZE = 10000
+_rate_cache = {}
+
+
+def _latest_rate(currency, name):
+    """LATERAL subquery: the rate of currency on the expense date, or the latest one before it"""
+    return (
+        select(FxRate.rate)
+        .where(FxRate.currency == currency, FxRate.rate_date <= Expense.date)
+        .order_by(FxRate.rate_date.desc())
+        .limit(1)
+        .lateral(name)
+    )
+
+
+def latest_rate_join(alias, currency, day):
+    """Raw SQL LEFT JOIN LATERAL exposing alias.rate, the latest rate of currency on or before day.
+
+    The hand-written statements use this instead of _latest_rate(), so they
+    convert exactly what converted_amount() does. currency and day are SQL
+    expressions.
+    """
+    return (
+        f"LEFT JOIN LATERAL (SELECT rate FROM fx_rates WHERE currency = {currency} AND rate_date <= {day} "
+        f"ORDER BY rate_date DESC LIMIT 1) {alias} ON true"
+    )
+
+
+# Rate of each expense's own currency, and of each base currency, as of the expense date
+src_rate = _latest_rate(Expense.currency, "src_rate")
+
+
+@lru_cache(maxsize=64)
+def _base_rate(base_currency):
+    return _latest_rate(base_currency, "base_rate")
+
+
+def converted_amount(base_currency):
+    """SQL expression for Expense.amount expressed in base_currency.
+
+    Requires the query to be joined with join_rates(). Expenses already in the
+    base currency are never converted. Others use the latest rates on or before
+    their date; with no such rate they evaluate to NULL and are left out of
+    sums, see unconverted_count().
+    """
+    return case(
+        (Expense.currency == base_currency, Expense.amount),
+        else_=Expense.amount * src_rate.c.rate / _base_rate(base_currency).c.rate,
+    )
+
+
+def unconverted_count(base_currency):
+    """SQL aggregate counting the expenses converted_amount() cannot convert"""
+    return func.count(Expense.id).filter(converted_amount(base_currency).is_(None))
+
+
+def join_rates(query, base_currency):
+    """Outer-join the latest rates of the expense and base currencies as of the expense date"""
+    return query.select_from(Expense).outerjoin(src_rate, true()).outerjoin(_base_rate(base_currency), true())
+
+
+def parse_currency(value, default=DEFAULT_CURRENCY):
+    """Normalize a submitted ISO 4217 code, falling back to default when blank"""
+    code = (value or "").strip().upper() or default
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError(f"Invalid currency code: {value}")
+    return code
+
+
+def get_rate(currency, day):
+    """Return the pivot rate of currency on day, or the latest one before it, or None.
+
+    Exact-day hits are kept in an in-process cache. Fallbacks and misses are
+    not, so rates loaded later by another process become visible without a
+    restart.
+    """
+    key = (currency, day)
+    rate = _rate_cache.get(key)
+    if rate is None:
+        row = db.session.execute(
+            select(FxRate.rate_date, FxRate.rate)
+            .where(FxRate.currency == currency, FxRate.rate_date <= day)
+            .order_by(FxRate.rate_date.desc())
+            .limit(1)
+        ).first()
+        if row is None:
+            return None
+        rate = row.rate
+        if row.rate_date == day:
+            if len(_rate_cache) >= _RATE_CACHE_SIZE:
+                _rate_cache.clear()
+            _rate_cache[key] = rate
+    return rate
+
+
+def convert(amount, currency, base_currency, day):
+    """Convert a single amount into base_currency using the rates as of day"""
+    if currency == base_currency:
+        return amount
+    src = get_rate(currency, day)
+    base = get_rate(base_currency, day)
+    if src is None or base is None:
+        return None
+    return amount * src / base
+
+
+def clear_rate_cache():
+    _rate_cache.clear()
+
+
+def load_rates(path, pivot=DEFAULT_CURRENCY, fill_to=None):
+    """Load daily rates from a CSV file with date,currency,rate columns.
+
+    Gaps (weekends, holidays) are forward-filled with the previous known rate up
+    to fill_to; later dates fall back to the last stored rate when converting.
+    Rows for the pivot currency are written with a rate of 1. Returns the
+    number of rows stored.
+    """
+    rates = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            day = datetime.strptime(row["date"].strip(), "%Y-%m-%d").date()
+            currency = row["currency"].strip().upper()
+            rates.setdefault(currency, {})[day] = float(row["rate"])
+
+    if not rates:
+        return 0
+
+    first = min(min(days) for days in rates.values())
+    last = max(fill_to or date.today(), max(max(days) for days in rates.values()))
+    rates.setdefault(pivot, {first: 1.0})
+
+    rows = []
+    for currency, known in rates.items():
+        day = min(known)
+        rate = None
+        while day <= last:
+            rate = known.get(day, rate)
+            rows.append({"currency": currency, "rate_date": day, "rate": rate})
+            day += timedelta(days=1)
+
+    db.session.execute(
+        delete(FxRate).where(
+            FxRate.currency.in_(list(rates)),
+            FxRate.rate_date >= first,
+            FxRate.rate_date <= last,
+        )
+    )
+    db.session.execute(insert(FxRate), rows)
+    # Converted totals may change for everyone, so invalidate all cached pages
+    db.session.execute(update(User).values(data_version=User.data_version + 1))
+    db.session.execute(delete(TimeseriesBucket))
+    db.session.commit()
+    clear_rate_cache()
+    from utils.snapshots import invalidate_snapshots
+
+    invalidate_snapshots()
+    return len(rows)
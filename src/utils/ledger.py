@@ -0,0 +1,115 @@
+import heapq
+from sqlalchemy import bindparam, func, select, update
+from models import db, ExpenseSplit, GroupMember, SharedExpense
+
+_ADJUST_BALANCE = (
+    update(GroupMember.__table__)
+    .where(GroupMember.group_id == bindparam("b_group_id"), GroupMember.user_id == bindparam("b_user_id"))
+    .values(balance=GroupMember.balance + bindparam("b_delta"))
+)
+
+
+def _cents(amount):
+    return int(round(amount * 100))
+
+
+def split_evenly(amount, user_ids):
+    """Split amount into equal shares per user id; leftover cents go to the first users"""
+    each, extra = divmod(_cents(amount), len(user_ids))
+    return {user_id: (each + (1 if i < extra else 0)) / 100 for i, user_id in enumerate(user_ids)}
+
+
+def _balance_deltas(entry, shares):
+    # The payer is credited exactly what the shares add up to, so balances net to zero
+    deltas = {entry.paid_by: sum(shares.values())}
+    for user_id, share in shares.items():
+        deltas[user_id] = deltas.get(user_id, 0.0) - share
+    return deltas
+
+
+def _adjust_balances(group_id, deltas, sign=1):
+    # A fixed row order keeps concurrent writers to one group from deadlocking
+    rows = [
+        {"b_group_id": group_id, "b_user_id": user_id, "b_delta": sign * delta}
+        for user_id, delta in sorted(deltas.items())
+        if delta
+    ]
+    if rows:
+        db.session.execute(_ADJUST_BALANCE, rows)
+
+
+def add_shared_expense(group_id, paid_by, name, amount, day, shares, kind="expense"):
+    """Record an entry in the group ledger and move the members' balances by it.
+
+    shares maps member ids to what they owe of amount and must add up to it in
+    whole cents; the payer is owed all of it. A payment is an entry whose
+    single share is the member being repaid. Runs inside the caller's
+    transaction.
+    """
+    shares = {user_id: _cents(share) / 100 for user_id, share in shares.items()}
+    if sum(_cents(share) for share in shares.values()) != _cents(amount):
+        raise ValueError("Shares must add up to the amount")
+    amount = _cents(amount) / 100
+    entry = SharedExpense(group_id=group_id, paid_by=paid_by, name=name, amount=amount, date=day, kind=kind)
+    entry.splits = [ExpenseSplit(user_id=user_id, share=share) for user_id, share in shares.items()]
+    db.session.add(entry)
+    _adjust_balances(group_id, _balance_deltas(entry, shares))
+    return entry
+
+
+def remove_shared_expense(entry):
+    """Delete a ledger entry and take its effect back out of the balances"""
+    shares = {split.user_id: split.share for split in entry.splits}
+    _adjust_balances(entry.group_id, _balance_deltas(entry, shares), sign=-1)
+    db.session.delete(entry)
+
+
+def rebuild_group_balances(group_id):
+    """Recompute every member's balance of a group from its full ledger"""
+    paid = (
+        select(SharedExpense.paid_by.label("user_id"), SharedExpense.amount.label("delta"))
+        .where(SharedExpense.group_id == group_id)
+    )
+    owed = (
+        select(ExpenseSplit.user_id, -ExpenseSplit.share)
+        .join(SharedExpense, SharedExpense.id == ExpenseSplit.shared_expense_id)
+        .where(SharedExpense.group_id == group_id)
+    )
+    ledger = paid.union_all(owed).subquery()
+    totals = (
+        select(func.sum(ledger.c.delta))
+        .where(ledger.c.user_id == GroupMember.user_id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(GroupMember)
+        .where(GroupMember.group_id == group_id)
+        .values(balance=func.coalesce(totals, 0.0))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def settle(balances):
+    """Return the transfers (debtor, creditor, amount) that clear the given net balances.
+
+    Greedy over two max-heaps: the largest debtor always pays the largest
+    creditor as much as they can, and whoever has a remainder goes back on
+    their heap. Every transfer clears at least one member, so there are at most
+    n - 1 of them, found in O(n log n). Amounts are settled in whole cents.
+    """
+    creditors = [(-_cents(balance), user_id) for user_id, balance in balances.items() if _cents(balance) > 0]
+    debtors = [(_cents(balance), user_id) for user_id, balance in balances.items() if _cents(balance) < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount / 100))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
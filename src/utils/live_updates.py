@@ -0,0 +1,126 @@
+import logging
+import queue
+import select
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine, event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.pool import NullPool
+from models import db
+from models.routing import RoutingSession
+from utils.metrics import set_gauge
+
+CHANNEL = "data_changes"
+logger = logging.getLogger(__name__)
+
+
+class ChangeBroker:
+    """Fans per-user change signals out to the live streams of this worker process.
+
+    On Postgres, writers NOTIFY inside their transaction and one LISTEN thread per
+    process and database (primary plus shards) relays the signals; elsewhere
+    commits publish in-process. Each stream
+    owns a one-slot queue, so bursts of writes collapse into a single wake-up.
+    """
+
+    def __init__(self, database_uri, max_connections=100, shard_uris=()):
+        self.database_uri = database_uri
+        self.shard_uris = list(shard_uris)
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._connections = 0
+        self._listeners = None
+
+    def subscribe(self, user_id):
+        """Register a stream; returns its queue, or None when the worker is at capacity"""
+        with self._lock:
+            if self._connections >= self.max_connections:
+                return None
+            self._connections += 1
+            set_gauge("sse_connections", self._connections)
+            signals = queue.Queue(maxsize=1)
+            self._subscribers.setdefault(user_id, set()).add(signals)
+            if self._listeners is None and self.database_uri.startswith("postgresql"):
+                self._listeners = [
+                    threading.Thread(target=self._listen, args=(uri,), name="live-updates", daemon=True)
+                    for uri in [self.database_uri, *self.shard_uris]
+                ]
+                for listener in self._listeners:
+                    listener.start()
+        return signals
+
+    def unsubscribe(self, user_id, signals):
+        with self._lock:
+            streams = self._subscribers.get(user_id, set())
+            streams.discard(signals)
+            if not streams:
+                self._subscribers.pop(user_id, None)
+            self._connections -= 1
+            set_gauge("sse_connections", self._connections)
+
+    def publish(self, user_id):
+        """Wake every stream of user_id"""
+        with self._lock:
+            streams = list(self._subscribers.get(user_id, ()))
+        for signals in streams:
+            try:
+                signals.put_nowait(True)
+            except queue.Full:
+                pass  # A wake-up is already pending
+
+    def _listen(self, database_uri):
+        """Relay NOTIFY payloads (user ids) to local streams, reconnecting on errors"""
+        engine = create_engine(database_uri, poolclass=NullPool)
+        while True:
+            try:
+                conn = engine.raw_connection()
+                try:
+                    conn.driver_connection.autocommit = True
+                    conn.cursor().execute(f"LISTEN {CHANNEL}")
+                    pg = conn.driver_connection
+                    while True:
+                        if select.select([pg], [], [], 5) == ([], [], []):
+                            continue
+                        pg.poll()
+                        while pg.notifies:
+                            self.publish(int(pg.notifies.pop(0).payload))
+                finally:
+                    conn.close()
+            except Exception:
+                logger.exception("Live update listener lost its connection; retrying")
+                time.sleep(5)
+
+
+def init_live_updates(app):
+    app.extensions["live_updates"] = ChangeBroker(
+        app.config["SQLALCHEMY_DATABASE_URI"],
+        app.config.get("SSE_MAX_CONNECTIONS", 100),
+        app.config.get("SQLALCHEMY_SHARD_URIS") or (),
+    )
+
+
+def notify_change(user_id):
+    """Signal live streams that user_id's data changed once the transaction commits"""
+    if db.engine.dialect.name == "postgresql":
+        # NOTIFY is transactional: it is only delivered if the write commits
+        db.session.execute(sql_select(func.pg_notify(CHANNEL, str(user_id))))
+    else:
+        db.session.info.setdefault("changed_users", set()).add(user_id)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_committed(session):
+    changed = session.info.pop("changed_users", None)
+    if not changed or not has_app_context():
+        return
+    broker = current_app.extensions.get("live_updates")
+    if broker is not None:
+        for user_id in changed:
+            broker.publish(user_id)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _drop_uncommitted(session):
+    session.info.pop("changed_users", None)
@@ -0,0 +1,212 @@
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date
+from http.cookiejar import CookieJar
+
+BROWSE_PAGES = ("/", "/expenses", "/debts", "/summary")
+LOGIN_PATH = "/login"
+DASHBOARD_PATH = "/"
+DEFAULT_MIX = {"browse": 80, "create": 10, "edit": 5, "delete": 5}
+_EXPENSE_LINK = re.compile(r"/expenses/(\d+)/edit")
+
+
+def parse_mix(value):
+    """Parse "browse=80,create=10,edit=5,delete=5" into action weights"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        action, _, weight = part.partition("=")
+        if action not in DEFAULT_MIX:
+            raise ValueError(f"Unknown action in mix: {action}")
+        mix[action] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("The action mix needs at least one positive weight")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class StageStats:
+    """Latencies and errors per endpoint, shared by every simulated user of a stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def endpoint_report(self):
+        """Per-endpoint rows of (endpoint, requests, req/s, p50, p95, p99 in ms, error rate)"""
+        rows = []
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            rows.append((
+                endpoint,
+                len(values),
+                len(values) / self.elapsed if self.elapsed else 0.0,
+                percentile(values, 50) * 1000,
+                percentile(values, 95) * 1000,
+                percentile(values, 99) * 1000,
+                self.errors.get(endpoint, 0) / len(values),
+            ))
+        return rows
+
+    @property
+    def requests(self):
+        return sum(len(v) for v in self.latencies.values())
+
+    @property
+    def throughput(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        return sum(self.errors.values()) / self.requests if self.requests else 0.0
+
+    def latency_percentile(self, pct):
+        return percentile(sorted(v for values in self.latencies.values() for v in values), pct)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects instead of following them, so each request is timed alone"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class SimulatedUser(threading.Thread):
+    """One logged-in browser session issuing a weighted mix of actions"""
+
+    def __init__(self, base_url, username, password, stats, mix, think_time, deadline, seed=None):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.stats = stats
+        self.actions, self.weights = zip(*[(a, w) for a, w in mix.items() if w > 0])
+        self.think_time = think_time
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.expense_ids = []
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, endpoint, path, form=None, expect=None):
+        """Issue one request, record it, and return the body (None on failure).
+
+        A redirect counts as success unless it leads to the login page, which
+        means the session was lost. With expect, the request only succeeds if
+        it redirects to that path.
+        """
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=data, timeout=30) as response:
+                body = response.read()
+            ok = expect is None
+        except urllib.error.HTTPError as e:
+            # Redirects surface as errors because they are not followed
+            location = urllib.parse.urlsplit(e.headers.get("Location", "")).path
+            if expect is not None:
+                ok = 300 <= e.code < 400 and location == expect
+            else:
+                ok = e.code < 400 and location != LOGIN_PATH
+            body = e.read() if ok else None
+        except OSError:
+            body, ok = None, False
+        self.stats.record(endpoint, time.perf_counter() - started, ok)
+        return body if ok else None
+
+    def login(self):
+        """Sign in and return whether the app sent us on to the dashboard"""
+        form = {"username": self.username, "password": self.password}
+        return self.request("POST /login", LOGIN_PATH, form, expect=DASHBOARD_PATH) is not None
+
+    def browse(self):
+        path = self.random.choice(BROWSE_PAGES)
+        body = self.request(f"GET {path}", path)
+        if path == "/expenses" and body:
+            self.expense_ids = [int(i) for i in _EXPENSE_LINK.findall(body.decode(errors="replace"))]
+
+    def _expense_form(self):
+        return {
+            "name": f"Load test {self.random.randint(1, 10**6)}",
+            "amount": f"{self.random.uniform(1, 200):.2f}",
+            "category": self.random.choice(("Food", "Transport", "Housing", "Leisure")),
+            "date": date.today().isoformat(),
+        }
+
+    def create(self):
+        self.request("POST /expenses/new", "/expenses/new", self._expense_form())
+
+    def edit(self):
+        if not self.expense_ids:
+            return self.browse()
+        expense_id = self.random.choice(self.expense_ids)
+        self.request("POST /expenses/<id>/edit", f"/expenses/{expense_id}/edit", self._expense_form())
+
+    def delete(self):
+        if not self.expense_ids:
+            return self.browse()
+        expense_id = self.expense_ids.pop(self.random.randrange(len(self.expense_ids)))
+        self.request("POST /expenses/<id>/delete", f"/expenses/{expense_id}/delete", {})
+
+    def run(self):
+        # Without a session every action would just bounce to the login page
+        if not self.login():
+            return
+        while time.monotonic() < self.deadline:
+            action = self.random.choices(self.actions, self.weights)[0]
+            getattr(self, action)()
+            if self.think_time:
+                time.sleep(self.random.uniform(0, 2 * self.think_time))
+
+
+def run_stage(base_url, credentials, duration, mix=DEFAULT_MIX, think_time=0.5, seed=None):
+    """Run one user per (username, password) pair for `duration` seconds"""
+    stats = StageStats()
+    started = time.monotonic()
+    deadline = started + duration
+    users = [
+        SimulatedUser(base_url, username, password, stats, mix, think_time, deadline,
+                      seed=None if seed is None else seed + i)
+        for i, (username, password) in enumerate(credentials)
+    ]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    stats.elapsed = time.monotonic() - started
+    return stats
+
+
+def find_saturation(stages, min_gain=0.1, max_error_rate=0.01):
+    """Return the user count past which adding users stopped helping, or None.
+
+    `stages` is a list of (users, StageStats) in increasing user order. The
+    saturation point is the last stage before throughput grew by less than
+    min_gain, or before the error rate exceeded max_error_rate.
+    """
+    for (users, stats), (_, following) in zip(stages, stages[1:]):
+        if following.error_rate > max_error_rate:
+            return users
+        if following.throughput < stats.throughput * (1 + min_gain):
+            return users
+    return None
@@ -0,0 +1,332 @@
+import threading
+from flask import g, has_app_context
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, Category, Merchant
+from models.routing import DEFAULT_SHARD, RoutingSession
+
+_CACHE_SIZE = 100_000
+
+
+def _bound_shard():
+    """Key of the non-default shard bound to the app context, if any"""
+    key = g.get("shard_key") if has_app_context() else None
+    return None if key == DEFAULT_SHARD else key
+
+
+class LookupCache:
+    """Per-process two-way cache between the names and ids of a lookup table.
+
+    Lookup rows are never updated or deleted, so cached entries stay valid for
+    the life of the database. New names are inserted in their own committed
+    transaction: an id handed out survives a rollback of the caller's work.
+    The primary database assigns the ids; when a shard is bound, the row is
+    copied to it under the same id before the id is handed out.
+    id_in_session() instead writes new rows with the caller's transaction.
+    """
+
+    def __init__(self, model):
+        self.table = model.__table__
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._names = {}
+        self._on_shard = {}
+
+    def _remember(self, rows):
+        with self._lock:
+            if len(self._ids) + len(rows) > _CACHE_SIZE:
+                self._ids.clear()
+                self._names.clear()
+            for id_, name in rows:
+                self._ids[name] = id_
+                self._names[id_] = name
+
+    def id_for(self, name):
+        """Return the id of name, creating the row on first use"""
+        if not name:
+            return None
+        if name not in self._ids and name in self._pending():
+            # The session wrote this row and holds its lock until it commits
+            return self.id_in_session(name)
+        found = self._ids.get(name)
+        if found is None:
+            table = self.table
+            with db.engine.begin() as conn:
+                found = conn.scalar(select(table.c.id).where(table.c.name == name))
+                if found is None:
+                    # The no-op update makes RETURNING yield the id when another process won the race
+                    found = conn.scalar(
+                        pg_insert(table)
+                        .values(name=name)
+                        .on_conflict_do_update(index_elements=[table.c.name], set_={"name": name})
+                        .returning(table.c.id)
+                    )
+            self._remember([(found, name)])
+        self._copy_to_shard(found, name)
+        return found
+
+    def id_in_session(self, name, session=None):
+        """Return the id of name, inserting a missing row in the session's transaction.
+
+        Nothing is committed here: the row is written with the caller's work and
+        only cached once that commits, so a rollback leaves no id behind.
+        """
+        if not name:
+            return None
+        session = session or db.session
+        key = _bound_shard()
+        pending = session.info.setdefault("pending_lookups", {})
+        found = self._ids.get(name) or pending.get((self.table.name, name, None))
+        if found is None:
+            table = self.table
+            # Ids are assigned by the primary database even while a shard is bound
+            primary = {"bind": db.engine}
+            found = session.scalar(select(table.c.id).where(table.c.name == name), bind_arguments=primary)
+            if found is None:
+                found = session.scalar(
+                    pg_insert(table)
+                    .values(name=name)
+                    .on_conflict_do_update(index_elements=[table.c.name], set_={"name": name})
+                    .returning(table.c.id),
+                    bind_arguments=primary,
+                )
+            pending[(table.name, name, None)] = found
+        copied = found in self._on_shard.get(key, ()) or (self.table.name, name, key) in pending
+        if key is not None and not copied:
+            # Routed to the bound shard, so its foreign keys hold once both commit
+            session.execute(pg_insert(self.table).values(id=found, name=name).on_conflict_do_nothing())
+            pending[(self.table.name, name, key)] = found
+        return found
+
+    def _pending(self, shard_key=None):
+        """{name: id} of rows id_in_session() wrote in the current, uncommitted transaction"""
+        if not has_app_context():
+            return {}
+        pending = db.session.info.get("pending_lookups", {})
+        return {
+            name: id_ for (table, name, key), id_ in pending.items()
+            if table == self.table.name and key == shard_key
+        }
+
+    def _publish(self, name, id_, shard_key):
+        if shard_key is None:
+            self._remember([(id_, name)])
+        else:
+            with self._lock:
+                self._on_shard.setdefault(shard_key, set()).add(id_)
+
+    def _copy_to_shard(self, id_, name):
+        """Make sure the bound shard has the row, so its foreign keys hold"""
+        key = _bound_shard()
+        if key is None or id_ in self._on_shard.get(key, ()) or name in self._pending(key):
+            return
+        from utils.sharding import shard_engine
+
+        with shard_engine(key).begin() as conn:
+            conn.execute(pg_insert(self.table).values(id=id_, name=name).on_conflict_do_nothing())
+        with self._lock:
+            self._on_shard.setdefault(key, set()).add(id_)
+
+    def names_for(self, ids):
+        """Return {id: name} for ids, fetching unknown ones in one query"""
+        wanted = {i for i in ids if i is not None}
+        missing = wanted - self._names.keys()
+        uncommitted = {id_: name for name, id_ in self._pending().items()} if missing else {}
+        missing -= uncommitted.keys()
+        if missing:
+            table = self.table
+            with db.engine.connect() as conn:
+                self._remember(conn.execute(
+                    select(table.c.id, table.c.name).where(table.c.id.in_(missing))
+                ).all())
+        names = self._names
+        return {i: names.get(i, uncommitted.get(i)) for i in wanted}
+
+    def name_for(self, id_):
+        if id_ is None:
+            return None
+        name = self._names.get(id_)
+        return name if name is not None else self.names_for([id_])[id_]
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._names.clear()
+            self._on_shard.clear()
+
+
+categories = LookupCache(Category)
+merchants = LookupCache(Merchant)
+
+# A freshly created table has no rows; forget ids cached from a previous one
+event.listen(Category.__table__, "after_create", lambda *args, **kwargs: categories.clear())
+event.listen(Merchant.__table__, "after_create", lambda *args, **kwargs: merchants.clear())
+
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _publish_pending_lookups(session):
+    caches = {cache.table.name: cache for cache in (categories, merchants)}
+    for (table, name, shard_key), id_ in session.info.pop("pending_lookups", {}).items():
+        caches[table]._publish(name, id_, shard_key)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_pending_lookups(session):
+    session.info.pop("pending_lookups", None)
+
+# (table, legacy column, lookup table, new column) pairs converted by the migration
+_LEGACY_COLUMNS = (
+    ("expenses", "category", "categories", "category_id"),
+    ("expenses", "element", "merchants", "merchant_id"),
+    ("expenses_archive", "category", "categories", "category_id"),
+    ("expenses_archive", "element", "merchants", "merchant_id"),
+    ("expense_monthly_totals", "category", "categories", "category_id"),
+)
+
+
+def _legacy_columns(engine):
+    """(table, legacy, lookup, column, backfilled) for each legacy string column still present"""
+    if engine.dialect.name != "postgresql":
+        return []
+    inspector = inspect(engine)
+    found = []
+    for table, legacy, lookup, column in _LEGACY_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        names = {c["name"] for c in inspector.get_columns(table)}
+        if legacy in names:
+            found.append((table, legacy, lookup, column, column in names))
+    return found
+
+
+def _shard_engines():
+    """Yield (shard key, engine) for the primary and every shard.
+
+    The migration works on the engines directly, so unlike for_each_shard()
+    this leaves the caller's session alone.
+    """
+    from utils.sharding import shard_engine, shard_keys
+
+    for key in shard_keys():
+        yield key, shard_engine(key)
+
+
+def _label(key, table, legacy):
+    return f"{table}.{legacy}" if key == DEFAULT_SHARD else f"{key}:{table}.{legacy}"
+
+
+def unmigrated_lookup_columns():
+    """Return the "table.column" legacy string columns that have no id column next to them yet.
+
+    Columns on a shard other than the default one are prefixed with "shard:".
+    """
+    return [
+        _label(key, table, legacy)
+        for key, engine in _shard_engines()
+        for table, legacy, _, _, backfilled in _legacy_columns(engine)
+        if not backfilled
+    ]
+
+
+def _assign_lookup_ids(engine, columns):
+    """Give every legacy name on engine its lookup row, with the id the primary assigns.
+
+    Runs before the migration's own transaction: adding the foreign keys locks
+    the lookup tables against the inserts made here.
+    """
+    lookups = {c.table.name: c.table for c in (categories, merchants)}
+    wanted = {}
+    with engine.connect() as conn:
+        for table, legacy, lookup, _, _ in columns:
+            wanted.setdefault(lookup, set()).update(conn.scalars(text(
+                f"SELECT DISTINCT {legacy} FROM {table} WHERE {legacy} IS NOT NULL"
+            )))
+    for lookup, names in wanted.items():
+        if not names:
+            continue
+        table = lookups[lookup]
+        with db.engine.begin() as conn:
+            conn.execute(pg_insert(table).values([{"name": name} for name in names]).on_conflict_do_nothing())
+            rows = conn.execute(select(table.c.id, table.c.name).where(table.c.name.in_(names))).all()
+        if engine is not db.engine:
+            with engine.begin() as conn:
+                conn.execute(pg_insert(table).values(
+                    [{"id": id_, "name": name} for id_, name in rows]
+                ).on_conflict_do_nothing())
+
+
+def migrate_lookup_columns():
+    """Backfill lookup ids next to the legacy string category/element columns, on every shard.
+
+    Distinct values get their lookup rows, ids assigned by the primary and
+    copied to the shard holding them, and every row without an id gets the
+    matching one. The string columns are kept, but made nullable so new rows
+    can leave them empty, until drop_legacy_lookup_columns(). The monthly
+    totals primary key moves from the name to the id, as upserts target it.
+    Safe to run again. Returns the backfilled "table.column" names.
+    """
+    migrated = []
+    for key, engine in _shard_engines():
+        columns = _legacy_columns(engine)
+        _assign_lookup_ids(engine, columns)
+        with engine.begin() as conn:
+            for table, legacy, lookup, column, _ in columns:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} integer REFERENCES {lookup} (id)"
+                ))
+                conn.execute(text(
+                    f"UPDATE {table} t SET {column} = l.id FROM {lookup} l "
+                    f"WHERE l.name = t.{legacy} AND t.{column} IS NULL"
+                ))
+                if legacy == "category":
+                    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+                primary_key = inspect(conn).get_pk_constraint(table)
+                if legacy in primary_key["constrained_columns"]:
+                    conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{primary_key["name"]}"'))
+                    conn.execute(text(
+                        "ALTER TABLE expense_monthly_totals "
+                        "ADD PRIMARY KEY (user_id, month, category_id, currency)"
+                    ))
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {legacy} DROP NOT NULL"))
+                migrated.append(_label(key, table, legacy))
+    categories.clear()
+    merchants.clear()
+    return migrated
+
+
+def verify_lookup_columns():
+    """Return {"table.column": rows} counting rows whose id does not name their legacy string, on every shard"""
+    mismatches = {}
+    for key, engine in _shard_engines():
+        with engine.connect() as conn:
+            for table, legacy, lookup, column, backfilled in _legacy_columns(engine):
+                if not backfilled:
+                    query = f"SELECT count(*) FROM {table} WHERE {legacy} IS NOT NULL"
+                else:
+                    query = (
+                        f"SELECT count(*) FROM {table} t LEFT JOIN {lookup} l ON l.id = t.{column} "
+                        f"WHERE t.{legacy} IS NOT NULL AND l.name IS DISTINCT FROM t.{legacy}"
+                    )
+                mismatches[_label(key, table, legacy)] = conn.scalar(text(query))
+    return mismatches
+
+
+def drop_legacy_lookup_columns():
+    """Drop the legacy string columns on every shard once every row's id has been verified.
+
+    Raises ValueError, dropping nothing anywhere, while verify_lookup_columns()
+    still reports mismatched rows. Returns the dropped "table.column" names.
+    """
+    mismatched = {name: rows for name, rows in verify_lookup_columns().items() if rows}
+    if mismatched:
+        raise ValueError("Rows do not match their lookup ids yet: " + ", ".join(
+            f"{name} ({rows})" for name, rows in mismatched.items()
+        ))
+    dropped = []
+    for key, engine in _shard_engines():
+        with engine.begin() as conn:
+            for table, legacy, _, _, _ in _legacy_columns(engine):
+                conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {legacy}"))
+                dropped.append(_label(key, table, legacy))
+    return dropped
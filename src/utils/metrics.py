@@ -0,0 +1,41 @@
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters = Counter()
+_gauges = {}
+
+
+def increment(name, amount=1, **labels):
+    """Add to an in-process counter identified by name and labels"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += amount
+
+
+def set_gauge(name, value, **labels):
+    """Record the current value of an in-process gauge"""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+
+
+def snapshot():
+    """Return {(name, labels): value} for all counters and gauges"""
+    with _lock:
+        return {**dict(_counters), **_gauges}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+
+
+def render_prometheus():
+    """Format all metrics in the Prometheus text exposition format"""
+    lines = []
+    for (name, labels), value in sorted(snapshot().items()):
+        label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+        lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,189 @@
+import re
+from datetime import date, timedelta
+from sqlalchemy import inspect, text
+from models import db, Expense
+
+PARENT_TABLE = "expenses"
+DEFAULT_PARTITION = "expenses_default"
+# Where migrate_to_partitioned() parks a plain expenses table while copying it
+_UNPARTITIONED = "expenses_unpartitioned"
+_YEARLY_PARTITION = re.compile(r"^expenses_y(\d{4})$")
+
+
+def _quote(name):
+    return db.session.get_bind().dialect.identifier_preparer.quote(name)
+
+
+def partition_name(year):
+    return f"{PARENT_TABLE}_y{year}"
+
+
+def year_bounds(year):
+    """Return the [start, end) date range covered by a yearly partition"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def year_predicates(column, year):
+    """Date predicates selecting a single year, letting Postgres prune other partitions"""
+    start, end = year_bounds(year)
+    return (column >= start, column < end)
+
+
+def recent_since(today=None, days=90):
+    """Lower date bound for "recent" queries, so they only touch the newest partitions"""
+    return (today or date.today()) - timedelta(days=days)
+
+
+def is_partitioned():
+    """True when the expenses table is a Postgres partitioned table"""
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return bool(db.session.scalar(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :parent AND pg_table_is_visible(c.oid)"
+    ), {"parent": PARENT_TABLE}))
+
+
+def yearly_partitions():
+    """Return {year: partition name} for the yearly partitions currently attached"""
+    rows = db.session.execute(text(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = :parent AND pg_table_is_visible(parent.oid)"
+    ), {"parent": PARENT_TABLE}).scalars()
+    partitions = {}
+    for name in rows:
+        match = _YEARLY_PARTITION.match(name)
+        if match:
+            partitions[int(match.group(1))] = name
+    return partitions
+
+
+def _create_partition(year):
+    """Create one yearly partition, moving any matching rows out of the default partition"""
+    name, parent, default = _quote(partition_name(year)), _quote(PARENT_TABLE), _quote(DEFAULT_PARTITION)
+    start, end = year_bounds(year)
+    bounds = {"start": start, "end": end}
+    # Partition bounds must be literals; they are formatted from dates, never user input
+    create = (
+        f"CREATE TABLE {name} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+    has_rows = db.session.scalar(text(
+        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE date >= :start AND date < :end)"
+    ), bounds)
+    if not has_rows:
+        db.session.execute(text(create))
+        return
+
+    # Postgres refuses to add a partition overlapping rows held by the default
+    # partition, so detach it, move the rows, and attach it again in one transaction
+    db.session.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {default}"))
+    db.session.execute(text(create))
+    db.session.execute(text(
+        f"INSERT INTO {parent} SELECT * FROM {default} "
+        "WHERE date >= :start AND date < :end"
+    ), bounds)
+    db.session.execute(text(
+        f"DELETE FROM {default} WHERE date >= :start AND date < :end"
+    ), bounds)
+    db.session.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT"))
+
+
+def ensure_partitions(years_ahead=1, from_year=None, today=None):
+    """Create yearly partitions from from_year through the current year plus years_ahead.
+
+    from_year defaults to the oldest year still held by the default partition,
+    so the first run also splits existing history into yearly partitions.
+    Returns the names of the partitions created.
+    """
+    if not is_partitioned():
+        return []
+
+    current_year = (today or date.today()).year
+    if from_year is None:
+        oldest = db.session.scalar(text(f"SELECT min(date) FROM {_quote(DEFAULT_PARTITION)}"))
+        from_year = min(oldest.year, current_year) if oldest else current_year
+
+    existing = yearly_partitions()
+    created = []
+    for year in range(from_year, current_year + years_ahead + 1):
+        if year not in existing:
+            _create_partition(year)
+            created.append(partition_name(year))
+    db.session.commit()
+    return created
+
+
+def detach_partitions(before_year, drop=False):
+    """Detach (and optionally drop) yearly partitions for years before before_year.
+
+    Detached tables keep their rows and can be archived or re-attached later.
+    Returns the names of the partitions detached.
+    """
+    if not is_partitioned():
+        return []
+
+    detached = []
+    for year, name in sorted(yearly_partitions().items()):
+        if year >= before_year:
+            continue
+        db.session.execute(text(f"ALTER TABLE {_quote(PARENT_TABLE)} DETACH PARTITION {_quote(name)}"))
+        if drop:
+            db.session.execute(text(f"DROP TABLE {_quote(name)}"))
+        detached.append(name)
+    db.session.commit()
+    return detached
+
+
+def needs_partition_migration():
+    """True when Postgres holds a plain expenses table created before partitioning"""
+    if db.engine.dialect.name != "postgresql":
+        return False
+    return inspect(db.session.connection()).has_table(PARENT_TABLE) and not is_partitioned()
+
+
+def migrate_to_partitioned():
+    """Rebuild a plain expenses table as the partitioned one, in a single transaction.
+
+    The old table is renamed aside, the partitioned table is created under the
+    original name and keeps the original id sequence (with any shard stride),
+    the rows are copied over and, once the row counts match, the old table is
+    dropped. Call ensure_partitions() afterwards to split the rows by year.
+    Returns the number of rows copied, or None when there was nothing to do.
+    """
+    if not needs_partition_migration():
+        return None
+
+    conn = db.session.connection()
+    parent, old = _quote(PARENT_TABLE), _quote(_UNPARTITIONED)
+    sequence = conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": PARENT_TABLE})
+    old_columns = {c["name"] for c in inspect(conn).get_columns(PARENT_TABLE)}
+    old_primary_key = inspect(conn).get_pk_constraint(PARENT_TABLE)["name"]
+
+    # Free every name the new table needs: its sequence, primary key and indexes
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    conn.execute(text(f"ALTER TABLE {parent} RENAME TO {old}"))
+    if old_primary_key:
+        conn.execute(text(
+            f"ALTER TABLE {old} RENAME CONSTRAINT {_quote(old_primary_key)} TO {_quote(_UNPARTITIONED + '_pkey')}"
+        ))
+    for index in Expense.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {_quote(index.name)}"))
+
+    Expense.__table__.create(conn)
+    created_sequence = conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": PARENT_TABLE})
+    conn.execute(text(f"ALTER TABLE {parent} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)"))
+    conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {parent}.id"))
+    conn.execute(text(f"DROP SEQUENCE {created_sequence}"))
+
+    columns = ", ".join(_quote(c.name) for c in Expense.__table__.columns if c.name in old_columns)
+    copied = conn.execute(text(f"INSERT INTO {parent} ({columns}) SELECT {columns} FROM {old}")).rowcount
+    if copied != conn.scalar(text(f"SELECT count(*) FROM {old}")):
+        db.session.rollback()
+        raise RuntimeError("Copied row count does not match the unpartitioned expenses table")
+    conn.execute(text(f"DROP TABLE {old}"))
+    db.session.commit()
+    return copied
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from sqlalchemy import select
+from models import db, Expense
+from utils.lookups import categories
+
+# The columns list pages render; comment and bookkeeping columns are never fetched
+_LIST_COLUMNS = (
+    Expense.id,
+    Expense.name,
+    Expense.amount,
+    Expense.currency,
+    Expense.category_id,
+    Expense.date,
+    Expense.due_date,
+    Expense.version,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseRow:
+    """Read-only projection of an expense for list pages, with derived fields precomputed"""
+
+    id: int
+    name: str
+    amount: float
+    currency: str
+    category: str
+    date: date
+    due_date: date | None
+    version: int
+    is_overdue: bool
+    days_until_due: int | None
+
+    @property
+    def is_debt(self):
+        return self.due_date is not None
+
+
+class ProjectedRows:
+    """Lazily executed list of ExpenseRow.
+
+    The SELECT only runs on first iteration, so pages whose table fragment is
+    served from the template cache never touch the expenses table.
+    """
+
+    __slots__ = ("_statement", "_today", "_rows")
+
+    def __init__(self, statement, today):
+        self._statement = statement
+        self._today = today
+        self._rows = None
+
+    def _load(self):
+        if self._rows is None:
+            today = self._today
+            rows = db.session.execute(self._statement).all()
+            names = categories.names_for({row.category_id for row in rows})
+            self._rows = [
+                ExpenseRow(
+                    id=row.id,
+                    name=row.name,
+                    amount=row.amount,
+                    currency=row.currency,
+                    category=names[row.category_id],
+                    date=row.date,
+                    due_date=row.due_date,
+                    version=row.version,
+                    is_overdue=row.due_date is not None and row.due_date < today,
+                    days_until_due=(row.due_date - today).days if row.due_date is not None else None,
+                )
+                for row in rows
+            ]
+        return self._rows
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+
+def project_expenses(*criteria, order_by, today=None):
+    """Select only the list columns of matching expenses into ExpenseRow objects"""
+    statement = select(*_LIST_COLUMNS).where(*criteria).order_by(*order_by)
+    return ProjectedRows(statement, today or datetime.utcnow().date())
@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import copy_current_request_context, current_app, g, has_request_context
+from sqlalchemy.pool import NullPool, QueuePool
+from models import db
+from utils.metrics import increment, set_gauge
+
+# Request state the routing session reads; copied into every worker
+_INHERITED = ("read_only", "replica_key", "shard_key")
+
+
+class QueryPool:
+    """Bounded thread pool running independent read queries of one request side by side.
+
+    Each worker gets its own app context and so its own session and pooled
+    connection. Work only goes to a worker when both a pool thread and an idle
+    connection are free; the rest runs on the calling thread, so a busy process
+    degrades to the plain sequential path instead of queueing.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers or 1)
+        self._lock = threading.Lock()
+        self._busy = 0
+
+    def _claim(self, wanted):
+        claimed = 0
+        while claimed < wanted and self._slots.acquire(blocking=False):
+            claimed += 1
+        with self._lock:
+            self._busy += claimed
+            set_gauge("query_pool_busy", self._busy)
+        return claimed
+
+    def _release(self):
+        with self._lock:
+            self._busy -= 1
+            set_gauge("query_pool_busy", self._busy)
+        self._slots.release()
+
+    def gather(self, calls):
+        if not self.max_workers or len(calls) < 2:
+            increment("query_gather_total", mode="sequential")
+            return [call() for call in calls]
+
+        # The first call always runs here; the caller already holds a connection
+        wanted = len(calls) - 1
+        idle = _idle_connections()
+        offloaded = self._claim(wanted if idle is None else min(wanted, idle))
+        if not offloaded:
+            increment("query_gather_total", mode="sequential")
+            return [call() for call in calls]
+
+        increment("query_gather_total", mode="concurrent")
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="query-pool")
+        futures = []
+        for call in calls[len(calls) - offloaded:]:
+            future = self._executor.submit(_in_worker_context(call))
+            future.add_done_callback(lambda _: self._release())
+            futures.append(future)
+        results = [call() for call in calls[:len(calls) - offloaded]]
+        return results + [future.result() for future in futures]
+
+
+def _idle_connections():
+    """Connections every engine this request may use can hand out without overflowing, or None for no limit"""
+    engines = [db.engine]
+    if g.get("replica_key"):
+        engines.append(current_app.extensions["db_replicas"][g.replica_key])
+    if g.get("shard_key") in (current_app.extensions.get("db_shards") or {}):
+        engines.append(current_app.extensions["db_shards"][g.shard_key])
+
+    idle = None
+    for engine in engines:
+        pool = engine.pool
+        if isinstance(pool, NullPool):
+            continue
+        free = pool.size() - pool.checkedout() if isinstance(pool, QueuePool) else 0
+        idle = free if idle is None else min(idle, free)
+    return max(idle, 0) if idle is not None else None
+
+
+def _in_worker_context(call):
+    inherited = {key: g.get(key) for key in _INHERITED if key in g}
+
+    def run():
+        for key, value in inherited.items():
+            setattr(g, key, value)
+        return call()
+
+    if has_request_context():
+        return copy_current_request_context(run)
+
+    app = current_app._get_current_object()
+
+    def run_in_app():
+        with app.app_context():
+            return run()
+
+    return run_in_app
+
+
+def init_query_pool(app):
+    app.extensions["query_pool"] = QueryPool(app.config.get("QUERY_CONCURRENCY", 4))
+
+
+def gather(*calls):
+    """Run independent read-only callables, concurrently when capacity allows.
+
+    Results come back in call order and the first exception encountered is
+    raised. Calls must not write: each may use its own session.
+    """
+    pool = current_app.extensions.get("query_pool")
+    if pool is None:
+        return [call() for call in calls]
+    return pool.gather(list(calls))
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+import time
+from flask import current_app
+from sqlalchemy import delete, exists, select
+from models import db, ArchivedExpense, Attachment, Expense
+
+CHUNK_SIZE = 64 * 1024
+# Served inline, so only types a browser will not run as a page
+ALLOWED_TYPES = (
+    "application/pdf",
+    "image/gif",
+    "image/heic",
+    "image/jpeg",
+    "image/png",
+    "image/webp",
+)
+
+
+class ReceiptTooLarge(ValueError):
+    pass
+
+
+def _receipts_root():
+    return current_app.config.get("RECEIPTS_DIR") or os.path.join(current_app.instance_path, "receipts")
+
+
+def blob_path(sha256):
+    """Where the blob with this digest lives, fanned out over two directory levels"""
+    return os.path.join(_receipts_root(), sha256[:2], sha256[2:4], sha256)
+
+
+def store_blob(stream, max_bytes=None):
+    """Copy a file-like stream to the blob store in chunks and return (sha256, size).
+
+    The bytes are hashed while they are written to a temporary file, which is
+    then renamed onto its content address. A blob that already exists is kept
+    and only has its mtime refreshed, so a concurrent garbage collection does
+    not remove it before the new reference is committed.
+    """
+    max_bytes = max_bytes or current_app.config.get("RECEIPT_MAX_BYTES")
+    tmp_dir = os.path.join(_receipts_root(), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest, size = hashlib.sha256(), 0
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            while chunk := stream.read(CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ReceiptTooLarge(f"Receipts may be at most {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+    sha256 = digest.hexdigest()
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.unlink(tmp.name)
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp.name, path)
+    return sha256, size
+
+
+def remove_orphaned_attachments():
+    """Delete attachment rows whose expense no longer exists, live or archived"""
+    live = exists().where(Expense.id == Attachment.expense_id, Expense.user_id == Attachment.user_id)
+    archived = exists().where(ArchivedExpense.id == Attachment.expense_id,
+                              ArchivedExpense.user_id == Attachment.user_id)
+    removed = db.session.execute(delete(Attachment).where(~live, ~archived)).rowcount
+    db.session.commit()
+    return removed
+
+
+def referenced_blobs():
+    return set(db.session.scalars(select(Attachment.sha256).distinct()))
+
+
+def collect_garbage(referenced, grace_seconds=3600):
+    """Delete blobs no attachment references, and stale temporary files.
+
+    Files touched within the grace period are kept: an upload stores or
+    refreshes its blob before the row referencing it is committed. Returns
+    (files removed, bytes freed).
+    """
+    root = _receipts_root()
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    for dirpath, _, filenames in os.walk(root):
+        in_tmp = os.path.relpath(dirpath, root).split(os.sep)[0] == "tmp"
+        for name in filenames:
+            if not in_tmp and name in referenced:
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff:
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += stat.st_size
+    return removed, freed
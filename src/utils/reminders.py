@@ -0,0 +1,181 @@
+import importlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, exists, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, DebtReminder, Expense
+
+DUE_SOON = "due_soon"
+OVERDUE = "overdue"
+logger = logging.getLogger(__name__)
+
+
+class ReminderSink(ABC):
+    """Delivery target for reminders; send raises to leave a reminder queued"""
+
+    @abstractmethod
+    def send(self, reminder):
+        """Deliver one serialized reminder"""
+
+    def flush(self):
+        """Make everything sent so far durable; called before a batch is marked sent"""
+
+
+class LogSink(ReminderSink):
+    """Default sink: one log line per reminder"""
+
+    def send(self, reminder):
+        logger.info("Debt reminder: %s", json.dumps(reminder))
+
+
+class FileSink(ReminderSink):
+    """Appends reminders to a local file as JSON lines"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def send(self, reminder):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(reminder) + "\n")
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+
+def get_sink(spec):
+    """Build a sink from REMINDER_SINK: "log", "file:<path>" or "<module>:<class>" """
+    if not spec or spec == "log":
+        return LogSink()
+    kind, _, target = spec.partition(":")
+    if kind == "file" and target:
+        return FileSink(target)
+    if target:
+        return getattr(importlib.import_module(kind), target)()
+    raise ValueError(f"Unknown reminder sink: {spec}")
+
+
+def _reminder_values(row, today):
+    return {
+        "user_id": row.user_id,
+        "expense_id": row.id,
+        "due_date": row.due_date,
+        "kind": OVERDUE if row.due_date < today else DUE_SOON,
+        "payload": {
+            "name": row.name,
+            "amount": row.amount,
+            "currency": row.currency,
+            "due_date": row.due_date.isoformat(),
+            "days_until_due": (row.due_date - today).days,
+        },
+    }
+
+
+def enqueue_reminders(today=None, days_ahead=3, overdue_days=30, batch_size=1000):
+    """Write outbox rows for debts due within days_ahead or overdue by up to overdue_days.
+
+    Debts are walked across all users in (due_date, id) keyset batches over the
+    partial due-date index, one transaction per batch, so memory stays bounded
+    by batch_size. Existing reminders are left alone, making reruns harmless.
+    Returns the number of reminders written.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days_ahead)
+    oldest = today - timedelta(days=overdue_days)
+    columns = (Expense.id, Expense.user_id, Expense.name, Expense.amount, Expense.currency, Expense.due_date)
+
+    written, last = 0, None
+    while True:
+        query = (
+            select(*columns)
+            .where(Expense.due_date.isnot(None), Expense.due_date >= oldest, Expense.due_date <= horizon)
+            .order_by(Expense.due_date, Expense.id)
+            .limit(batch_size)
+        )
+        if last is not None:
+            query = query.where(tuple_(Expense.due_date, Expense.id) > tuple_(literal(last[0]), literal(last[1])))
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+
+        inserted = db.session.execute(
+            pg_insert(DebtReminder)
+            .values([_reminder_values(row, today) for row in rows])
+            .on_conflict_do_nothing(constraint="uq_debt_reminders_expense_due_kind")
+            .returning(DebtReminder.id)
+        ).all()
+        db.session.commit()
+        written += len(inserted)
+        last = (rows[-1].due_date, rows[-1].id)
+        if len(rows) < batch_size:
+            break
+    return written
+
+
+def serialize_reminder(reminder):
+    return {
+        "id": reminder.id,
+        "user_id": reminder.user_id,
+        "expense_id": reminder.expense_id,
+        "kind": reminder.kind,
+        **reminder.payload,
+    }
+
+
+def deliver_reminders(sink, batch_size=500, max_attempts=5):
+    """Hand unsent reminders to sink in id order and mark them sent.
+
+    Rows are locked with SKIP LOCKED, so concurrent runs split the outbox
+    instead of double-sending. A failed send is recorded and retried on later
+    runs until max_attempts. Reminders whose debt was deleted, paid off or
+    rescheduled since they were queued are dropped unsent. Returns (sent, failed).
+    """
+    # The debt as it was queued: same expense, owner and due date
+    debt_unchanged = exists().where(
+        Expense.id == DebtReminder.expense_id,
+        Expense.user_id == DebtReminder.user_id,
+        Expense.due_date == DebtReminder.due_date,
+    )
+    db.session.execute(delete(DebtReminder).where(DebtReminder.sent_at.is_(None), ~debt_unchanged))
+    db.session.commit()
+
+    sent = failed = last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(DebtReminder)
+            .where(
+                DebtReminder.sent_at.is_(None),
+                DebtReminder.attempts < max_attempts,
+                DebtReminder.id > last_id,
+                # Checked again per batch, for debts deleted while this run is going
+                debt_unchanged,
+            )
+            .order_by(DebtReminder.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not batch:
+            break
+
+        delivered = []
+        for reminder in batch:
+            try:
+                sink.send(serialize_reminder(reminder))
+                delivered.append(reminder)
+            except Exception as e:
+                reminder.attempts += 1
+                reminder.last_error = str(e)
+                failed += 1
+        sink.flush()
+        now = datetime.utcnow()
+        for reminder in delivered:
+            reminder.sent_at = now
+            reminder.attempts += 1
+        db.session.commit()
+        sent += len(delivered)
+        last_id = batch[-1].id
+    return sent, failed
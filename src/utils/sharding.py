@@ -0,0 +1,318 @@
+import time
+from contextlib import contextmanager
+from flask import current_app, g, session as http_session
+from sqlalchemy import create_engine, delete, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, Category, Merchant, ShardDirectory, User
+from models.routing import DEFAULT_SHARD
+
+# Every shard draws ids from its own lane of the shared sequences (id % stride ==
+# shard index), so a user's rows keep their ids when moved to another shard.
+SHARD_ID_STRIDE = 64
+
+# Tables holding one user's rows, parents first, with the column naming the user
+USER_TABLES = (
+    ("users", "id"),
+    ("expenses", "user_id"),
+    ("expenses_archive", "user_id"),
+    ("expense_monthly_totals", "user_id"),
+    ("budgets", "user_id"),
+    ("category_rules", "user_id"),
+    ("expense_changes", "user_id"),
+    ("debt_reminders", "user_id"),
+    ("daily_balances", "user_id"),
+    ("timeseries_buckets", "user_id"),
+    ("attachments", "user_id"),
+)
+_SEQUENCES = (
+    ("expenses", "id"),
+    ("budgets", "id"),
+    ("category_rules", "id"),
+    ("expense_changes", "seq"),
+    ("debt_reminders", "id"),
+    ("attachments", "id"),
+)
+# Lookup ids referenced by user rows: (lookup table, [(table, column), ...])
+_LOOKUP_REFERENCES = (
+    (Category.__table__, (("expenses", "category_id"), ("expenses_archive", "category_id"),
+                          ("expense_monthly_totals", "category_id"))),
+    (Merchant.__table__, (("expenses", "merchant_id"), ("expenses_archive", "merchant_id"))),
+)
+
+
+class ShardMoveError(Exception):
+    """Raised when a user cannot be moved between shards"""
+
+
+def init_sharding(app):
+    """Create one engine per URL in SQLALCHEMY_SHARD_URIS and bind each request to its user's shard"""
+    app.extensions["db_shards"] = {
+        f"shard_{i}": create_engine(url, pool_pre_ping=True)
+        for i, url in enumerate(app.config.get("SQLALCHEMY_SHARD_URIS") or (), start=1)
+    }
+    if app.extensions["db_shards"]:
+        app.before_request(_bind_request_shard)
+
+
+def _bind_request_shard():
+    user_id = http_session.get("user_id")
+    if user_id is None:
+        return None
+    # The shard is remembered in the session for SHARD_CACHE_SECONDS; move_user
+    # waits that long after flagging a user, so no stale entry outlives a move
+    cached = http_session.get("shard")
+    if cached and cached[0] == user_id and time.time() - cached[2] < current_app.config["SHARD_CACHE_SECONDS"]:
+        g.shard_key = cached[1]
+        return None
+    entry = directory_entry(user_id)
+    if entry is not None and entry.moving:
+        return "Your data is being moved; please retry in a moment.", 503, {"Retry-After": "5"}
+    g.shard_key = entry.shard if entry is not None else DEFAULT_SHARD
+    http_session["shard"] = [user_id, g.shard_key, time.time()]
+    return None
+
+
+def sharding_enabled():
+    return bool(current_app.extensions.get("db_shards"))
+
+
+def shard_keys():
+    return [DEFAULT_SHARD, *(current_app.extensions.get("db_shards") or {})]
+
+
+def shard_engine(key):
+    return db.engine if key == DEFAULT_SHARD else current_app.extensions["db_shards"][key]
+
+
+def shard_index(key):
+    return 0 if key == DEFAULT_SHARD else int(key.rsplit("_", 1)[1])
+
+
+def current_shard():
+    return g.get("shard_key") or DEFAULT_SHARD
+
+
+@contextmanager
+def use_shard(key):
+    """Route the session to one shard for the duration of the block.
+
+    The session is closed on entry and exit, so no transaction spans shards;
+    callers commit inside the block. Entering with unflushed changes raises
+    RuntimeError instead of silently discarding them.
+    """
+    if db.session.new or db.session.dirty or db.session.deleted:
+        raise RuntimeError("The session has uncommitted changes; commit or roll back before switching shards")
+    previous = g.get("shard_key")
+    db.session.close()
+    g.shard_key = key
+    try:
+        yield key
+    finally:
+        db.session.close()
+        g.shard_key = previous
+
+
+def for_each_shard():
+    """Yield every shard key with the session bound to that shard"""
+    for key in shard_keys():
+        with use_shard(key):
+            yield key
+
+
+def directory_entry(user_id):
+    """The user's ShardDirectory row as a named tuple, or None for users that predate sharding"""
+    table = ShardDirectory.__table__
+    with db.engine.connect() as conn:
+        return conn.execute(select(table).where(table.c.user_id == user_id)).first()
+
+
+def find_user(username):
+    """Load a user by username, binding the request to their shard.
+
+    With shards configured the username is resolved in the global directory
+    first, so only the user's own shard is queried.
+    """
+    if not sharding_enabled():
+        return User.query.filter_by(username=username).first()
+    table = ShardDirectory.__table__
+    with db.engine.connect() as conn:
+        entry = conn.execute(select(table).where(table.c.username == username)).first()
+    if entry is None:
+        return None
+    g.shard_key = entry.shard
+    return db.session.get(User, entry.user_id)
+
+
+def user_id_for(username):
+    """Resolve a username to a user id without binding the request to their shard"""
+    if not sharding_enabled():
+        return db.session.scalar(select(User.id).where(User.username == username))
+    table = ShardDirectory.__table__
+    with db.engine.connect() as conn:
+        return conn.scalar(select(table.c.user_id).where(table.c.username == username))
+
+
+def _least_loaded_shard(conn):
+    counts = dict(conn.execute(
+        select(ShardDirectory.shard, func.count()).group_by(ShardDirectory.shard)
+    ).all())
+    return min(shard_keys(), key=lambda key: (counts.get(key, 0), shard_index(key)))
+
+
+def create_user(username, password, is_admin=False, shard=None):
+    """Create a user, placing them on the least loaded shard when sharding is on"""
+    if not sharding_enabled():
+        user = User(username=username, is_admin=is_admin)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    with db.engine.begin() as conn:
+        shard = shard or _least_loaded_shard(conn)
+        user_id = conn.scalar(
+            insert(ShardDirectory.__table__).values(username=username, shard=shard)
+            .returning(ShardDirectory.user_id)
+        )
+    try:
+        with use_shard(shard):
+            user = User(id=user_id, username=username, is_admin=is_admin)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            # Load the row before the shard's session closes and detaches it
+            db.session.refresh(user)
+    except Exception:
+        with db.engine.begin() as conn:
+            conn.execute(delete(ShardDirectory.__table__).where(ShardDirectory.user_id == user_id))
+        raise
+    return user
+
+
+def _interleave_sequences(conn, index):
+    """Point the shard's id sequences at its own lane, past every id already stored"""
+    for table, column in _SEQUENCES:
+        sequence = conn.scalar(text("SELECT pg_get_serial_sequence(:table, :column)"),
+                               {"table": table, "column": column})
+        if sequence is None:
+            continue
+        current = conn.scalar(text(
+            f"SELECT greatest((SELECT coalesce(max({column}), 0) FROM {table}), "
+            f"(SELECT last_value FROM {sequence}))"
+        ))
+        following = current + 1 + (index - current - 1) % SHARD_ID_STRIDE
+        conn.execute(text(f"ALTER SEQUENCE {sequence} INCREMENT BY {SHARD_ID_STRIDE}"))
+        conn.execute(text("SELECT setval(:sequence, :value, false)"),
+                     {"sequence": sequence, "value": following or SHARD_ID_STRIDE})
+
+
+def prepare_shards():
+    """Create the schema on every shard and interleave their id sequences"""
+    from utils.partitioning import ensure_partitions
+
+    local_tables = [t for t in db.metadata.sorted_tables if not t.info.get("global")]
+    for key in shard_keys():
+        engine = shard_engine(key)
+        db.metadata.create_all(engine, tables=local_tables)
+        with engine.begin() as conn:
+            _interleave_sequences(conn, shard_index(key))
+        with use_shard(key):
+            ensure_partitions()
+
+
+def sync_directory():
+    """Register users created directly on the primary as living on the default shard"""
+    directory = ShardDirectory.__table__
+    with db.engine.begin() as conn:
+        conn.execute(
+            pg_insert(directory)
+            .from_select(["user_id", "username"], select(User.id, User.username))
+            .on_conflict_do_nothing()
+        )
+        # Keep both id sources past every allocated id
+        for table, column in (("shard_directory", "user_id"), ("users", "id")):
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                f"greatest((SELECT max(user_id) FROM shard_directory), 1))"
+            ))
+
+
+def _delete_user_rows(conn, user_id):
+    for name, column in reversed(USER_TABLES):
+        table = db.metadata.tables[name]
+        conn.execute(delete(table).where(table.c[column] == user_id))
+
+
+def move_user(user_id, target, grace_seconds=2.0, batch_size=1000):
+    """Move every row of one user to the target shard while the others keep working.
+
+    The user is flagged as moving (their requests get a 503), in-flight requests
+    get grace_seconds to finish and cached shard lookups SHARD_CACHE_SECONDS to
+    expire, then the rows are copied in batches inside one
+    target transaction and checked. Only then does the directory point at the
+    target and the source copy get deleted. A failed move leaves the user on the
+    source shard. Returns the number of rows copied.
+    """
+    if target not in shard_keys():
+        raise ShardMoveError(f"Unknown shard: {target}")
+    directory = ShardDirectory.__table__
+    with db.engine.begin() as conn:
+        entry = conn.execute(
+            select(directory).where(directory.c.user_id == user_id).with_for_update()
+        ).first()
+        if entry is None:
+            raise ShardMoveError(f"User {user_id} is not in the shard directory")
+        if entry.shard == target:
+            return 0
+        conn.execute(update(directory).where(directory.c.user_id == user_id).values(moving=True))
+
+    source_engine, target_engine = shard_engine(entry.shard), shard_engine(target)
+    copied = 0
+    try:
+        time.sleep(grace_seconds + current_app.config.get("SHARD_CACHE_SECONDS", 0))
+        with source_engine.connect() as source, target_engine.begin() as dest:
+            # Leftovers of an interrupted earlier attempt
+            _delete_user_rows(dest, user_id)
+            # Lookup rows are read from the primary, which holds every name
+            with db.engine.connect() as names:
+                _copy_lookups(source, names, dest, user_id)
+            for name, column in USER_TABLES:
+                table = db.metadata.tables[name]
+                expected = source.scalar(select(func.count()).select_from(table).where(table.c[column] == user_id))
+                result = source.execution_options(yield_per=batch_size).execute(
+                    select(table).where(table.c[column] == user_id)
+                )
+                moved = 0
+                for rows in result.partitions():
+                    dest.execute(insert(table), [dict(row._mapping) for row in rows])
+                    moved += len(rows)
+                if moved != expected:
+                    raise ShardMoveError(f"{name}: copied {moved} of {expected} rows")
+                copied += moved
+            _interleave_sequences(dest, shard_index(target))
+    except Exception:
+        with db.engine.begin() as conn:
+            conn.execute(update(directory).where(directory.c.user_id == user_id).values(moving=False))
+        raise
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(directory).where(directory.c.user_id == user_id).values(shard=target, moving=False)
+        )
+    with source_engine.begin() as conn:
+        _delete_user_rows(conn, user_id)
+    return copied
+
+
+def _copy_lookups(source, names, target, user_id):
+    """Copy the category and merchant rows the user's source rows reference, read from names"""
+    for lookup, references in _LOOKUP_REFERENCES:
+        ids = set()
+        for table, column in references:
+            table = db.metadata.tables[table]
+            ids.update(source.scalars(
+                select(table.c[column]).where(table.c.user_id == user_id, table.c[column].isnot(None)).distinct()
+            ))
+        if ids:
+            rows = names.execute(select(lookup).where(lookup.c.id.in_(ids))).mappings().all()
+            target.execute(pg_insert(lookup).on_conflict_do_nothing(), [dict(row) for row in rows])
@@ -0,0 +1,252 @@
+import fcntl
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date
+from flask import current_app
+from sqlalchemy import func, select
+from models import db, Expense, User
+from utils.fx import converted_amount, join_rates
+from utils.partitioning import year_bounds
+
+# One flat little-endian file per column; amounts are in the user's base
+# currency, NaN when no rate was loaded for the day. A due date of 0 means none.
+# Categories are stored as dense slots into the manifest's category id list.
+COLUMNS = {"date": "<i4", "amount": "<f8", "category": "<i4", "due_date": "<i4"}
+_FETCH_BATCH = 5000
+_UNIX_EPOCH = date(1970, 1, 1).toordinal()
+# Bumped when the file layout changes, so older snapshots are rebuilt
+_FORMAT = 2
+
+Snapshot = namedtuple("Snapshot", "dates amounts categories due_dates category_ids base_currency")
+CategoryTotal = namedtuple("CategoryTotal", "category_id total count")
+MonthTotal = namedtuple("MonthTotal", "month total")
+
+
+def snapshots_enabled():
+    return current_app.config.get("ANALYTICS_SNAPSHOTS", True)
+
+
+def _snapshot_root():
+    return current_app.config.get("SNAPSHOT_DIR") or os.path.join(
+        tempfile.gettempdir(), "expenses-snapshots"
+    )
+
+
+def _user_dir(user_id):
+    return os.path.join(_snapshot_root(), str(user_id))
+
+
+def _column_path(user_dir, manifest, name):
+    return os.path.join(user_dir, f"{manifest['generation']}.{name}")
+
+
+@contextmanager
+def _locked(user_dir):
+    """Serialize snapshot writers for one user across threads and processes"""
+    with open(os.path.join(user_dir, "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_manifest(user_dir):
+    try:
+        with open(os.path.join(user_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(user_dir, manifest):
+    """Publish a manifest atomically; readers only map the rows it declares"""
+    path = os.path.join(user_dir, "manifest.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _unchanged(user_id, manifest):
+    """True when the rows already in the snapshot were neither edited nor deleted"""
+    count, version_sum = db.session.execute(
+        select(func.count(Expense.id), func.coalesce(func.sum(Expense.version), 0))
+        .where(Expense.user_id == user_id, Expense.id <= manifest["last_id"])
+    ).one()
+    return count == manifest["rows"] and version_sum == manifest["version_sum"]
+
+
+def _append_rows(user_dir, user_id, manifest):
+    """Append rows with ids past manifest["last_id"] to the column files"""
+    base_currency = manifest["base_currency"]
+    query = join_rates(
+        select(
+            Expense.id,
+            Expense.date,
+            converted_amount(base_currency),
+            Expense.category_id,
+            Expense.due_date,
+            Expense.version,
+        ),
+        base_currency,
+    ).where(
+        Expense.user_id == user_id, Expense.id > manifest["last_id"]
+    ).order_by(Expense.id).execution_options(yield_per=_FETCH_BATCH)
+
+    slots = {category_id: i for i, category_id in enumerate(manifest["category_ids"])}
+    files = {name: open(_column_path(user_dir, manifest, name), "ab") for name in COLUMNS}
+    try:
+        for batch in db.session.execute(query).partitions():
+            ids, dates, amounts, categories, due_dates, versions = zip(*batch)
+            for category_id in categories:
+                if category_id not in slots:
+                    slots[category_id] = len(manifest["category_ids"])
+                    manifest["category_ids"].append(category_id)
+            columns = {
+                "date": [d.toordinal() for d in dates],
+                "amount": [float("nan") if a is None else a for a in amounts],
+                "category": [slots[c] for c in categories],
+                "due_date": [d.toordinal() if d else 0 for d in due_dates],
+            }
+            for name, values in columns.items():
+                files[name].write(np.asarray(values, dtype=COLUMNS[name]).tobytes())
+            manifest["rows"] += len(batch)
+            manifest["last_id"] = ids[-1]
+            manifest["version_sum"] += sum(versions)
+    finally:
+        for f in files.values():
+            f.close()
+    return manifest
+
+
+def _rebuild(user_dir, user_id, previous, base_currency, user_key):
+    """Write a fresh generation of column files for the user"""
+    manifest = {
+        "format": _FORMAT,
+        "generation": (previous["generation"] + 1) if previous else 1,
+        "base_currency": base_currency,
+        "user_key": user_key,
+        "rows": 0,
+        "last_id": 0,
+        "version_sum": 0,
+        "category_ids": [],
+    }
+    for name in COLUMNS:
+        open(_column_path(user_dir, manifest, name), "wb").close()
+    return _append_rows(user_dir, user_id, manifest)
+
+
+def _remove_generation(user_dir, manifest):
+    """Unlink superseded column files; readers that mapped them keep their view"""
+    for name in COLUMNS:
+        try:
+            os.remove(_column_path(user_dir, manifest, name))
+        except OSError:
+            pass
+
+
+def refresh_snapshot(user_id):
+    """Bring the user's snapshot up to date and return its manifest.
+
+    The manifest is keyed by the user's data version, so an unchanged user costs
+    one primary-key lookup. Pure appends extend the column files in place; edits,
+    deletes or a base currency change rewrite them as a new generation.
+    """
+    data_version, base_currency, created_at = db.session.execute(
+        select(User.data_version, User.base_currency, User.created_at).where(User.id == user_id)
+    ).one()
+    # Guards against a recreated database handing the same id to another user
+    user_key = created_at.isoformat() if created_at else ""
+
+    user_dir = _user_dir(user_id)
+    os.makedirs(user_dir, exist_ok=True)
+    with _locked(user_dir):
+        manifest = _read_manifest(user_dir)
+        reusable = (
+            manifest is not None
+            and manifest.get("format") == _FORMAT
+            and manifest["base_currency"] == base_currency
+            and manifest["user_key"] == user_key
+        )
+        if reusable and manifest["data_version"] == data_version:
+            return manifest
+
+        if reusable and _unchanged(user_id, manifest):
+            manifest = _append_rows(user_dir, user_id, manifest)
+        else:
+            previous = manifest
+            manifest = _rebuild(user_dir, user_id, previous, base_currency, user_key)
+            if previous:
+                _remove_generation(user_dir, previous)
+        manifest["data_version"] = data_version
+        _write_manifest(user_dir, manifest)
+    return manifest
+
+
+def _map_column(user_dir, manifest, name):
+    if manifest["rows"] == 0:
+        return np.empty(0, dtype=COLUMNS[name])
+    return np.memmap(
+        _column_path(user_dir, manifest, name), dtype=COLUMNS[name], mode="r", shape=(manifest["rows"],)
+    )
+
+
+def load_snapshot(user_id):
+    """Return the user's columns as read-only memory maps, refreshing them first"""
+    manifest = refresh_snapshot(user_id)
+    user_dir = _user_dir(user_id)
+    return Snapshot(
+        dates=_map_column(user_dir, manifest, "date"),
+        amounts=_map_column(user_dir, manifest, "amount"),
+        categories=_map_column(user_dir, manifest, "category"),
+        due_dates=_map_column(user_dir, manifest, "due_date"),
+        category_ids=manifest["category_ids"],
+        base_currency=manifest["base_currency"],
+    )
+
+
+def invalidate_snapshots():
+    """Drop every snapshot, e.g. after exchange rates changed"""
+    shutil.rmtree(_snapshot_root(), ignore_errors=True)
+
+
+def summarize(snapshot, year=None):
+    """Return (categories, months, total_paid, total_debts, unconverted) computed from a snapshot.
+
+    Mirrors the SQL aggregates of the summary page: amounts without a rate are
+    counted, in unconverted too, but left out of sums.
+    """
+    dates, amounts, categories, due_dates = (
+        snapshot.dates, snapshot.amounts, snapshot.categories, snapshot.due_dates,
+    )
+    if year:
+        start, end = year_bounds(year)
+        in_year = (dates >= start.toordinal()) & (dates < end.toordinal())
+        dates, amounts, categories, due_dates = (
+            dates[in_year], amounts[in_year], categories[in_year], due_dates[in_year],
+        )
+
+    unconverted = int(np.isnan(amounts).sum())
+    amounts = np.nan_to_num(amounts, nan=0.0)
+    slots = len(snapshot.category_ids)
+    category_totals = np.bincount(categories, weights=amounts, minlength=slots)
+    category_counts = np.bincount(categories, minlength=slots)
+    category_rows = [
+        CategoryTotal(snapshot.category_ids[i], float(category_totals[i]), int(category_counts[i]))
+        for i in np.flatnonzero(category_counts)
+    ]
+
+    months = (dates.astype("<i8") - _UNIX_EPOCH).astype("datetime64[D]").astype("datetime64[M]")
+    unique_months, month_index = np.unique(months, return_inverse=True)
+    month_totals = np.bincount(month_index, weights=amounts, minlength=len(unique_months))
+    month_rows = [MonthTotal(str(m), float(t)) for m, t in zip(unique_months, month_totals)]
+
+    is_debt = due_dates != 0
+    total_paid = float(amounts[~is_debt].sum())
+    total_debts = float(amounts[is_debt].sum())
+    return category_rows, month_rows, total_paid, total_debts, unconverted
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """Bounded in-process LRU store for rendered template fragments.
+
+    Bounded both by entry count and by the total encoded size of the stored
+    fragments; a single fragment larger than max_entry_bytes is never cached.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024, max_entry_bytes=1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._discard(key)
+            if size > self.max_entry_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(oldest)
+
+    def _discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._bytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds a {% cache key, ... %}...{% endcache %} tag.
+
+    The key parts should include everything the fragment depends on, usually
+    the user id and data version, so stale entries are never hit and simply age
+    out of the LRU.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+
+        key = tuple(key_parts)
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = caller()
+            cache.set(key, rendered)
+        return rendered
+
+
+def init_template_cache(app):
+    """Configure the shared bytecode cache and the fragment cache for the app"""
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "expenses-jinja-cache"
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+
+    app.jinja_options = {
+        **app.jinja_options,
+        "bytecode_cache": FileSystemBytecodeCache(cache_dir),
+        "extensions": [*app.jinja_options.get("extensions", ()), FragmentCacheExtension],
+    }
+    if app.config.get("FRAGMENT_CACHE_ENABLED", True):
+        app.jinja_env.fragment_cache = FragmentCache(
+            app.config.get("FRAGMENT_CACHE_SIZE", 512),
+            max_bytes=app.config.get("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+            max_entry_bytes=app.config.get("FRAGMENT_CACHE_MAX_ENTRY_BYTES", 1024 * 1024),
+        )
@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, TimeseriesBucket, User
+from utils.budgets import period_bounds
+from utils.fx import latest_rate_join
+
+# Finest first; downsampling walks up this list
+GRANULARITIES = ("day", "week", "month", "year")
+_PERIODS = {"week": "weekly", "month": "monthly", "year": "yearly"}
+# First key of the per-user advisory lock serializing cache fills with invalidations
+_LOCK_CLASS = 4048
+
+# Spend of one user per bucket and category over [:start, :end), live and archived
+_BUCKET_TOTALS = text(f"""
+SELECT date_trunc(:granularity, e.date)::date AS bucket, e.category_id,
+       sum(CASE WHEN e.currency = :currency THEN e.amount
+                ELSE e.amount * src.rate / base.rate END) AS total
+FROM (
+    SELECT date, amount, currency, category_id FROM expenses
+    WHERE user_id = :user_id AND date >= :start AND date < :end
+    UNION ALL
+    SELECT date, amount, currency, category_id FROM expenses_archive
+    WHERE user_id = :user_id AND date >= :start AND date < :end
+) e
+{latest_rate_join("src", "e.currency", "e.date")}
+{latest_rate_join("base", ":currency", "e.date")}
+GROUP BY 1, 2
+""")
+
+
+def bucket_bounds(granularity, day):
+    """Return the [start, end) range of the bucket containing day"""
+    if granularity == "day":
+        return day, day + timedelta(days=1)
+    return period_bounds(_PERIODS[granularity], day)
+
+
+def buckets(granularity, start, end, limit=None):
+    """[start, end) ranges of the buckets covering the days start..end inclusive.
+
+    Stops after limit + 1 buckets when a limit is given, which is enough to tell
+    that the range is too fine for it.
+    """
+    ranges = []
+    day = start
+    while day <= end and (limit is None or len(ranges) <= limit):
+        ranges.append(bucket_bounds(granularity, day))
+        day = ranges[-1][1]
+    return ranges
+
+
+def pick_granularity(start, end, max_points, finest="day"):
+    """The finest granularity, no finer than `finest`, giving at most max_points buckets"""
+    for granularity in GRANULARITIES[GRANULARITIES.index(finest):]:
+        if len(buckets(granularity, start, end, limit=max_points)) <= max_points:
+            return granularity
+    return GRANULARITIES[-1]
+
+
+def _compute(user_id, granularity, currency, start, end):
+    """{bucket start: {category id: total}} for every bucket in [start, end), computed in SQL"""
+    computed = {}
+    rows = db.session.execute(_BUCKET_TOTALS, {
+        "granularity": granularity, "currency": currency, "user_id": user_id, "start": start, "end": end,
+    })
+    for bucket, category_id, total in rows:
+        if total is not None:
+            computed.setdefault(bucket, {})[category_id] = total
+    return computed
+
+
+def _lock_user(user_id):
+    db.session.execute(select(func.pg_advisory_xact_lock(_LOCK_CLASS, user_id)))
+
+
+def bucket_totals(user_id, granularity, currency, ranges, data_version, today=None):
+    """Return {bucket start: {category id: total}} for the given bucket ranges.
+
+    Buckets that ended before today are read from the cache and the missing ones
+    are computed together and stored. The current and future buckets are always
+    computed on demand and never stored.
+
+    data_version is the user's version read before computing. The totals are
+    only stored while it is still current, so a write that commits while they
+    are computed cannot leave a stale bucket behind.
+    """
+    today = today or date.today()
+    closed = [r for r in ranges if r[1] <= today]
+    cached = {}
+    if closed:
+        rows = db.session.execute(
+            select(TimeseriesBucket.bucket_start, TimeseriesBucket.totals).where(
+                TimeseriesBucket.user_id == user_id,
+                TimeseriesBucket.granularity == granularity,
+                TimeseriesBucket.currency == currency,
+                TimeseriesBucket.bucket_start >= closed[0][0],
+                TimeseriesBucket.bucket_start <= closed[-1][0],
+            )
+        ).all()
+        cached = {start: {int(k): v for k, v in totals.items()} for start, totals in rows}
+
+    missing = [r for r in ranges if r[0] not in cached]
+    if not missing:
+        return cached
+    computed = _compute(user_id, granularity, currency, missing[0][0], missing[-1][1])
+
+    to_store = [
+        {
+            "user_id": user_id, "granularity": granularity, "currency": currency,
+            "bucket_start": start, "bucket_end": end,
+            "totals": {str(k): v for k, v in computed.get(start, {}).items()},
+        }
+        for start, end in missing
+        if end <= today
+    ]
+    if to_store:
+        # Invalidations take the same lock, and writers holding the user row are waited for
+        _lock_user(user_id)
+        current = db.session.scalar(
+            select(User.data_version).where(User.id == user_id).with_for_update(read=True)
+        )
+        if current == data_version:
+            # Concurrent requests may fill the same buckets; the first one wins
+            db.session.execute(pg_insert(TimeseriesBucket).on_conflict_do_nothing(), to_store)
+        db.session.commit()
+    return {**cached, **{start: computed.get(start, {}) for start, _ in missing}}
+
+
+def invalidate_buckets(user_id, first_day=None, last_day=None):
+    """Drop the user's cached buckets overlapping first_day..last_day (default: all of them).
+
+    Called in the writing transaction for every expense dated inside a closed
+    period, so the next chart request recomputes just those buckets. The
+    writer must also bump the user's data version.
+    """
+    _lock_user(user_id)
+    criteria = [TimeseriesBucket.user_id == user_id]
+    if first_day is not None:
+        criteria.append(TimeseriesBucket.bucket_end > first_day)
+        criteria.append(TimeseriesBucket.bucket_start <= (last_day or first_day))
+    db.session.execute(delete(TimeseriesBucket).where(*criteria))
+
+
+def downsample(points, max_points):
+    """Merge runs of consecutive points until at most max_points remain.
+
+    Each point is (start, {category id: total}); a merged point keeps the
+    start of its first member.
+    """
+    if len(points) <= max_points:
+        return points
+    size = -(-len(points) // max_points)
+    merged = []
+    for i in range(0, len(points), size):
+        totals = {}
+        for _, bucket in points[i:i + size]:
+            for category_id, total in bucket.items():
+                totals[category_id] = totals.get(category_id, 0.0) + total
+        merged.append((points[i][0], totals))
+    return merged
@@ -2,8 +2,10 @@ import pytest
 import tempfile
 import os
 from datetime import datetime, date
+from contextlib import contextmanager
 from flask import Flask
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
 import sys
@@ -33,10 +35,13 @@ def app_config():
 
 
 @pytest.fixture(scope="function")
-def test_app(app_config):
+def test_app(app_config, tmp_path):
     """Create a test Flask application"""
-    app = create_app()
-    app.config.update(app_config)
+    app = create_app({
+        **app_config,
+        "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        "RECEIPTS_DIR": str(tmp_path / "receipts"),
+    })
     
     with app.app_context():
         # Drop all tables and recreate them for clean state
@@ -45,6 +50,8 @@ def test_app(app_config):
         yield app
         db.session.remove()
         db.drop_all()
+        # Each test builds a new app; release its pooled connections right away
+        db.engine.dispose()
 
 
 @pytest.fixture(scope="function")
@@ -131,3 +138,33 @@ def admin_client(client, admin_user):
         sess["username"] = admin_user.username
         sess["is_admin"] = admin_user.is_admin
     return client
+
+
+@pytest.fixture
+def query_budget(test_app):
+    """Fail the test when a block issues more SQL statements than its budget.
+
+    Usage: ``with query_budget(3): client.get("/expenses")``. Statements on every
+    engine are counted: the primary, replicas, shards and the side connections
+    used for lookups and the shard directory. The offending statements are
+    printed in the failure message.
+    """
+
+    @contextmanager
+    def budget(limit):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(Engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(Engine, "before_cursor_execute", record)
+
+        if len(statements) > limit:
+            listing = "\n".join(f"  {i}. {s}" for i, s in enumerate(statements, 1))
+            pytest.fail(f"{len(statements)} SQL statements issued, budget is {limit}:\n{listing}")
+
+    return budget
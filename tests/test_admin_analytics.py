@@ -0,0 +1,87 @@
+import pytest
+from datetime import date, timedelta
+from models import Expense, PlatformStats, db
+from utils.admin_analytics import merge_shard_stats, refresh_platform_stats, shard_ranges
+
+
+def shard(users=1, categories=None, debts=(0, 0.0), overdue=(0, 0.0)):
+    return {
+        "users": users,
+        "categories": categories or {},
+        "debts_count": debts[0],
+        "debts_total": debts[1],
+        "overdue_count": overdue[0],
+        "overdue_total": overdue[1],
+    }
+
+
+class TestShardMath:
+    """Test cases for splitting and merging analytics shards"""
+
+    @pytest.mark.unit
+    def test_shard_ranges_cover_every_user(self):
+        """Test shards are contiguous and cover ids 1..max"""
+        assert shard_ranges(10, 3) == [(1, 5), (5, 9), (9, 11)]
+        assert shard_ranges(2, 8) == [(1, 2), (2, 3)]
+        assert shard_ranges(0, 4) == []
+
+    @pytest.mark.unit
+    def test_merge_sums_shards_and_ranks_categories(self):
+        """Test per-shard results merge into platform totals"""
+        merged = merge_shard_stats(
+            [
+                shard(categories={"Food": [10.0, 2], "Rent": [500.0, 1]}, debts=(1, 500.0)),
+                shard(users=2, categories={"Food": [5.0, 1]}, overdue=(1, 5.0)),
+            ],
+            top=1,
+        )
+        assert merged["users"] == 3
+        assert merged["expenses_count"] == 4
+        assert merged["expenses_total"] == 515.0
+        assert merged["debts_total"] == 500.0
+        assert merged["overdue_count"] == 1
+        assert merged["top_categories"] == [["Rent", 500.0, 1]]
+
+
+class TestAdminAnalytics:
+    """Test cases for the admin analytics page and refresh job"""
+
+    @pytest.mark.integration
+    def test_refresh_aggregates_all_users(self, db_session, sample_user, admin_user):
+        """Test a sharded refresh stores platform-wide totals"""
+        today = date.today()
+        db.session.add_all([
+            Expense(name="A", amount=10.0, category="Food", date=today, user_id=sample_user.id),
+            Expense(name="B", amount=30.0, category="Rent", date=today, user_id=admin_user.id,
+                    due_date=today - timedelta(days=1)),
+        ])
+        db.session.commit()
+
+        stats = refresh_platform_stats(shards=2, workers=2)
+        assert stats.shards == 2
+        assert stats.payload["users"] == 2
+        assert stats.payload["expenses_total"] == 40.0
+        assert stats.payload["debts_total"] == 30.0
+        assert stats.payload["overdue_count"] == 1
+        assert stats.payload["top_categories"][0] == ["Rent", 30.0, 1]
+
+    @pytest.mark.integration
+    def test_page_requires_admin(self, authenticated_client):
+        """Test non-admins are refused"""
+        assert authenticated_client.get("/admin/analytics").status_code == 403
+
+    @pytest.mark.integration
+    def test_page_reads_stored_results(self, admin_client):
+        """Test the page renders the last stored refresh without recomputing"""
+        response = admin_client.get("/admin/analytics")
+        assert b"have not been computed yet" in response.data
+
+        db.session.add(PlatformStats(
+            currency="USD", shards=1, duration_ms=5,
+            payload=merge_shard_stats([shard(categories={"Travel": [42.0, 3]})]),
+        ))
+        db.session.commit()
+
+        response = admin_client.get("/admin/analytics")
+        assert b"Travel" in response.data
+        assert b"42.00 USD" in response.data
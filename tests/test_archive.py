@@ -0,0 +1,98 @@
+import pytest
+from datetime import date
+from models import ArchivedExpense, Expense, ExpenseMonthlyTotal, FxRate, db
+from utils.archive import archive_cutoff, archive_expenses, archived_totals
+from utils.lookups import categories
+
+
+@pytest.fixture
+def postgres(db_session):
+    if db.engine.dialect.name != "postgresql":
+        pytest.skip("archiving requires Postgres")
+    return db_session
+
+
+def add_expense(user_id, day, amount=10.0, category="Food", due_date=None, name="Archived"):
+    expense = Expense(
+        name=name, amount=amount, category=category, date=day, due_date=due_date, user_id=user_id,
+    )
+    db.session.add(expense)
+    db.session.commit()
+    return expense
+
+
+class TestArchiveCutoff:
+    """Test cases for the archive horizon"""
+
+    @pytest.mark.unit
+    def test_cutoff_is_month_aligned(self):
+        """Test the cutoff lands on the first day of a month"""
+        assert archive_cutoff(12, date(2024, 3, 17)) == date(2023, 3, 1)
+        assert archive_cutoff(3, date(2024, 2, 29)) == date(2023, 11, 1)
+
+
+class TestArchiving:
+    """Test cases for moving cold expenses into the archive"""
+
+    @pytest.mark.integration
+    def test_old_expenses_move_to_archive(self, postgres, sample_user):
+        """Test old non-debt expenses are archived and folded into monthly totals"""
+        add_expense(sample_user.id, date(2020, 1, 5), amount=10.0)
+        add_expense(sample_user.id, date(2020, 1, 20), amount=15.0)
+        add_expense(sample_user.id, date(2020, 2, 1), amount=5.0, category="Transport")
+        add_expense(sample_user.id, date(2020, 1, 9), due_date=date(2020, 2, 9), name="Old debt")
+        add_expense(sample_user.id, date.today(), name="Recent")
+
+        assert archive_expenses(horizon_months=12) == 3
+        assert ArchivedExpense.query.count() == 3
+        assert {e.name for e in Expense.query.all()} == {"Old debt", "Recent"}
+
+        january = db.session.get(ExpenseMonthlyTotal, (sample_user.id, date(2020, 1, 1), categories.id_for("Food"), "USD"))
+        assert january.total == 25.0
+        assert january.count == 2
+        assert archived_totals(sample_user.id, "USD") == (30.0, 3)
+        assert archived_totals(sample_user.id, "USD", year=2021) == (0, 0)
+
+    @pytest.mark.integration
+    def test_archiving_twice_accumulates(self, postgres, sample_user):
+        """Test a later run adds onto existing monthly totals"""
+        add_expense(sample_user.id, date(2020, 1, 5), amount=10.0)
+        archive_expenses(horizon_months=12)
+        add_expense(sample_user.id, date(2020, 1, 6), amount=7.0)
+        archive_expenses(horizon_months=12)
+
+        assert archived_totals(sample_user.id, "USD") == (17.0, 2)
+
+    @pytest.mark.integration
+    def test_days_after_the_last_rate_use_it(self, postgres, sample_user):
+        """Test archived base totals convert expenses dated after the newest rate with that rate"""
+        db.session.add_all([
+            FxRate(currency="EUR", rate_date=date(2019, 12, 31), rate=1.2),
+            FxRate(currency="USD", rate_date=date(2019, 12, 31), rate=1.0),
+            Expense(name="Hotel", amount=10.0, currency="EUR", category="Travel", date=date(2020, 1, 5),
+                    user_id=sample_user.id),
+        ])
+        db.session.commit()
+
+        assert archive_expenses(horizon_months=12) == 1
+        assert archived_totals(sample_user.id, "USD") == (pytest.approx(12.0), 1)
+
+    @pytest.mark.integration
+    def test_reports_unchanged_after_archiving(self, postgres, authenticated_client, sample_user):
+        """Test dashboard and summary totals are the same before and after archiving"""
+        add_expense(sample_user.id, date(2020, 3, 5), amount=40.0)
+        add_expense(sample_user.id, date.today(), amount=2.5)
+
+        before_dashboard = authenticated_client.get("/").data
+        before_summary = authenticated_client.get("/summary").data
+        assert b"42.50" in before_dashboard
+        assert b"2020-03" in before_summary
+
+        archive_expenses(horizon_months=12)
+
+        after_dashboard = authenticated_client.get("/").data
+        after_summary = authenticated_client.get("/summary").data
+        assert b"42.50" in after_dashboard
+        assert b"42.50" in after_summary
+        assert b"2020-03" in after_summary
+        assert b"archived expense" in after_summary
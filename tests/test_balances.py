@@ -0,0 +1,162 @@
+import pytest
+from datetime import date
+from sqlalchemy import func, select
+from models import ArchivedExpense, DailyBalance, Expense, FxRate, User, db
+from utils.balances import _LOCK_CLASS, apply_balance_delta, backfill_balances, rebuild_balances
+from utils.lookups import categories
+
+
+def add(user_id, day, amount, due_date=None, name="Item"):
+    db.session.add(Expense(name=name, amount=amount, category="Food", date=day, due_date=due_date,
+                           user_id=user_id))
+    db.session.commit()
+
+
+def history(user_id):
+    return [
+        (row.day, row.daily_total, row.cumulative_total, row.open_debt)
+        for row in db.session.execute(
+            select(DailyBalance).where(DailyBalance.user_id == user_id).order_by(DailyBalance.day)
+        ).scalars()
+    ]
+
+
+class TestBackfill:
+    """Test cases for rebuilding balance history with window functions"""
+
+    @pytest.mark.integration
+    def test_running_totals_per_user(self, db_session, sample_user):
+        """Test days are summed, accumulated and kept apart per user across batches"""
+        other = User(username="other")
+        other.set_password("password")
+        db.session.add(other)
+        db.session.commit()
+        add(sample_user.id, date(2024, 1, 1), 10.0)
+        add(sample_user.id, date(2024, 1, 1), 5.0)
+        add(sample_user.id, date(2024, 1, 3), 20.0, due_date=date(2024, 2, 1))
+        add(other.id, date(2024, 1, 2), 7.0)
+        db.session.add(ArchivedExpense(id=999, name="Old", amount=100.0, currency="USD",
+                                       category_id=categories.id_for("Food"), date=date(2023, 6, 1),
+                                       user_id=sample_user.id, version=1))
+        db.session.commit()
+
+        assert backfill_balances(batch_users=1) == 4
+        assert history(sample_user.id) == [
+            (date(2023, 6, 1), 100.0, 100.0, 0.0),
+            (date(2024, 1, 1), 15.0, 115.0, 0.0),
+            (date(2024, 1, 3), 20.0, 135.0, 20.0),
+        ]
+        assert history(other.id) == [(date(2024, 1, 2), 7.0, 7.0, 0.0)]
+
+    @pytest.mark.integration
+    def test_partial_rebuild_carries_earlier_totals(self, db_session, sample_user):
+        """Test rebuilding from a date keeps earlier days and continues their totals"""
+        add(sample_user.id, date(2024, 1, 1), 10.0)
+        add(sample_user.id, date(2024, 1, 5), 5.0)
+        backfill_balances()
+        add(sample_user.id, date(2024, 1, 4), 1.0)
+
+        assert rebuild_balances(sample_user.id, since=date(2024, 1, 3)) == 2
+        assert history(sample_user.id) == [
+            (date(2024, 1, 1), 10.0, 10.0, 0.0),
+            (date(2024, 1, 4), 1.0, 11.0, 0.0),
+            (date(2024, 1, 5), 5.0, 16.0, 0.0),
+        ]
+
+    @pytest.mark.integration
+    def test_days_after_the_last_rate_use_it(self, authenticated_client, sample_user):
+        """Test a rebuild converts expenses dated after the newest rate like the incremental writes do"""
+        db.session.add_all([
+            FxRate(currency="EUR", rate_date=date(2024, 1, 1), rate=1.2),
+            FxRate(currency="USD", rate_date=date(2024, 1, 1), rate=1.0),
+        ])
+        db.session.commit()
+        authenticated_client.post("/expenses/new", data={
+            "name": "Hotel", "amount": "10", "currency": "EUR", "category": "Travel", "date": "2024-02-01",
+        })
+        incremental = history(sample_user.id)
+
+        backfill_balances()
+        assert incremental == history(sample_user.id) == [(date(2024, 2, 1), 12.0, 12.0, 0.0)]
+
+
+class TestIncrementalBalances:
+    """Test cases for keeping balances current on every expense write"""
+
+    @pytest.mark.integration
+    def test_writes_match_a_full_rebuild(self, authenticated_client, sample_user):
+        """Test create, edit and delete adjust only the affected days onward"""
+        for day, amount in (("2024-01-01", "10"), ("2024-01-10", "30")):
+            authenticated_client.post("/expenses/new", data={
+                "name": "Item", "amount": amount, "category": "Food", "date": day,
+            })
+        authenticated_client.post("/expenses/new", data={
+            "name": "Loan", "amount": "50", "category": "Debt", "date": "2024-01-05", "due_date": "2024-03-01",
+        })
+        assert history(sample_user.id)[-1] == (date(2024, 1, 10), 30.0, 90.0, 50.0)
+
+        moved = Expense.query.filter_by(name="Item", amount=30.0).one()
+        authenticated_client.post(f"/expenses/{moved.id}/edit", data={
+            "name": "Item", "amount": "35", "category": "Food", "date": "2024-01-03",
+            "version": str(moved.version),
+        })
+        loan = Expense.query.filter_by(name="Loan").one()
+        authenticated_client.post(f"/expenses/{loan.id}/delete", data={"version": str(loan.version)})
+
+        incremental = [row for row in history(sample_user.id) if row[1]]
+        backfill_balances()
+        assert incremental == history(sample_user.id) == [
+            (date(2024, 1, 1), 10.0, 10.0, 0.0),
+            (date(2024, 1, 3), 35.0, 45.0, 0.0),
+        ]
+
+    @pytest.mark.integration
+    def test_bulk_due_date_updates_open_debt(self, authenticated_client, sample_user):
+        """Test bulk actions rebuild the balances from the earliest affected day"""
+        add(sample_user.id, date(2024, 1, 1), 10.0)
+        add(sample_user.id, date(2024, 1, 2), 20.0)
+        backfill_balances()
+        ids = [str(e.id) for e in Expense.query.all()]
+
+        authenticated_client.post("/expenses/bulk", data={
+            "action": "set_due_date", "due_date": "2024-06-01", "ids": ids,
+        })
+        assert history(sample_user.id)[-1] == (date(2024, 1, 2), 20.0, 30.0, 30.0)
+
+    @pytest.mark.integration
+    def test_writes_hold_the_user_lock(self, db_session, sample_user):
+        """Test a balance write keeps the user's advisory lock until commit"""
+        def locked_elsewhere():
+            with db.engine.connect() as conn:
+                acquired = conn.scalar(select(func.pg_try_advisory_xact_lock(_LOCK_CLASS, sample_user.id)))
+                conn.rollback()
+            return not acquired
+
+        apply_balance_delta(sample_user.id, date(2024, 1, 1), 10.0, "USD", "USD")
+        assert locked_elsewhere()
+        db.session.commit()
+        assert not locked_elsewhere()
+
+
+class TestBalanceEndpoint:
+    """Test cases for the balance chart API"""
+
+    @pytest.mark.integration
+    def test_reads_a_range_with_opening_totals(self, authenticated_client, sample_user):
+        """Test the endpoint returns stored days in range and the totals carried into it"""
+        add(sample_user.id, date(2024, 1, 1), 10.0)
+        add(sample_user.id, date(2024, 2, 1), 20.0)
+        add(sample_user.id, date(2024, 3, 1), 40.0)
+        backfill_balances()
+
+        data = authenticated_client.get("/api/balances?start=2024-01-15&end=2024-02-28").get_json()
+        assert data["opening"] == {"cumulative_total": 10.0, "open_debt": 0.0}
+        assert data["days"] == [
+            {"date": "2024-02-01", "daily_total": 20.0, "cumulative_total": 30.0, "open_debt": 0.0},
+        ]
+
+    @pytest.mark.integration
+    def test_rejects_bad_ranges(self, authenticated_client):
+        """Test malformed and inverted ranges are rejected"""
+        assert authenticated_client.get("/api/balances?start=yesterday").status_code == 400
+        assert authenticated_client.get("/api/balances?start=2024-02-01&end=2024-01-01").status_code == 400
@@ -0,0 +1,184 @@
+import pytest
+from datetime import date, timedelta
+from flask import g
+from models import Budget, Expense, db
+from utils.budgets import period_bounds, initialize_budget, rollover_budgets
+from utils.data_version import get_data_version
+
+
+def make_budget(user_id, category="Food", period="monthly", limit_amount=100.0, today=None):
+    budget = Budget(user_id=user_id, category=category, period=period, limit_amount=limit_amount)
+    initialize_budget(budget, today)
+    db.session.add(budget)
+    db.session.commit()
+    return budget
+
+
+class TestPeriodBounds:
+    """Test cases for budget period computation"""
+
+    @pytest.mark.unit
+    def test_monthly_bounds(self):
+        """Test monthly periods, including the December wrap"""
+        assert period_bounds("monthly", date(2025, 3, 17)) == (date(2025, 3, 1), date(2025, 4, 1))
+        assert period_bounds("monthly", date(2025, 12, 5)) == (date(2025, 12, 1), date(2026, 1, 1))
+
+    @pytest.mark.unit
+    def test_weekly_and_yearly_bounds(self):
+        """Test weekly periods start on Monday and yearly on January 1st"""
+        assert period_bounds("weekly", date(2025, 3, 20)) == (date(2025, 3, 17), date(2025, 3, 24))
+        assert period_bounds("yearly", date(2025, 3, 20)) == (date(2025, 1, 1), date(2026, 1, 1))
+
+    @pytest.mark.unit
+    def test_unknown_period(self):
+        """Test that an unknown period is rejected"""
+        with pytest.raises(ValueError):
+            period_bounds("daily", date.today())
+
+
+class TestBudgetModel:
+    """Test cases for Budget model"""
+
+    @pytest.mark.unit
+    def test_initialize_seeds_spend(self, db_session, sample_user, sample_expense):
+        """Test a new budget starts with the current period's spend"""
+        budget = make_budget(sample_user.id, category=sample_expense.category)
+        assert budget.spent == pytest.approx(sample_expense.amount)
+        assert budget.is_over_budget is True
+
+    @pytest.mark.unit
+    def test_rollover_recomputes_spend(self, db_session, sample_user):
+        """Test rollover moves stale budgets into the current period"""
+        last_month = date.today().replace(day=1) - timedelta(days=1)
+        budget = make_budget(sample_user.id, today=last_month)
+        db_session.add(Expense(name="Lunch", amount=30.0, category="Food",
+                               date=date.today(), user_id=sample_user.id))
+        db_session.commit()
+
+        assert rollover_budgets() == 1
+        db_session.refresh(budget)
+        assert budget.period_start == date.today().replace(day=1)
+        assert budget.spent == pytest.approx(30.0)
+        assert rollover_budgets() == 0
+
+
+class TestBudgetRoutes:
+    """Test cases for incremental budget evaluation on expense writes"""
+
+    @pytest.mark.integration
+    def test_create_budget(self, authenticated_client, sample_user):
+        """Test creating a budget through the form"""
+        response = authenticated_client.post("/budgets", data={
+            "category": "Food", "period": "monthly", "limit_amount": "50",
+        }, follow_redirects=True)
+        assert response.status_code == 200
+        assert Budget.query.filter_by(user_id=sample_user.id).count() == 1
+
+    @pytest.mark.integration
+    def test_expense_writes_update_spend(self, authenticated_client, sample_user):
+        """Test that create, edit and delete adjust the running spend"""
+        budget = make_budget(sample_user.id, limit_amount=100.0)
+        today = date.today().strftime("%Y-%m-%d")
+
+        authenticated_client.post("/expenses/new", data={
+            "name": "Groceries", "amount": "80", "category": "Food", "date": today,
+        })
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(80.0)
+
+        expense = Expense.query.filter_by(name="Groceries").one()
+        authenticated_client.post(f"/expenses/{expense.id}/edit", data={
+            "name": "Groceries", "amount": "120", "category": "Food", "date": today,
+        })
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(120.0)
+
+        response = authenticated_client.get("/")
+        assert b"Over budget" in response.data
+
+        authenticated_client.post(f"/expenses/{expense.id}/delete")
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(0.0)
+
+    @pytest.mark.integration
+    def test_bulk_actions_refresh_spend(self, authenticated_client, sample_user, sample_expense):
+        """Test bulk recategorize and delete recompute the affected budgets"""
+        budget = make_budget(sample_user.id, category="Food", limit_amount=500.0)
+        assert budget.spent == pytest.approx(sample_expense.amount)
+
+        authenticated_client.post("/expenses/bulk", data={
+            "action": "recategorize", "category": "Dining", "ids": [sample_expense.id],
+        })
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(0.0)
+
+    @pytest.mark.integration
+    def test_writes_roll_ended_periods(self, authenticated_client, sample_user):
+        """Test an expense write moves a budget left in an ended period into the current one"""
+        last_month = date.today().replace(day=1) - timedelta(days=1)
+        db.session.add(Expense(name="Old", amount=50.0, category="Food", date=last_month, user_id=sample_user.id))
+        db.session.commit()
+        budget = make_budget(sample_user.id, today=last_month)
+        assert budget.spent == pytest.approx(50.0)
+
+        authenticated_client.post("/expenses/new", data={
+            "name": "Lunch", "amount": "30", "category": "Food", "date": date.today().strftime("%Y-%m-%d"),
+        })
+        db.session.refresh(budget)
+        assert budget.period_start == date.today().replace(day=1)
+        assert budget.spent == pytest.approx(30.0)
+
+    @pytest.mark.integration
+    def test_edits_in_ended_periods_count_once(self, authenticated_client, sample_user):
+        """Test editing an expense whose budget period has ended recomputes its spend once"""
+        budget = make_budget(sample_user.id, period="weekly", today=date.today() - timedelta(days=7))
+        db.session.add(Expense(name="Lunch", amount=80.0, category="Food",
+                               date=date.today(), user_id=sample_user.id))
+        db.session.commit()
+
+        expense = Expense.query.filter_by(name="Lunch").one()
+        authenticated_client.post(f"/expenses/{expense.id}/edit", data={
+            "name": "Lunch", "amount": "120", "category": "Food", "date": date.today().strftime("%Y-%m-%d"),
+            "version": str(expense.version),
+        })
+        db.session.refresh(budget)
+        assert budget.period_start == period_bounds("weekly", date.today())[0]
+        assert budget.spent == pytest.approx(120.0)
+
+    @pytest.mark.integration
+    def test_edits_from_unconvertible_amounts_count_once(self, authenticated_client, sample_user):
+        """Test an edit whose old amount had no rate is not added on top of the recomputed spend"""
+        budget = make_budget(sample_user.id)
+        db.session.add(Expense(name="Tea", amount=10.0, currency="GBP", category="Food",
+                               date=date.today(), user_id=sample_user.id))
+        db.session.commit()
+
+        expense = Expense.query.filter_by(name="Tea").one()
+        authenticated_client.post(f"/expenses/{expense.id}/edit", data={
+            "name": "Tea", "amount": "40", "currency": "USD", "category": "Food",
+            "date": date.today().strftime("%Y-%m-%d"), "version": str(expense.version),
+        })
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(40.0)
+
+    @pytest.mark.integration
+    def test_reads_show_ended_periods_rolled_without_writing(self, authenticated_client, sample_user):
+        """Test budget pages show the current period of a stale budget but leave the row alone"""
+        budget = make_budget(sample_user.id, period="weekly", today=date.today() - timedelta(days=7))
+        stored_start = budget.period_start
+        db.session.add(Expense(name="Lunch", amount=30.0, category="Food",
+                               date=date.today(), user_id=sample_user.id))
+        db.session.commit()
+        version = get_data_version(sample_user.id)
+
+        start = period_bounds("weekly", date.today())[0]
+        response = authenticated_client.get("/budgets")
+        assert f"Weekly ({start.strftime('%Y-%m-%d')})".encode() in response.data
+        assert b"30.00" in response.data
+        assert b"30.00" in authenticated_client.get("/").data
+
+        db.session.refresh(budget)
+        assert budget.period_start == stored_start
+        assert budget.spent == pytest.approx(0.0)
+        g.pop("data_versions", None)
+        assert get_data_version(sample_user.id) == version
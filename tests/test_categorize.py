@@ -0,0 +1,145 @@
+import pytest
+from datetime import date
+from models import Budget, CategoryRule, Expense, ExpenseChange, db
+from utils.budgets import initialize_budget
+from utils.categorize import KeywordMatcher, apply_rules, get_matcher
+
+
+class TestKeywordMatcher:
+    """Test cases for the multi-keyword matcher"""
+
+    @pytest.mark.unit
+    def test_matches_keyword_anywhere(self):
+        """Test keywords are found anywhere in the text, ignoring case"""
+        matcher = KeywordMatcher([("starbucks", "Coffee"), ("uber", "Transport")])
+        assert matcher.match("STARBUCKS #1234 Madrid") == "Coffee"
+        assert matcher.match("Trip uber eats") == "Transport"
+        assert matcher.match("Rent") is None
+        assert matcher.match(None) is None
+
+    @pytest.mark.unit
+    def test_longest_keyword_wins(self):
+        """Test a longer keyword overrides a shorter one it contains"""
+        matcher = KeywordMatcher([("uber", "Transport"), ("uber eats", "Food")])
+        assert matcher.match("UBER EATS order") == "Food"
+        assert matcher.match("uber ride") == "Transport"
+
+    @pytest.mark.unit
+    def test_overlapping_keywords_via_failure_links(self):
+        """Test keywords found only by following failure links"""
+        matcher = KeywordMatcher([("she", "A"), ("hers", "B"), ("his", "C")])
+        assert matcher.match("ushers") == "B"
+        assert matcher.match("ushe") == "A"
+        assert matcher.match("this") == "C"
+
+    @pytest.mark.unit
+    def test_ties_go_to_first_rule(self):
+        """Test equally long matches resolve to the earliest rule"""
+        matcher = KeywordMatcher([("gas", "Car"), ("bar", "Drinks")])
+        assert matcher.match("gas bar") == "Car"
+
+
+class TestMatcherCache:
+    """Test cases for the per-user matcher cache"""
+
+    @pytest.mark.integration
+    def test_cache_reused_until_rules_change(self, db_session, sample_user):
+        """Test the compiled matcher is rebuilt only when rules change"""
+        db.session.add(CategoryRule(user_id=sample_user.id, keyword="cafe", category="Coffee"))
+        db.session.commit()
+        first = get_matcher(sample_user.id)
+        assert get_matcher(sample_user.id) is first
+
+        db.session.add(CategoryRule(user_id=sample_user.id, keyword="bus", category="Transport"))
+        db.session.commit()
+        second = get_matcher(sample_user.id)
+        assert second is not first
+        assert second.match("city bus") == "Transport"
+
+
+class TestCategorizationRoutes:
+    """Test cases for rules, auto-categorized creation and pasted imports"""
+
+    @pytest.mark.integration
+    def test_create_and_delete_rule(self, authenticated_client, sample_user):
+        """Test rules are stored lowercase and can be deleted"""
+        authenticated_client.post("/rules", data={"keyword": "Netflix", "category": "Leisure"})
+        rule = CategoryRule.query.one()
+        assert rule.keyword == "netflix"
+
+        response = authenticated_client.post("/rules", data={"keyword": "netflix", "category": "TV"})
+        assert response.status_code == 302
+        assert CategoryRule.query.count() == 1
+
+        authenticated_client.post(f"/rules/{rule.id}/delete")
+        assert CategoryRule.query.count() == 0
+
+    @pytest.mark.integration
+    def test_new_expense_without_category_uses_rules(self, authenticated_client, sample_user):
+        """Test a blank category is filled from the matching rule"""
+        authenticated_client.post("/rules", data={"keyword": "mercadona", "category": "Groceries"})
+        authenticated_client.post("/expenses/new", data={
+            "name": "MERCADONA 0231", "amount": "30", "category": "", "date": date.today().isoformat(),
+        })
+        assert Expense.query.one().category == "Groceries"
+
+    @pytest.mark.integration
+    def test_import_categorizes_pasted_lines(self, authenticated_client, sample_user):
+        """Test imported lines take an explicit category or the matching rule"""
+        authenticated_client.post("/rules", data={"keyword": "shell", "category": "Car"})
+        response = authenticated_client.post("/expenses/import", data={"lines": (
+            "2024-03-01, Shell station 12, 40\n"
+            "2024-03-02, Dinner, 25.5, Restaurants\n"
+            "\n"
+            "2024-03-03, Unknown shop, 5\n"
+        )})
+        assert response.status_code == 302
+
+        categories = {e.name: e.category for e in Expense.query.all()}
+        assert categories == {
+            "Shell station 12": "Car",
+            "Dinner": "Restaurants",
+            "Unknown shop": "Uncategorized",
+        }
+        assert ExpenseChange.query.count() == 3
+
+    @pytest.mark.integration
+    def test_import_rejects_bad_lines(self, authenticated_client, sample_user):
+        """Test one malformed line imports nothing"""
+        response = authenticated_client.post("/expenses/import", data={"lines": (
+            "2024-03-01, Lunch, 10\n"
+            "yesterday, Dinner, 20\n"
+        )})
+        assert response.status_code == 200
+        assert b"Invalid data format" in response.data
+        assert Expense.query.count() == 0
+
+
+class TestApplyRules:
+    """Test cases for re-applying rules to existing expenses"""
+
+    @pytest.mark.integration
+    def test_recategorizes_in_batches(self, db_session, sample_user):
+        """Test only matching rows with a different category are updated"""
+        user_id = sample_user.id
+        today = date.today()
+        db.session.add_all([
+            Expense(name=f"Taxi {i}", amount=10.0, category="Misc", date=today, user_id=user_id)
+            for i in range(5)
+        ] + [
+            Expense(name="Rent", amount=500.0, category="Housing", date=today, user_id=user_id),
+            Expense(name="Taxi ok", amount=8.0, category="Transport", date=today, user_id=user_id),
+        ])
+        db.session.add(CategoryRule(user_id=user_id, keyword="taxi", category="Transport"))
+        budget = Budget(user_id=user_id, category="Transport", period="monthly", limit_amount=100.0)
+        initialize_budget(budget)
+        db.session.add(budget)
+        db.session.commit()
+
+        assert apply_rules(user_id, batch_size=2) == 5
+        db.session.expire_all()
+        assert Expense.query.filter_by(category="Transport").count() == 6
+        assert Expense.query.filter_by(name="Rent").one().category == "Housing"
+        assert Expense.query.filter_by(name="Taxi 0").one().version == 2
+        assert Budget.query.one().spent == pytest.approx(58.0)
+        assert apply_rules(user_id) == 0
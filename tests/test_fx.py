@@ -0,0 +1,138 @@
+import pytest
+from datetime import date, timedelta
+from models import Budget, Expense, FxRate, db
+from utils.budgets import initialize_budget, refresh_all_budgets
+from utils.fx import load_rates, convert, get_rate, parse_currency, clear_rate_cache
+
+
+@pytest.fixture
+def rates_file(tmp_path):
+    """Write a small rates file quoted against USD, with a one-day gap"""
+    today = date.today()
+    path = tmp_path / "rates.csv"
+    path.write_text(
+        "date,currency,rate\n"
+        f"{(today - timedelta(days=2)).isoformat()},EUR,1.10\n"
+        f"{today.isoformat()},EUR,1.20\n"
+    )
+    return path
+
+
+class TestFxRates:
+    """Test cases for exchange rate loading and lookups"""
+
+    @pytest.mark.unit
+    def test_parse_currency(self):
+        """Test currency codes are normalized and validated"""
+        assert parse_currency(" eur ") == "EUR"
+        assert parse_currency("", "GBP") == "GBP"
+        with pytest.raises(ValueError):
+            parse_currency("EURO")
+
+    @pytest.mark.unit
+    def test_load_forward_fills_gaps(self, db_session, rates_file):
+        """Test missing days reuse the previous rate and the pivot is stored"""
+        today = date.today()
+        load_rates(rates_file, fill_to=today)
+
+        assert get_rate("EUR", today - timedelta(days=1)) == pytest.approx(1.10)
+        assert get_rate("EUR", today) == pytest.approx(1.20)
+        assert get_rate("USD", today) == pytest.approx(1.0)
+        assert FxRate.query.filter_by(currency="EUR").count() == 3
+
+    @pytest.mark.unit
+    def test_convert(self, db_session, rates_file):
+        """Test converting between two non-pivot-aligned currencies"""
+        load_rates(rates_file, fill_to=date.today())
+        assert convert(10.0, "EUR", "USD", date.today()) == pytest.approx(12.0)
+        assert convert(12.0, "USD", "EUR", date.today()) == pytest.approx(10.0)
+        assert convert(5.0, "USD", "USD", date(1990, 1, 1)) == 5.0
+        assert convert(5.0, "GBP", "USD", date.today()) is None
+
+    @pytest.mark.unit
+    def test_later_days_fall_back_to_the_last_rate(self, db_session, rates_file):
+        """Test days past the loaded range use the latest earlier rate"""
+        today = date.today()
+        load_rates(rates_file, fill_to=today)
+        next_month = today + timedelta(days=30)
+        assert get_rate("EUR", next_month) == pytest.approx(1.20)
+        assert convert(10.0, "EUR", "USD", next_month) == pytest.approx(12.0)
+        assert get_rate("EUR", today - timedelta(days=3)) is None
+
+    @pytest.mark.unit
+    def test_misses_are_not_cached(self, db_session):
+        """Test a rate loaded after a failed lookup becomes visible"""
+        clear_rate_cache()
+        assert get_rate("JPY", date.today()) is None
+        db_session.add(FxRate(currency="JPY", rate_date=date.today(), rate=0.0067))
+        db_session.commit()
+        assert get_rate("JPY", date.today()) == pytest.approx(0.0067)
+
+
+class TestConvertedAggregates:
+    """Test cases for base-currency totals computed in SQL"""
+
+    @pytest.mark.integration
+    def test_dashboard_and_summary_totals(self, authenticated_client, sample_user, rates_file):
+        """Test mixed-currency expenses are summed in the base currency"""
+        load_rates(rates_file, fill_to=date.today())
+        db.session.add_all([
+            Expense(name="Dinner", amount=10.0, currency="EUR", category="Food",
+                    date=date.today(), user_id=sample_user.id),
+            Expense(name="Taxi", amount=8.0, currency="USD", category="Transport",
+                    date=date.today(), user_id=sample_user.id),
+        ])
+        db.session.commit()
+
+        response = authenticated_client.get("/")
+        assert b"20.00 USD" in response.data
+
+        response = authenticated_client.get("/summary")
+        assert response.status_code == 200
+        assert b"20.00 USD" in response.data
+        assert b"12.00 USD" in response.data
+
+    @pytest.mark.integration
+    def test_future_expenses_use_the_last_rate(self, authenticated_client, sample_user, rates_file):
+        """Test expenses dated after the last loaded rate are still converted"""
+        load_rates(rates_file, fill_to=date.today())
+        db.session.add(Expense(name="Flight", amount=10.0, currency="EUR", category="Travel",
+                               date=date.today() + timedelta(days=60), user_id=sample_user.id))
+        db.session.commit()
+
+        response = authenticated_client.get("/expenses")
+        assert b"12.00 USD" in response.data
+        assert b"no exchange rate" not in response.data
+
+    @pytest.mark.integration
+    def test_unconverted_expenses_are_flagged(self, authenticated_client, sample_user, rates_file):
+        """Test pages say how many expenses had no rate instead of silently dropping them"""
+        load_rates(rates_file, fill_to=date.today())
+        db.session.add(Expense(name="Tea", amount=3.0, currency="GBP", category="Food",
+                               date=date.today(), user_id=sample_user.id, due_date=date.today()))
+        db.session.commit()
+
+        for page in ("/", "/expenses", "/debts", "/summary"):
+            assert b"1 expense(s) have no exchange rate into USD" in authenticated_client.get(page).data
+
+    @pytest.mark.integration
+    def test_budgets_catch_up_once_rates_exist(self, authenticated_client, sample_user, tmp_path):
+        """Test an expense without a rate leaves budgets exact and counts once rates load"""
+        budget = Budget(user_id=sample_user.id, category="Food", period="monthly", limit_amount=100.0)
+        initialize_budget(budget)
+        db.session.add(budget)
+        db.session.commit()
+
+        authenticated_client.post("/expenses/new", data={
+            "name": "Tea", "amount": "10", "currency": "GBP", "category": "Food",
+            "date": date.today().isoformat(),
+        })
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(0.0)
+
+        path = tmp_path / "gbp.csv"
+        path.write_text(f"date,currency,rate\n{(date.today() - timedelta(days=5)).isoformat()},GBP,1.25\n")
+        load_rates(path, fill_to=date.today() - timedelta(days=5))
+        refresh_all_budgets()
+        db.session.refresh(budget)
+        assert budget.spent == pytest.approx(12.5)
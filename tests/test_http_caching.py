@@ -0,0 +1,107 @@
+import gzip
+import zlib
+import pytest
+from datetime import date
+from models import Expense, db
+from utils.compression import CompressionMiddleware
+
+
+def text_app(body, chunks=None):
+    """Minimal WSGI app returning body, either sized or as a chunked stream"""
+    def app(environ, start_response):
+        headers = [("Content-Type", "text/html; charset=utf-8")]
+        if chunks is None:
+            headers.append(("Content-Length", str(len(body))))
+            start_response("200 OK", headers)
+            return [body]
+        start_response("200 OK", headers)
+        return iter(body[i:i + chunks] for i in range(0, len(body), chunks))
+    return app
+
+
+def call(app, accept_encoding="gzip"):
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured["status"] = status
+        captured["headers"] = dict(headers)
+
+    body = b"".join(app({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": accept_encoding},
+                        start_response))
+    return captured["headers"], body
+
+
+class TestCompressionMiddleware:
+    """Test cases for response compression"""
+
+    @pytest.mark.unit
+    def test_compresses_large_responses(self):
+        """Test a sized response above the threshold is gzipped"""
+        body = b"<tr><td>row</td></tr>" * 500
+        headers, data = call(CompressionMiddleware(text_app(body), min_size=1024))
+        assert headers["Content-Encoding"] == "gzip"
+        assert headers["Content-Length"] == str(len(data))
+        assert "Accept-Encoding" in headers["Vary"]
+        assert gzip.decompress(data) == body
+
+    @pytest.mark.unit
+    def test_skips_small_or_unaccepted_responses(self):
+        """Test small bodies and clients without gzip get the identity encoding"""
+        headers, data = call(CompressionMiddleware(text_app(b"tiny"), min_size=1024))
+        assert "Content-Encoding" not in headers and data == b"tiny"
+
+        body = b"x" * 4096
+        headers, data = call(CompressionMiddleware(text_app(body)), accept_encoding="identity")
+        assert "Content-Encoding" not in headers and data == body
+
+    @pytest.mark.unit
+    def test_streams_chunked_responses(self):
+        """Test streamed bodies are compressed chunk by chunk without a length"""
+        body = b"<p>streamed</p>" * 1000
+        app = CompressionMiddleware(text_app(body, chunks=1000))
+        captured = {}
+        stream = app({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"},
+                     lambda status, headers, exc_info=None: captured.update(dict(headers)))
+        first = next(iter(stream))
+        assert "Content-Length" not in captured
+        # Each chunk is sync-flushed, so the first piece already decodes on its own
+        assert zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(first) == body[:1000]
+        assert gzip.decompress(first + b"".join(stream)) == body
+
+
+class TestConditionalGet:
+    """Test cases for data-version ETags on read-only pages"""
+
+    @pytest.mark.integration
+    def test_not_modified_until_write(self, authenticated_client, sample_expense):
+        """Test a matching If-None-Match gets 304 until the user writes"""
+        response = authenticated_client.get("/expenses")
+        etag = response.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        response = authenticated_client.get("/expenses", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+        authenticated_client.post("/expenses/new", data={
+            "name": "Coffee", "amount": "3", "category": "Food",
+            "date": date.today().strftime("%Y-%m-%d"),
+        })
+        authenticated_client.get("/")  # Consume the success flash
+        response = authenticated_client.get("/expenses", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert b"Coffee" in response.data
+
+    @pytest.mark.integration
+    def test_gzip_page(self, authenticated_client, sample_user):
+        """Test large pages are served gzipped to clients that accept it"""
+        db.session.add_all([
+            Expense(name=f"Item {i}", amount=1.0, category="Food",
+                    date=date.today(), user_id=sample_user.id)
+            for i in range(50)
+        ])
+        db.session.commit()
+
+        response = authenticated_client.get("/expenses", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert b"Item 49" in gzip.decompress(response.data)
@@ -0,0 +1,141 @@
+import pytest
+from models import GroupMember, SharedExpense, User, db
+from datetime import date
+from utils.ledger import add_shared_expense, rebuild_group_balances, settle, split_evenly
+
+
+def make_user(username):
+    user = User(username=username)
+    user.set_password("password")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def balances(group_id):
+    return {
+        m.username: round(m.balance, 2)
+        for m in GroupMember.query.filter_by(group_id=group_id).all()
+    }
+
+
+@pytest.fixture
+def group(authenticated_client, sample_user):
+    """A group of the signed-in user, alice and bob"""
+    make_user("alice")
+    make_user("bob")
+    response = authenticated_client.post("/groups", data={"name": "Trip", "members": "alice, bob"})
+    group_id = int(response.headers["Location"].rstrip("/").rsplit("/", 1)[1])
+    return group_id, {m.username: m.user_id for m in GroupMember.query.filter_by(group_id=group_id)}
+
+
+class TestSettle:
+    """Test cases for splitting and settling net balances"""
+
+    @pytest.mark.unit
+    def test_split_evenly_hands_out_leftover_cents(self):
+        """Test shares add up to the amount exactly"""
+        assert split_evenly(10.0, [1, 2, 3]) == {1: 3.34, 2: 3.33, 3: 3.33}
+
+    @pytest.mark.unit
+    def test_largest_debtor_pays_largest_creditor(self):
+        """Test transfers net every balance to zero in at most n - 1 steps"""
+        transfers = settle({1: 50.0, 2: 30.0, 3: -45.0, 4: -25.0, 5: -10.0, 6: 0.0})
+        assert transfers[0] == (3, 1, 45.0)
+        assert len(transfers) <= 4
+
+        net = {1: 50.0, 2: 30.0, 3: -45.0, 4: -25.0, 5: -10.0}
+        for debtor, creditor, amount in transfers:
+            net[debtor] += amount
+            net[creditor] -= amount
+        assert all(abs(v) < 0.005 for v in net.values())
+
+    @pytest.mark.unit
+    def test_settled_group_needs_no_transfers(self):
+        """Test zero and sub-cent balances produce nothing"""
+        assert settle({1: 0.0, 2: 0.001, 3: -0.001}) == []
+
+
+class TestGroups:
+    """Test cases for shared expense groups"""
+
+    @pytest.mark.integration
+    def test_balances_follow_expenses_and_payments(self, authenticated_client, sample_user, group):
+        """Test splits and repayments update balances and the settlement plan"""
+        group_id, ids = group
+        authenticated_client.post(f"/groups/{group_id}/expenses", data={
+            "name": "Hotel", "amount": "90", "date": "2024-05-01", "paid_by": str(sample_user.id),
+        })
+        authenticated_client.post(f"/groups/{group_id}/expenses", data={
+            "name": "Taxi", "amount": "20", "date": "2024-05-02", "paid_by": str(ids["alice"]),
+            "participants": [str(ids["alice"]), str(ids["bob"])],
+        })
+        assert balances(group_id) == {"testuser": 60.0, "alice": -20.0, "bob": -40.0}
+
+        data = authenticated_client.get(f"/api/groups/{group_id}/settlement").get_json()
+        assert data["transfers"] == [
+            {"from": "bob", "to": "testuser", "amount": 40.0},
+            {"from": "alice", "to": "testuser", "amount": 20.0},
+        ]
+        assert b"bob pays testuser 40.00" in authenticated_client.get(f"/groups/{group_id}").data
+        assert b"Trip" in authenticated_client.get("/groups").data
+
+        authenticated_client.post(f"/groups/{group_id}/payments", data={
+            "from_user": str(ids["bob"]), "to_user": str(sample_user.id), "amount": "40",
+        })
+        assert balances(group_id) == {"testuser": 20.0, "alice": -20.0, "bob": 0.0}
+
+    @pytest.mark.integration
+    def test_incremental_balances_match_a_rebuild(self, authenticated_client, sample_user, group):
+        """Test deleting an entry reverses it exactly as recomputing the ledger would"""
+        group_id, ids = group
+        for amount in ("30", "12.5"):
+            authenticated_client.post(f"/groups/{group_id}/expenses", data={
+                "name": "Food", "amount": amount, "date": "2024-05-01", "paid_by": str(ids["bob"]),
+            })
+        entry = SharedExpense.query.filter_by(group_id=group_id, amount=30.0).one()
+        authenticated_client.post(f"/groups/{group_id}/entries/{entry.id}/delete")
+
+        incremental = balances(group_id)
+        rebuild_group_balances(group_id)
+        db.session.commit()
+        assert incremental == balances(group_id) == {"testuser": -4.17, "alice": -4.17, "bob": 8.34}
+
+    @pytest.mark.integration
+    def test_sub_cent_amounts_still_net_to_zero(self, authenticated_client, sample_user, group):
+        """Test the payer is credited the rounded shares, leaving no unpaid residue"""
+        group_id, ids = group
+        authenticated_client.post(f"/groups/{group_id}/expenses", data={
+            "name": "Odd", "amount": "10.005", "date": "2024-05-01", "paid_by": str(ids["bob"]),
+        })
+        owed = balances(group_id)
+        assert abs(sum(owed.values())) < 1e-9
+        transfers = settle({m.user_id: m.balance for m in GroupMember.query.filter_by(group_id=group_id)})
+        assert round(sum(amount for _, _, amount in transfers), 2) == owed["bob"]
+
+    @pytest.mark.integration
+    def test_shares_must_add_up(self, group):
+        """Test custom shares that do not cover the amount are refused"""
+        group_id, ids = group
+        with pytest.raises(ValueError):
+            add_shared_expense(group_id, ids["bob"], "Bad", 10.0, date(2024, 5, 1), {ids["alice"]: 4.0})
+
+    @pytest.mark.integration
+    def test_outsiders_cannot_see_or_write(self, client, group):
+        """Test non-members get a 404 from every group endpoint"""
+        group_id, _ = group
+        outsider = make_user("mallory")
+        with client.session_transaction() as sess:
+            sess["user_id"] = outsider.id
+            sess["username"] = outsider.username
+        assert client.get(f"/groups/{group_id}").status_code == 404
+        assert client.get(f"/api/groups/{group_id}/settlement").status_code == 404
+        assert client.post(f"/groups/{group_id}/expenses", data={
+            "name": "X", "amount": "1", "date": "2024-05-01",
+        }).status_code == 404
+
+    @pytest.mark.integration
+    def test_rejects_unknown_members(self, authenticated_client):
+        """Test a group naming an unknown user is not created"""
+        authenticated_client.post("/groups", data={"name": "Ghosts", "members": "nobody"})
+        assert GroupMember.query.count() == 0
@@ -0,0 +1,83 @@
+import json
+import threading
+import pytest
+from datetime import date
+from models import Expense, db
+from utils.data_version import bump_data_version, get_data_version
+from utils.live_updates import ChangeBroker
+
+
+def read_event(chunks):
+    """Return the data of the next `update` event, skipping keepalives"""
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith("event: update"):
+            return json.loads(text.split("data: ", 1)[1])
+    raise AssertionError("stream ended without an update")
+
+
+class TestChangeBroker:
+    """Test cases for the per-process change broker"""
+
+    @pytest.mark.unit
+    def test_publish_wakes_only_that_user(self):
+        """Test signals are routed by user and coalesce while pending"""
+        broker = ChangeBroker("sqlite://")
+        mine, theirs = broker.subscribe(1), broker.subscribe(2)
+        broker.publish(1)
+        broker.publish(1)
+        assert mine.qsize() == 1
+        assert theirs.empty()
+
+    @pytest.mark.unit
+    def test_connection_limit(self):
+        """Test subscriptions beyond the per-worker bound are refused"""
+        broker = ChangeBroker("sqlite://", max_connections=1)
+        signals = broker.subscribe(1)
+        assert broker.subscribe(1) is None
+        broker.unsubscribe(1, signals)
+        assert broker.subscribe(1) is not None
+
+
+class TestLiveDashboard:
+    """Test cases for the dashboard event stream"""
+
+    @pytest.mark.integration
+    def test_stream_pushes_deltas_after_writes(self, test_app, authenticated_client, sample_user):
+        """Test a committed write produces an event with only the changed values"""
+        test_app.config["SSE_KEEPALIVE_SECONDS"] = 0.2
+        version = get_data_version(sample_user.id)
+        response = authenticated_client.get(f"/events?since={version}", buffered=False)
+        assert response.mimetype == "text/event-stream"
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b"retry:")
+
+        def write():
+            with test_app.app_context():
+                db.session.add(Expense(name="Live", amount=12.5, category="Food",
+                                       date=date.today(), user_id=sample_user.id))
+                bump_data_version(sample_user.id)
+                db.session.commit()
+
+        threading.Timer(0.3, write).start()
+        first = read_event(chunks)
+        assert first["total_expenses"] == 12.5
+        assert first["expenses_count"] == 1
+        assert first["recent_expenses"][0]["name"] == "Live"
+
+        def edit():
+            with test_app.app_context():
+                Expense.query.filter_by(name="Live").update({"name": "Renamed"})
+                bump_data_version(sample_user.id)
+                db.session.commit()
+
+        threading.Timer(0.3, edit).start()
+        second = read_event(chunks)
+        assert set(second) == {"recent_expenses"}
+        response.close()
+
+    @pytest.mark.integration
+    def test_stream_limit_returns_503(self, test_app, authenticated_client):
+        """Test a worker at capacity refuses new streams"""
+        test_app.extensions["live_updates"].max_connections = 0
+        assert authenticated_client.get("/events").status_code == 503
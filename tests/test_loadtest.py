@@ -0,0 +1,104 @@
+import threading
+import pytest
+from werkzeug.serving import make_server
+from models import Expense
+from utils.loadtest import SimulatedUser, StageStats, find_saturation, parse_mix, percentile, run_stage
+
+
+def stage(throughput, errors=0):
+    stats = StageStats()
+    stats.elapsed = 1.0
+    for _ in range(throughput):
+        stats.record("GET /", 0.01, True)
+    for _ in range(errors):
+        stats.record("GET /", 0.01, False)
+    return stats
+
+
+@pytest.fixture
+def live_server(test_app):
+    server = make_server("127.0.0.1", 0, test_app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+class TestLoadTestMath:
+    """Test cases for load-test parsing and reporting helpers"""
+
+    @pytest.mark.unit
+    def test_parse_mix(self):
+        """Test action weights are parsed and validated"""
+        assert parse_mix("browse=3, create=1") == {"browse": 3, "create": 1}
+        with pytest.raises(ValueError):
+            parse_mix("fly=1")
+        with pytest.raises(ValueError):
+            parse_mix("browse=0")
+
+    @pytest.mark.unit
+    def test_percentile_nearest_rank(self):
+        """Test nearest-rank percentiles"""
+        values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        assert percentile(values, 50) == 5
+        assert percentile(values, 95) == 10
+        assert percentile([], 99) == 0.0
+
+    @pytest.mark.unit
+    def test_saturation_when_throughput_flattens(self):
+        """Test the saturation point is the last stage that still scaled"""
+        stages = [(1, stage(100)), (2, stage(190)), (4, stage(200)), (8, stage(205))]
+        assert find_saturation(stages) == 2
+
+    @pytest.mark.unit
+    def test_saturation_on_errors(self):
+        """Test rising errors mark saturation even if throughput grows"""
+        stages = [(1, stage(100)), (2, stage(300, errors=10))]
+        assert find_saturation(stages) == 1
+        assert find_saturation([(1, stage(100)), (2, stage(300))]) is None
+
+
+class TestLoadTestRun:
+    """Test cases for simulated users against a live server"""
+
+    @pytest.mark.integration
+    def test_stage_exercises_pages_and_writes(self, live_server, sample_user):
+        """Test simulated users log in, browse and write without errors"""
+        stats = run_stage(
+            live_server,
+            [("testuser", "testpassword")],
+            duration=1.5,
+            mix={"browse": 1, "create": 1},
+            think_time=0,
+            seed=1,
+        )
+        endpoints = {row[0] for row in stats.endpoint_report()}
+        assert "POST /login" in endpoints
+        assert "POST /expenses/new" in endpoints
+        assert stats.error_rate == 0
+        assert Expense.query.filter_by(user_id=sample_user.id).count() > 0
+
+    @pytest.mark.integration
+    def test_bad_credentials_count_as_errors(self, live_server, sample_user):
+        """Test a login that does not reach the dashboard fails and stops the user"""
+        stats = run_stage(
+            live_server,
+            [("testuser", "wrong password")],
+            duration=0.5,
+            mix={"browse": 1},
+            think_time=0,
+            seed=1,
+        )
+        assert stats.requests == 1
+        assert stats.errors == {"POST /login": 1}
+        assert stats.error_rate == 1.0
+
+    @pytest.mark.integration
+    def test_redirect_to_login_is_an_error(self, live_server, sample_user):
+        """Test pages that bounce a lost session to the login page are not counted as served"""
+        stats = StageStats()
+        user = SimulatedUser(live_server, "testuser", "testpassword", stats, {"browse": 1}, 0, 0)
+        assert user.request("GET /expenses", "/expenses") is None
+        assert user.login()
+        assert user.request("GET /expenses", "/expenses") is not None
+        assert stats.errors == {"GET /expenses": 1}
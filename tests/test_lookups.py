@@ -0,0 +1,120 @@
+import pytest
+from datetime import date
+from sqlalchemy import func, select, text
+from models import Category, Expense, Merchant, db
+from utils.archive import archived_by_category
+from utils.lookups import (
+    categories, drop_legacy_lookup_columns, merchants, migrate_lookup_columns, unmigrated_lookup_columns,
+    verify_lookup_columns,
+)
+
+
+class TestLookupCache:
+    """Test cases for the name <-> id lookup caches"""
+
+    @pytest.mark.integration
+    def test_names_resolve_to_stable_ids(self, db_session):
+        """Test a name is stored once and maps back to itself"""
+        food = categories.id_for("Food")
+        assert categories.id_for("Food") == food
+        assert categories.id_for("Rent") != food
+        assert categories.name_for(food) == "Food"
+        assert categories.id_for("") is None
+        assert db.session.scalar(select(func.count(Category.id))) == 2
+
+    @pytest.mark.integration
+    def test_setters_write_names_with_the_caller(self, db_session, sample_user):
+        """Test a name set on an expense is only stored and cached if the expense commits"""
+        db.session.add(Expense(name="Lost", amount=1.0, category="Gifts", date=date.today(),
+                               user_id=sample_user.id))
+        db.session.rollback()
+        assert db.session.scalar(select(func.count(Category.id))) == 0
+        assert "Gifts" not in categories._ids
+
+        db.session.add(Expense(name="Kept", amount=1.0, category="Gifts", date=date.today(),
+                               user_id=sample_user.id))
+        db.session.commit()
+        assert Expense.query.one().category == "Gifts"
+        assert categories._ids["Gifts"] == Category.query.one().id
+
+    @pytest.mark.integration
+    def test_expense_names_are_shared(self, db_session, sample_user):
+        """Test expenses store ids and still read and filter by name"""
+        for i in range(3):
+            db.session.add(Expense(name=f"Coffee {i}", amount=2.0, category="Food", element="Cafe",
+                                   date=date.today(), user_id=sample_user.id))
+        db.session.commit()
+
+        assert db.session.scalar(select(func.count(Merchant.id))) == 1
+        assert {e.category_id for e in Expense.query.all()} == {categories.id_for("Food")}
+        assert Expense.query.filter_by(category="Food", element="Cafe").count() == 3
+
+
+class TestLookupMigration:
+    """Test cases for converting legacy string columns to lookup ids"""
+
+    @pytest.mark.integration
+    def test_migrates_and_dedups_legacy_columns(self, db_session, sample_user):
+        """Test legacy strings become shared ids and the string columns go away"""
+        db.session.execute(text(
+            "ALTER TABLE expenses DROP COLUMN category_id, DROP COLUMN merchant_id, "
+            "ADD COLUMN category varchar(50), ADD COLUMN element varchar(100)"
+        ))
+        db.session.execute(text(
+            "ALTER TABLE expense_monthly_totals DROP COLUMN category_id, "
+            "ADD COLUMN category varchar(50) NOT NULL, "
+            "ADD PRIMARY KEY (user_id, month, category, currency)"
+        ))
+        for i, (category, element) in enumerate([("Food", "Shop"), ("Food", None), ("Rent", "Shop")]):
+            db.session.execute(text(
+                "INSERT INTO expenses (id, name, amount, currency, category, date, element, user_id, version) "
+                "VALUES (:id, 'Legacy', 10, 'USD', :category, :day, :element, :user_id, 1)"
+            ), {"id": i + 1, "category": category, "element": element, "day": date(2024, 1, i + 1),
+                "user_id": sample_user.id})
+        db.session.execute(text(
+            "INSERT INTO expense_monthly_totals (user_id, month, category, currency, total, count, base_currency) "
+            "VALUES (:user_id, '2020-01-01', 'Travel', 'USD', 50, 2, 'USD')"
+        ), {"user_id": sample_user.id})
+        db.session.commit()
+
+        assert unmigrated_lookup_columns() == ["expenses.category", "expenses.element",
+                                               "expense_monthly_totals.category"]
+        migrated = migrate_lookup_columns()
+        assert "expenses.category" in migrated
+        assert "expense_monthly_totals.category" in migrated
+        assert unmigrated_lookup_columns() == []
+
+        assert sorted(c.name for c in Category.query.all()) == ["Food", "Rent", "Travel"]
+        assert [m.name for m in Merchant.query.all()] == ["Shop"]
+        rows = {e.id: (e.category, e.element) for e in Expense.query.all()}
+        assert rows == {1: ("Food", "Shop"), 2: ("Food", None), 3: ("Rent", "Shop")}
+        assert archived_by_category(sample_user.id, "USD") == {categories.id_for("Travel"): (50.0, 2)}
+        assert merchants.id_for("Shop") == Merchant.query.one().id
+
+        # The legacy columns stay until verified, and new rows may leave them empty
+        assert db.session.scalar(text("SELECT category FROM expenses WHERE id = 1")) == "Food"
+        db.session.add(Expense(name="New", amount=1.0, category="Food", date=date(2024, 2, 1),
+                               user_id=sample_user.id))
+        db.session.commit()
+        assert set(verify_lookup_columns().values()) == {0}
+
+        assert sorted(drop_legacy_lookup_columns()) == [
+            "expense_monthly_totals.category", "expenses.category", "expenses.element",
+        ]
+        assert verify_lookup_columns() == {}
+        assert migrate_lookup_columns() == []
+
+    @pytest.mark.integration
+    def test_legacy_columns_are_kept_until_verified(self, db_session, sample_user):
+        """Test mismatched rows stop the legacy columns from being dropped"""
+        db.session.execute(text("ALTER TABLE expenses ADD COLUMN category varchar(50)"))
+        db.session.add(Expense(name="Drift", amount=1.0, category="Food", date=date(2024, 1, 1),
+                               user_id=sample_user.id))
+        db.session.commit()
+        db.session.execute(text("UPDATE expenses SET category = 'Rent'"))
+        db.session.commit()
+
+        assert verify_lookup_columns() == {"expenses.category": 1}
+        with pytest.raises(ValueError):
+            drop_legacy_lookup_columns()
+        assert db.session.scalar(text("SELECT category FROM expenses")) == "Rent"
@@ -0,0 +1,140 @@
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, insert, select, text
+from models import Category, Expense, Merchant, User, db
+from utils.partitioning import (
+    ensure_partitions, detach_partitions, is_partitioned, migrate_to_partitioned, needs_partition_migration,
+    partition_name, yearly_partitions,
+)
+
+# The expenses table as it was created before partitioning
+_PLAIN_EXPENSES = """
+CREATE TABLE expenses (
+    id SERIAL PRIMARY KEY,
+    name varchar(100) NOT NULL,
+    amount float NOT NULL,
+    currency varchar(3) NOT NULL DEFAULT 'USD',
+    category_id integer NOT NULL REFERENCES categories (id),
+    date date NOT NULL,
+    due_date date,
+    merchant_id integer REFERENCES merchants (id),
+    comment text,
+    user_id integer NOT NULL REFERENCES users (id),
+    created_at timestamp,
+    version integer NOT NULL DEFAULT 1
+)
+"""
+
+
+@pytest.fixture
+def partitioned(db_session):
+    if not is_partitioned():
+        pytest.skip("expense partitioning requires Postgres")
+    return db_session
+
+
+def add_expense(user_id, day, name="Partitioned"):
+    expense = Expense(name=name, amount=10.0, category="Food", date=day, user_id=user_id)
+    db.session.add(expense)
+    db.session.commit()
+    return expense
+
+
+class TestPartitioning:
+    """Test cases for yearly range partitioning of expenses"""
+
+    @pytest.mark.integration
+    def test_ensure_creates_current_and_future_years(self, partitioned):
+        """Test partitions are pre-created through the look-ahead window"""
+        this_year = date.today().year
+        created = ensure_partitions(years_ahead=2)
+        assert created == [partition_name(y) for y in range(this_year, this_year + 3)]
+        assert ensure_partitions(years_ahead=2) == []
+
+    @pytest.mark.integration
+    def test_history_moves_out_of_default_partition(self, partitioned, sample_user):
+        """Test creating a partition relocates rows parked in the default partition"""
+        expense = add_expense(sample_user.id, date(2019, 6, 1))
+        created = ensure_partitions(years_ahead=0)
+
+        assert partition_name(2019) in created
+        assert db.session.scalar(text("SELECT count(*) FROM expenses_default")) == 0
+        assert db.session.scalar(text("SELECT count(*) FROM expenses_y2019")) == 1
+        assert db.session.get(Expense, expense.id).name == "Partitioned"
+
+    @pytest.mark.integration
+    def test_year_filter_prunes_partitions(self, partitioned, sample_user):
+        """Test a single-year query only scans that year's partition"""
+        ensure_partitions(years_ahead=0, from_year=2020)
+        plan = "\n".join(db.session.execute(text(
+            "EXPLAIN SELECT * FROM expenses WHERE user_id = 1 "
+            "AND date >= '2021-01-01' AND date < '2022-01-01'"
+        )).scalars())
+        assert "expenses_y2021" in plan
+        assert "expenses_y2020" not in plan
+        assert "expenses_default" not in plan
+
+    @pytest.mark.integration
+    def test_detach_old_partitions(self, partitioned, sample_user):
+        """Test old partitions are detached while keeping their rows"""
+        add_expense(sample_user.id, date(2018, 3, 1))
+        ensure_partitions(years_ahead=0)
+
+        assert detach_partitions(2019) == [partition_name(2018)]
+        assert 2018 not in yearly_partitions()
+        assert db.session.scalar(text("SELECT count(*) FROM expenses_y2018")) == 1
+        assert Expense.query.filter(Expense.date < date(2019, 1, 1)).count() == 0
+        db.session.execute(text("DROP TABLE expenses_y2018"))
+        db.session.commit()
+
+    @pytest.mark.integration
+    def test_expenses_year_filter(self, authenticated_client, sample_user):
+        """Test the expenses page can be limited to one year"""
+        add_expense(sample_user.id, date(2020, 5, 5), name="Old purchase")
+        add_expense(sample_user.id, date.today(), name="New purchase")
+
+        response = authenticated_client.get(f"/expenses?year={date.today().year}")
+        assert b"New purchase" in response.data
+        assert b"Old purchase" not in response.data
+
+    @pytest.mark.integration
+    def test_plain_table_is_migrated(self, partitioned, sample_user):
+        """Test an unpartitioned expenses table is rebuilt in place, keeping rows and ids"""
+        db.session.execute(text("DROP TABLE expenses CASCADE"))
+        db.session.execute(text(_PLAIN_EXPENSES))
+        db.session.execute(text("CREATE INDEX ix_expenses_user_date ON expenses (user_id, date)"))
+        db.session.commit()
+        old = add_expense(sample_user.id, date(2019, 6, 1), name="Before")
+        assert needs_partition_migration()
+        assert ensure_partitions() == []
+
+        assert migrate_to_partitioned() == 1
+        assert is_partitioned()
+        assert not needs_partition_migration()
+        assert migrate_to_partitioned() is None
+        assert partition_name(2019) in ensure_partitions(years_ahead=0)
+
+        new = add_expense(sample_user.id, date.today(), name="After")
+        assert new.id > old.id
+        assert db.session.get(Expense, old.id).name == "Before"
+        assert db.session.scalar(text("SELECT count(*) FROM expenses_y2019")) == 1
+
+
+class TestOtherDatabases:
+    """Test cases for the expenses table outside Postgres"""
+
+    @pytest.mark.unit
+    def test_sqlite_gets_a_plain_autoincrementing_key(self):
+        """Test SQLite creates the table without partitioning and numbers rows itself"""
+        engine = create_engine("sqlite://")
+        db.metadata.create_all(engine, tables=[
+            User.__table__, Category.__table__, Merchant.__table__, Expense.__table__,
+        ])
+        with engine.begin() as conn:
+            conn.execute(insert(User.__table__).values(username="lite", password_hash="x"))
+            conn.execute(insert(Category.__table__).values(name="Food"))
+            for _ in range(2):
+                conn.execute(insert(Expense.__table__).values(
+                    name="Lite", amount=1.0, category_id=1, date=date.today(), user_id=1,
+                ))
+            assert conn.scalars(select(Expense.__table__.c.id)).all() == [1, 2]
@@ -0,0 +1,40 @@
+import pytest
+from datetime import date, timedelta
+from models import Expense, db
+from utils.projections import ExpenseRow, project_expenses
+
+
+class TestProjectedRows:
+    """Test cases for the column-projected list read path"""
+
+    @pytest.mark.integration
+    def test_rows_carry_derived_fields(self, db_session, sample_user):
+        """Test overdue state and days until due are computed from one reference day"""
+        today = date(2024, 5, 10)
+        db.session.add_all([
+            Expense(name="Late", amount=5, category="Bills", date=today,
+                    due_date=today - timedelta(days=2), user_id=sample_user.id),
+            Expense(name="Soon", amount=7, category="Bills", date=today,
+                    due_date=today + timedelta(days=3), user_id=sample_user.id),
+            Expense(name="Paid", amount=1, category="Food", date=today, user_id=sample_user.id),
+        ])
+        db.session.commit()
+
+        rows = {r.name: r for r in project_expenses(
+            Expense.user_id == sample_user.id, order_by=[Expense.id], today=today,
+        )}
+        assert isinstance(rows["Late"], ExpenseRow)
+        assert (rows["Late"].is_overdue, rows["Late"].days_until_due) == (True, -2)
+        assert (rows["Soon"].is_overdue, rows["Soon"].days_until_due) == (False, 3)
+        assert not rows["Paid"].is_debt and rows["Paid"].days_until_due is None
+        assert not hasattr(rows["Paid"], "__dict__")
+
+    @pytest.mark.integration
+    def test_query_runs_only_when_iterated(self, db_session, sample_user, query_budget):
+        """Test building a projection issues no SQL until it is iterated"""
+        user_id = sample_user.id
+        with query_budget(0):
+            rows = project_expenses(Expense.user_id == user_id, order_by=[Expense.id])
+        with query_budget(1):
+            assert len(rows) == 0
+            assert list(rows) == []
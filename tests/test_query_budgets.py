@@ -0,0 +1,57 @@
+import pytest
+from datetime import date, timedelta
+from models import Expense, db
+
+# SQL statements per page, exactly what it issues today, independent of how many
+# expenses the user has. Every page starts with the data version behind its ETag.
+ROUTE_BUDGETS = {
+    # totals with archived months, budgets, upcoming debts, latest expenses
+    # (plus a fallback read for accounts with few recent entries)
+    "/": 6,
+    "/expenses": 3,  # totals, the page of expenses
+    "/debts": 3,  # totals, the page of debts
+    # snapshot, its expenses, archived months and categories, the expense list
+    "/summary": 6,
+    "/budgets": 1,  # budgets with their current spend; the page has no ETag
+}
+
+
+def add_expenses(user_id, count):
+    today = date.today()
+    db.session.add_all([
+        Expense(
+            name=f"Expense {i}",
+            amount=10.0 + i,
+            category=f"Category {i % 4}",
+            date=today - timedelta(days=i),
+            due_date=today + timedelta(days=i) if i % 3 == 0 else None,
+            user_id=user_id,
+        )
+        for i in range(count)
+    ])
+    db.session.commit()
+    db.session.expire_all()
+
+
+class TestQueryBudgets:
+    """Test cases guarding pages against N+1 query regressions"""
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("path", list(ROUTE_BUDGETS))
+    @pytest.mark.parametrize("rows", [1, 30])
+    def test_route_within_budget(self, authenticated_client, sample_user, query_budget, path, rows):
+        """Test each page stays within its query budget for small and large accounts"""
+        add_expenses(sample_user.id, rows)
+        with query_budget(ROUTE_BUDGETS[path]):
+            response = authenticated_client.get(path)
+        assert response.status_code == 200
+
+    @pytest.mark.integration
+    def test_lazy_loads_exceed_budget(self, db_session, sample_user, query_budget):
+        """Test per-row lazy loads are reported as a budget failure"""
+        add_expenses(sample_user.id, 5)
+        with pytest.raises(pytest.fail.Exception, match="budget is 2"):
+            with query_budget(2):
+                for expense in Expense.query.all():
+                    db.session.expire(expense.user)
+                    expense.user.username
@@ -0,0 +1,82 @@
+import threading
+import pytest
+from datetime import date
+from flask import g
+from sqlalchemy import select
+from models import Expense, db
+from utils import metrics
+from utils.query_pool import QueryPool, gather
+
+
+def gathered(mode):
+    return metrics.snapshot().get(("query_gather_total", (("mode", mode),)), 0)
+
+
+class TestGather:
+    """Test cases for running independent queries concurrently"""
+
+    @pytest.mark.integration
+    def test_runs_on_separate_threads_in_order(self, test_app, sample_expense):
+        """Test calls run on worker threads with their own sessions and keep their order"""
+        def read(i):
+            return i, threading.get_ident(), db.session.scalar(select(Expense.name))
+
+        with test_app.test_request_context("/"):
+            results = gather(*(lambda i=i: read(i) for i in range(3)))
+
+        assert [r[0] for r in results] == [0, 1, 2]
+        assert [r[2] for r in results] == ["Test Expense"] * 3
+        assert len({r[1] for r in results}) == 3
+        assert results[0][1] == threading.get_ident()
+
+    @pytest.mark.integration
+    def test_workers_inherit_routing_state(self, test_app):
+        """Test read-only and shard flags reach the worker threads"""
+        with test_app.test_request_context("/"):
+            g.read_only = True
+            g.shard_key = "default"
+            flags = gather(lambda: None, lambda: (g.get("read_only"), g.get("shard_key")))
+        assert flags[1] == (True, "default")
+
+    @pytest.mark.integration
+    def test_errors_propagate(self, test_app):
+        """Test an exception raised on a worker reaches the caller"""
+        def fail():
+            raise ValueError("boom")
+
+        with test_app.test_request_context("/"), pytest.raises(ValueError):
+            gather(lambda: 1, fail)
+
+    @pytest.mark.integration
+    def test_sequential_under_pool_pressure(self, test_app):
+        """Test no work is offloaded when the connection pool has no idle connection"""
+        metrics.reset()
+        held = [db.engine.connect() for _ in range(db.engine.pool.size())]
+        try:
+            with test_app.test_request_context("/"):
+                idents = gather(threading.get_ident, threading.get_ident)
+        finally:
+            for conn in held:
+                conn.close()
+        assert set(idents) == {threading.get_ident()}
+        assert gathered("sequential") == 1
+
+    @pytest.mark.integration
+    def test_disabled_pool_is_sequential(self, test_app):
+        """Test QUERY_CONCURRENCY=0 keeps every call on the request thread"""
+        test_app.extensions["query_pool"] = QueryPool(0)
+        with test_app.test_request_context("/"):
+            idents = gather(threading.get_ident, threading.get_ident, threading.get_ident)
+        assert set(idents) == {threading.get_ident()}
+
+    @pytest.mark.integration
+    def test_pages_use_the_pool(self, test_app, authenticated_client, sample_user):
+        """Test the dashboard and summary render from concurrently gathered queries"""
+        db.session.add(Expense(name="Gathered", amount=3.0, category="Food", date=date.today(),
+                               user_id=sample_user.id))
+        db.session.commit()
+        metrics.reset()
+
+        assert b"Gathered" in authenticated_client.get("/").data
+        assert b"Gathered" in authenticated_client.get("/summary").data
+        assert gathered("concurrent") == 2
@@ -0,0 +1,112 @@
+import io
+import os
+import pytest
+from models import Attachment, db
+from utils.receipts import blob_path, collect_garbage, referenced_blobs, remove_orphaned_attachments
+
+PDF = b"%PDF-1.4 receipt " + bytes(range(256)) * 400
+
+
+def upload(client, expense_id, data=PDF, filename="receipt.pdf", content_type="application/pdf"):
+    return client.post(f"/expenses/{expense_id}/receipts", data={
+        "receipt": (io.BytesIO(data), filename, content_type),
+    }, content_type="multipart/form-data")
+
+
+class TestReceiptUploads:
+    """Test cases for attaching receipts to expenses"""
+
+    @pytest.mark.integration
+    def test_duplicates_share_one_blob(self, authenticated_client, sample_expense):
+        """Test identical uploads are stored once under their SHA-256"""
+        upload(authenticated_client, sample_expense.id)
+        upload(authenticated_client, sample_expense.id, filename="again.pdf")
+
+        attachments = Attachment.query.order_by(Attachment.id).all()
+        assert [a.filename for a in attachments] == ["receipt.pdf", "again.pdf"]
+        assert attachments[0].sha256 == attachments[1].sha256
+        assert attachments[0].size == len(PDF)
+        with open(blob_path(attachments[0].sha256), "rb") as blob:
+            assert blob.read() == PDF
+        assert b"again.pdf" in authenticated_client.get(f"/expenses/{sample_expense.id}/edit").data
+
+    @pytest.mark.integration
+    def test_rejects_large_and_unsafe_files(self, test_app, authenticated_client, sample_expense):
+        """Test oversized uploads and scriptable types are refused without a row"""
+        test_app.config["RECEIPT_MAX_BYTES"] = 1024
+        upload(authenticated_client, sample_expense.id)
+        upload(authenticated_client, sample_expense.id, data=b"<script>", filename="x.html",
+               content_type="text/html")
+        assert Attachment.query.count() == 0
+        assert os.listdir(os.path.join(test_app.config["RECEIPTS_DIR"], "tmp")) == []
+
+    @pytest.mark.integration
+    def test_only_owner_can_attach(self, client, sample_expense, admin_user):
+        """Test another user cannot attach to someone else's expense"""
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_user.id
+        upload(client, sample_expense.id)
+        assert Attachment.query.count() == 0
+
+
+class TestReceiptDownloads:
+    """Test cases for serving receipts"""
+
+    @pytest.mark.integration
+    def test_streams_with_ranges_and_etag(self, authenticated_client, sample_expense):
+        """Test downloads support partial content and conditional requests"""
+        upload(authenticated_client, sample_expense.id)
+        attachment = Attachment.query.one()
+        url = f"/receipts/{attachment.id}"
+
+        full = authenticated_client.get(url)
+        assert full.status_code == 200
+        assert full.mimetype == "application/pdf"
+        assert full.data == PDF
+        assert "private" in full.headers["Cache-Control"]
+
+        partial = authenticated_client.get(url, headers={"Range": "bytes=5-14"})
+        assert partial.status_code == 206
+        assert partial.data == PDF[5:15]
+
+        cached = authenticated_client.get(url, headers={"If-None-Match": f'"{attachment.sha256}"'})
+        assert cached.status_code == 304
+
+    @pytest.mark.integration
+    def test_other_users_get_404(self, client, authenticated_client, sample_expense, admin_user):
+        """Test a receipt is invisible to other users"""
+        upload(authenticated_client, sample_expense.id)
+        attachment = Attachment.query.one()
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_user.id
+        assert client.get(f"/receipts/{attachment.id}").status_code == 404
+
+
+class TestReceiptGarbageCollection:
+    """Test cases for removing unreferenced receipts"""
+
+    @pytest.mark.integration
+    def test_gc_keeps_referenced_and_recent_blobs(self, authenticated_client, sample_expense):
+        """Test only old blobs without references are deleted"""
+        upload(authenticated_client, sample_expense.id)
+        upload(authenticated_client, sample_expense.id, data=b"%PDF other", filename="other.pdf")
+        kept, dropped = Attachment.query.order_by(Attachment.id).all()
+        authenticated_client.post(f"/receipts/{dropped.id}/delete")
+
+        assert collect_garbage(referenced_blobs()) == (0, 0)
+        assert collect_garbage(referenced_blobs(), grace_seconds=-1) == (1, len(b"%PDF other"))
+        assert os.path.exists(blob_path(kept.sha256))
+        assert not os.path.exists(blob_path(dropped.sha256))
+
+    @pytest.mark.integration
+    def test_deleted_expenses_release_their_receipts(self, authenticated_client, sample_expense):
+        """Test deleting an expense drops its attachments and GC sweeps any left behind"""
+        upload(authenticated_client, sample_expense.id)
+        db.session.add(Attachment(user_id=sample_expense.user_id, expense_id=999999, sha256="0" * 64,
+                                  filename="stale.pdf", content_type="application/pdf", size=1))
+        db.session.commit()
+
+        authenticated_client.post(f"/expenses/{sample_expense.id}/delete")
+        assert [a.expense_id for a in Attachment.query.all()] == [999999]
+        assert remove_orphaned_attachments() == 1
+        assert collect_garbage(referenced_blobs(), grace_seconds=-1) == (1, len(PDF))
@@ -0,0 +1,135 @@
+import json
+import pytest
+from datetime import date, timedelta
+from models import DebtReminder, Expense, db
+from utils.reminders import (
+    DUE_SOON, OVERDUE, LogSink, ReminderSink, deliver_reminders, enqueue_reminders, get_sink,
+)
+
+TODAY = date(2024, 6, 15)
+
+
+def add_debt(user_id, due_in, name="Loan", amount=100.0):
+    db.session.add(Expense(name=name, amount=amount, category="Debt", date=date(2024, 6, 1),
+                           due_date=TODAY + timedelta(days=due_in), user_id=user_id))
+    db.session.commit()
+
+
+class FlakySink(ReminderSink):
+    def __init__(self):
+        self.sent = []
+
+    def send(self, reminder):
+        if reminder["name"] == "Broken":
+            raise RuntimeError("mail server down")
+        self.sent.append(reminder)
+
+
+class TestEnqueueReminders:
+    """Test cases for queueing debt reminders into the outbox"""
+
+    @pytest.mark.integration
+    def test_selects_due_soon_and_recent_overdue(self, db_session, sample_user):
+        """Test only debts inside the reminder windows get a reminder of the right kind"""
+        add_debt(sample_user.id, 2, name="Soon")
+        add_debt(sample_user.id, -5, name="Late")
+        add_debt(sample_user.id, 10, name="Later")
+        add_debt(sample_user.id, -90, name="Ancient")
+        db.session.add(Expense(name="Paid", amount=5.0, category="Food", date=TODAY, user_id=sample_user.id))
+        db.session.commit()
+
+        assert enqueue_reminders(today=TODAY, days_ahead=3, overdue_days=30) == 2
+        kinds = {r.payload["name"]: r.kind for r in DebtReminder.query.all()}
+        assert kinds == {"Soon": DUE_SOON, "Late": OVERDUE}
+
+    @pytest.mark.integration
+    def test_batches_and_reruns_are_idempotent(self, db_session, sample_user):
+        """Test small keyset batches cover every debt and a rerun adds nothing"""
+        for i in range(7):
+            add_debt(sample_user.id, i % 3, name=f"Debt {i}")
+
+        assert enqueue_reminders(today=TODAY, batch_size=2) == 7
+        assert enqueue_reminders(today=TODAY, batch_size=2) == 0
+        assert DebtReminder.query.count() == 7
+
+    @pytest.mark.integration
+    def test_overdue_after_due_soon(self, db_session, sample_user):
+        """Test a debt reminded as due soon is reminded again once overdue"""
+        add_debt(sample_user.id, 1)
+        enqueue_reminders(today=TODAY)
+        enqueue_reminders(today=TODAY + timedelta(days=2))
+        assert sorted(r.kind for r in DebtReminder.query.all()) == [DUE_SOON, OVERDUE]
+
+
+class TestDeliverReminders:
+    """Test cases for delivering the outbox through sinks"""
+
+    @pytest.mark.integration
+    def test_marks_sent_and_records_failures(self, db_session, sample_user):
+        """Test delivered reminders are not resent and failures are retried later"""
+        add_debt(sample_user.id, 1, name="Fine")
+        add_debt(sample_user.id, 2, name="Broken")
+        enqueue_reminders(today=TODAY)
+
+        sink = FlakySink()
+        assert deliver_reminders(sink, batch_size=1) == (1, 1)
+        assert [r["name"] for r in sink.sent] == ["Fine"]
+
+        broken = DebtReminder.query.filter(DebtReminder.sent_at.is_(None)).one()
+        assert broken.attempts == 1
+        assert broken.last_error == "mail server down"
+
+        assert deliver_reminders(sink) == (0, 1)
+        assert deliver_reminders(sink, max_attempts=2) == (0, 0)
+
+    @pytest.mark.integration
+    def test_deleted_and_rescheduled_debts_are_not_reminded(self, authenticated_client, sample_user):
+        """Test reminders of debts removed or moved after queueing are dropped, not delivered"""
+        add_debt(sample_user.id, 1, name="Deleted")
+        add_debt(sample_user.id, 2, name="Moved")
+        add_debt(sample_user.id, 3, name="Kept")
+        enqueue_reminders(today=TODAY)
+
+        deleted = Expense.query.filter_by(name="Deleted").one()
+        authenticated_client.post(f"/expenses/{deleted.id}/delete")
+        moved = Expense.query.filter_by(name="Moved").one()
+        moved.due_date = TODAY + timedelta(days=20)
+        db.session.commit()
+
+        sink = FlakySink()
+        assert deliver_reminders(sink) == (1, 0)
+        assert [r["name"] for r in sink.sent] == ["Kept"]
+        assert DebtReminder.query.count() == 1
+
+    @pytest.mark.unit
+    def test_sinks_must_implement_send(self):
+        """Test a sink without send cannot be built"""
+        class Silent(ReminderSink):
+            pass
+
+        with pytest.raises(TypeError):
+            Silent()
+
+    @pytest.mark.integration
+    def test_file_sink_writes_json_lines(self, db_session, sample_user, tmp_path):
+        """Test the file sink appends one JSON object per reminder"""
+        add_debt(sample_user.id, 1, amount=42.0)
+        enqueue_reminders(today=TODAY)
+        path = tmp_path / "reminders.jsonl"
+
+        assert deliver_reminders(get_sink(f"file:{path}")) == (1, 0)
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert lines == [{
+            "id": lines[0]["id"], "user_id": sample_user.id, "expense_id": lines[0]["expense_id"],
+            "kind": DUE_SOON, "name": "Loan", "amount": 42.0, "currency": "USD",
+            "due_date": "2024-06-16", "days_until_due": 1,
+        }]
+
+    @pytest.mark.unit
+    def test_get_sink(self):
+        """Test sink specs resolve to sink instances"""
+        assert isinstance(get_sink("log"), LogSink)
+        assert isinstance(get_sink(None), LogSink)
+        assert isinstance(get_sink("utils.reminders:LogSink"), LogSink)
+        with pytest.raises(ValueError):
+            get_sink("carrier-pigeon")
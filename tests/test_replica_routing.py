@@ -0,0 +1,117 @@
+import os
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from models import Category, Expense, User, db
+from src.app import create_app
+from utils import metrics
+from utils.lookups import categories
+
+
+@pytest.fixture
+def replica_url(app_config):
+    """Second database standing in for a read replica; skipped when unreachable"""
+    primary = make_url(app_config["SQLALCHEMY_DATABASE_URI"])
+    url = os.getenv(
+        "TEST_REPLICA_DATABASE_URL",
+        primary.set(database=f"{primary.database}_replica").render_as_string(hide_password=False),
+    )
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        pytest.skip("replica test database is not available")
+    finally:
+        engine.dispose()
+    return url
+
+
+@pytest.fixture
+def replica_app(app_config, replica_url):
+    """App with a primary and one replica database"""
+    config = {
+        **app_config,
+        "SQLALCHEMY_REPLICA_URIS": [replica_url],
+        "REPLICA_STICKY_SECONDS": 60,
+    }
+    app = create_app(config)
+    with app.app_context():
+        replica = app.extensions["db_replicas"]["replica_0"]
+        db.drop_all()
+        db.create_all()
+        # Nothing replicates into the stand-in, so build its schema explicitly
+        db.metadata.drop_all(replica)
+        db.metadata.create_all(replica)
+        metrics.reset()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        db.metadata.drop_all(replica)
+        replica.dispose()
+
+
+@pytest.fixture
+def replica_client(replica_app):
+    """Logged-in client whose user exists on both databases with different data"""
+    user = User(username="reader")
+    user.set_password("password")
+    db.session.add(user)
+    db.session.add(Expense(name="Primary row", amount=1.0, category="Food",
+                           date=date.today(), user=user))
+    db.session.commit()
+
+    with replica_app.extensions["db_replicas"]["replica_0"].begin() as conn:
+        conn.execute(User.__table__.insert().values(
+            id=user.id, username="reader", password_hash=user.password_hash, base_currency="USD"))
+        food = categories.id_for("Food")
+        conn.execute(Category.__table__.insert().values(id=food, name="Food"))
+        conn.execute(Expense.__table__.insert().values(
+            id=1000, name="Replica row", amount=2.0, category_id=food, currency="USD",
+            date=date.today(), user_id=user.id))
+
+    client = replica_app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user.id
+        sess["username"] = user.username
+    return client
+
+
+class TestReplicaRouting:
+    """Test cases for read-replica routing and read-your-writes"""
+
+    @pytest.mark.integration
+    def test_read_only_pages_use_replica(self, replica_client):
+        """Test read-only endpoints query the replica"""
+        response = replica_client.get("/")
+        assert b"Replica row" in response.data
+        assert b"Primary row" not in response.data
+
+        counts = metrics.snapshot()
+        assert counts[("db_route_total", (("reason", "read_only"), ("target", "replica_0")))] > 0
+
+    @pytest.mark.integration
+    def test_reads_stick_to_primary_after_write(self, replica_client):
+        """Test a user's reads go to the primary right after they write"""
+        replica_client.post("/expenses/new", data={
+            "name": "Fresh write", "amount": "5", "category": "Food",
+            "date": date.today().strftime("%Y-%m-%d"),
+        })
+        response = replica_client.get("/")
+        assert b"Fresh write" in response.data
+        assert b"Replica row" not in response.data
+
+        counts = metrics.snapshot()
+        assert counts[("db_route_total", (("reason", "sticky"), ("target", "primary")))] > 0
+        assert counts[("db_route_total", (("reason", "write"), ("target", "primary")))] > 0
+
+    @pytest.mark.integration
+    def test_metrics_endpoint_requires_admin(self, replica_app, replica_client):
+        """Test routing metrics are exposed to administrators only"""
+        replica_client.get("/")
+        assert replica_client.get("/metrics").status_code == 403
+        with replica_client.session_transaction() as sess:
+            sess["is_admin"] = True
+        response = replica_client.get("/metrics")
+        assert b"db_route_total" in response.data
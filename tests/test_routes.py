@@ -27,6 +27,15 @@ class TestIndexRoute:
         assert str(sample_expense.amount).encode() in response.data
         assert str(sample_debt.amount).encode() in response.data
 
+    @pytest.mark.integration
+    def test_latest_expenses_fall_back_past_the_date_bound(self, authenticated_client):
+        """Test backdated entries still show while the recent partitions hold too few"""
+        authenticated_client.post("/expenses/new", data={
+            "name": "Old receipt", "amount": "12", "category": "Food",
+            "date": (date.today() - timedelta(days=400)).isoformat(),
+        })
+        assert b"Old receipt" in authenticated_client.get("/").data
+
 
 class TestExpenseRoutes:
     """Test cases for expense-related routes"""
@@ -188,3 +197,124 @@ class TestErrorHandling:
         response = client.get(f"/expenses/{sample_expense.id}/edit", follow_redirects=True)
         assert response.status_code == 200
         # Should redirect to expenses list with error message
+
+
+class TestBulkExpenseRoutes:
+    """Test cases for multi-select bulk actions"""
+
+    @pytest.fixture
+    def owned_expenses(self, db_session, sample_user):
+        from models import Expense
+        expenses = [
+            Expense(name=f"Imported {i}", amount=10.0, category="Misc",
+                    date=date.today(), user_id=sample_user.id)
+            for i in range(3)
+        ]
+        db_session.add_all(expenses)
+        db_session.commit()
+        return expenses
+
+    @pytest.mark.integration
+    def test_bulk_delete(self, authenticated_client, owned_expenses):
+        """Test deleting several expenses at once"""
+        from models import Expense
+        ids = [e.id for e in owned_expenses[:2]]
+        response = authenticated_client.post("/expenses/bulk", data={
+            "action": "delete", "ids": ids,
+        }, follow_redirects=True)
+
+        assert b"2 expense(s) deleted" in response.data
+        assert Expense.query.filter(Expense.id.in_(ids)).count() == 0
+        assert Expense.query.count() == 1
+
+    @pytest.mark.integration
+    def test_bulk_recategorize_and_due_dates(self, authenticated_client, owned_expenses):
+        """Test recategorizing and setting/clearing due dates in bulk"""
+        from models import Expense, db
+        ids = [e.id for e in owned_expenses]
+        due = date.today() + timedelta(days=10)
+
+        authenticated_client.post("/expenses/bulk", data={
+            "action": "recategorize", "category": "Groceries", "ids": ids,
+        })
+        authenticated_client.post("/expenses/bulk", data={
+            "action": "set_due_date", "due_date": due.strftime("%Y-%m-%d"), "ids": ids[:1],
+        })
+        db.session.expire_all()
+        assert {e.category for e in Expense.query.all()} == {"Groceries"}
+        assert Expense.query.filter(Expense.due_date == due).count() == 1
+
+        authenticated_client.post("/expenses/bulk", data={"action": "clear_due_date", "ids": ids})
+        db.session.expire_all()
+        assert Expense.query.filter(Expense.due_date.isnot(None)).count() == 0
+
+    @pytest.mark.integration
+    def test_bulk_ignores_other_users_rows(self, client, owned_expenses):
+        """Test bulk actions only touch the current user's expenses"""
+        from models import Expense, User, db
+        other_user = User(username="otheruser")
+        other_user.set_password("password")
+        db.session.add(other_user)
+        db.session.commit()
+        with client.session_transaction() as sess:
+            sess["user_id"] = other_user.id
+            sess["username"] = other_user.username
+
+        response = client.post("/expenses/bulk", data={
+            "action": "delete", "ids": [e.id for e in owned_expenses],
+        }, follow_redirects=True)
+        assert b"0 expense(s) deleted" in response.data
+        assert Expense.query.count() == 3
+
+
+class TestOptimisticConcurrency:
+    """Test cases for version-checked edits and deletes"""
+
+    def edit_form(self, **overrides):
+        form = {
+            "name": "Edited", "amount": "42.00", "category": "Food",
+            "date": date.today().strftime("%Y-%m-%d"),
+        }
+        form.update(overrides)
+        return form
+
+    @pytest.mark.integration
+    def test_edit_increments_version(self, authenticated_client, sample_expense):
+        """Test a successful edit bumps the row version"""
+        from models import Expense, db
+        response = authenticated_client.post(
+            f"/expenses/{sample_expense.id}/edit", data=self.edit_form(version=1)
+        )
+        assert response.status_code == 302
+        db.session.expire_all()
+        expense = db.session.get(Expense, sample_expense.id)
+        assert expense.version == 2
+        assert expense.name == "Edited"
+
+    @pytest.mark.integration
+    def test_stale_edit_conflicts(self, authenticated_client, sample_expense):
+        """Test an edit from a stale form is rejected instead of overwriting"""
+        from models import Expense, db
+        expense_id = sample_expense.id
+        authenticated_client.post(f"/expenses/{expense_id}/edit",
+                                  data=self.edit_form(name="First tab", version=1))
+
+        response = authenticated_client.post(f"/expenses/{expense_id}/edit",
+                                             data=self.edit_form(name="Second tab", version=1))
+        assert response.status_code == 409
+        assert b"changed in another window" in response.data
+        db.session.expire_all()
+        assert db.session.get(Expense, expense_id).name == "First tab"
+
+    @pytest.mark.integration
+    def test_stale_delete_conflicts(self, authenticated_client, sample_expense):
+        """Test a delete with an outdated version keeps the row"""
+        from models import Expense, db
+        expense_id = sample_expense.id
+        authenticated_client.post(f"/expenses/{expense_id}/edit", data=self.edit_form(version=1))
+
+        response = authenticated_client.post(f"/expenses/{expense_id}/delete",
+                                             data={"version": 1}, follow_redirects=True)
+        assert b"was not deleted" in response.data
+        db.session.expire_all()
+        assert db.session.get(Expense, expense_id) is not None
@@ -0,0 +1,251 @@
+import os
+import pytest
+from datetime import date
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import make_url
+from models import Budget, Category, CategoryRule, Expense, ShardDirectory, User, db
+from src.app import create_app
+from utils.lookups import (
+    drop_legacy_lookup_columns, migrate_lookup_columns, unmigrated_lookup_columns, verify_lookup_columns,
+)
+from utils.sharding import (
+    SHARD_ID_STRIDE, ShardMoveError, create_user, directory_entry, find_user, move_user, prepare_shards,
+    use_shard,
+)
+
+
+@pytest.fixture
+def shard_urls(app_config):
+    """Two extra databases standing in for shards; skipped when unreachable"""
+    primary = make_url(app_config["SQLALCHEMY_DATABASE_URI"])
+    urls = [
+        url.strip() for url in os.getenv("TEST_SHARD_DATABASE_URLS", "").split(",") if url.strip()
+    ] or [
+        primary.set(database=f"{primary.database}_shard{i}").render_as_string(hide_password=False)
+        for i in (1, 2)
+    ]
+    for url in urls:
+        engine = create_engine(url)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception:
+            pytest.skip("shard test databases are not available")
+        finally:
+            engine.dispose()
+    return urls
+
+
+@pytest.fixture
+def sharded_app(app_config, shard_urls):
+    """App whose user data is spread over the primary and two shards"""
+    app = create_app({**app_config, "SQLALCHEMY_SHARD_URIS": shard_urls, "SHARD_CACHE_SECONDS": 0})
+    shards = list(app.extensions["db_shards"].values())
+    with app.app_context():
+        db.drop_all()
+        for engine in shards:
+            db.metadata.drop_all(engine)
+        db.create_all()
+        prepare_shards()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        for engine in shards:
+            db.metadata.drop_all(engine)
+            engine.dispose()
+
+
+def shard_count(app, key, model, **filters):
+    """Rows of model on one shard, read straight from its engine"""
+    engine = db.engine if key == "default" else app.extensions["db_shards"][key]
+    query = select(func.count()).select_from(model.__table__)
+    for column, value in filters.items():
+        query = query.where(model.__table__.c[column] == value)
+    with engine.connect() as conn:
+        return conn.scalar(query)
+
+
+def login(app, username, password="password"):
+    client = app.test_client()
+    client.post("/login", data={"username": username, "password": password})
+    return client
+
+
+class TestShardPlacement:
+    """Test cases for placing users and routing their data"""
+
+    @pytest.mark.integration
+    def test_users_spread_over_the_least_loaded_shards(self, sharded_app):
+        """Test new users fill the emptiest shard and ids never collide"""
+        users = [create_user(f"user{i}", "password") for i in range(3)]
+        placed = dict(db.session.execute(select(ShardDirectory.username, ShardDirectory.shard)).all())
+        assert placed == {"user0": "default", "user1": "shard_1", "user2": "shard_2"}
+        assert len({u.id for u in users}) == 3
+        assert shard_count(sharded_app, "shard_1", User) == 1
+        assert find_user("user2").id == users[2].id
+        assert find_user("nobody") is None
+
+    @pytest.mark.integration
+    def test_requests_read_and_write_the_users_shard(self, sharded_app):
+        """Test a logged-in user's writes land on their shard with the shard's id lane"""
+        create_user("first", "password")
+        user = create_user("second", "password")
+        client = login(sharded_app, "second")
+        client.post("/expenses/new", data={
+            "name": "Sharded lunch", "amount": "12", "category": "Food",
+            "date": date.today().strftime("%Y-%m-%d"),
+        })
+
+        assert shard_count(sharded_app, "shard_1", Expense, user_id=user.id) == 1
+        assert shard_count(sharded_app, "default", Expense) == 0
+        assert b"Sharded lunch" in client.get("/expenses").data
+        with use_shard("shard_1"):
+            assert Expense.query.one().id % SHARD_ID_STRIDE == 1
+
+    @pytest.mark.integration
+    def test_shard_is_cached_in_the_session(self, sharded_app, monkeypatch):
+        """Test the directory is read once per cache period, not on every request"""
+        sharded_app.config["SHARD_CACHE_SECONDS"] = 60
+        create_user("cached", "password")
+        client = login(sharded_app, "cached")
+        lookups = []
+        original = directory_entry
+
+        def counting(user_id):
+            lookups.append(user_id)
+            return original(user_id)
+
+        monkeypatch.setattr("utils.sharding.directory_entry", counting)
+        for _ in range(3):
+            assert client.get("/expenses").status_code == 200
+        assert len(lookups) == 1
+
+    @pytest.mark.integration
+    def test_use_shard_refuses_pending_changes(self, sharded_app):
+        """Test switching shards with unflushed changes raises instead of dropping them"""
+        db.session.add(ShardDirectory(user_id=999, username="pending"))
+        with pytest.raises(RuntimeError):
+            with use_shard("shard_1"):
+                pass
+        db.session.rollback()
+
+
+class TestMoveUser:
+    """Test cases for rebalancing a user onto another shard"""
+
+    def populate(self, shard, username="mover"):
+        user = create_user(username, "password", shard=shard)
+        with use_shard(shard):
+            for i in range(5):
+                db.session.add(Expense(name=f"Item {i}", amount=10.0 + i, category="Food", element="Shop",
+                                       date=date(2024, 1, i + 1), user_id=user.id))
+            db.session.add(CategoryRule(user_id=user.id, keyword="shop", category="Food"))
+            db.session.commit()
+            ids = sorted(e.id for e in Expense.query.all())
+        return user, ids
+
+    @pytest.mark.integration
+    def test_moves_every_row_and_keeps_ids(self, sharded_app):
+        """Test rows are copied with their ids, the directory flips and the source is emptied"""
+        user, ids = self.populate("shard_1")
+        copied = move_user(user.id, "shard_2", grace_seconds=0, batch_size=2)
+
+        assert copied == 1 + 5 + 1
+        assert shard_count(sharded_app, "shard_1", Expense) == 0
+        assert shard_count(sharded_app, "shard_1", User) == 0
+        assert db.session.get(ShardDirectory, user.id).shard == "shard_2"
+        with use_shard("shard_2"):
+            assert sorted(e.id for e in Expense.query.all()) == ids
+            assert {e.category for e in Expense.query.all()} == {"Food"}
+            assert CategoryRule.query.count() == 1
+
+        client = login(sharded_app, "mover")
+        assert b"Item 4" in client.get("/expenses").data
+
+    @pytest.mark.integration
+    def test_new_rows_after_a_move_do_not_collide(self, sharded_app):
+        """Test the target shard keeps allocating ids in its own lane after a move"""
+        user, ids = self.populate("shard_1")
+        move_user(user.id, "shard_2", grace_seconds=0)
+        with use_shard("shard_2"):
+            db.session.add(Expense(name="After", amount=1.0, category="Food",
+                                   date=date(2024, 2, 1), user_id=user.id))
+            db.session.add(Budget(user_id=user.id, category="Food", limit_amount=100.0,
+                                  period_start=date(2024, 2, 1), period_end=date(2024, 3, 1)))
+            db.session.commit()
+            new_id = Expense.query.filter_by(name="After").one().id
+        assert new_id not in ids
+        assert new_id % SHARD_ID_STRIDE == 2
+
+    @pytest.mark.integration
+    def test_moving_user_gets_retry_later(self, sharded_app):
+        """Test requests of a user in the middle of a move are turned away with 503"""
+        sharded_app.config["SHARD_CACHE_SECONDS"] = 60
+        user, _ = self.populate("shard_1")
+        client = login(sharded_app, "mover")
+        assert client.get("/expenses").status_code == 200
+        db.session.get(ShardDirectory, user.id).moving = True
+        db.session.commit()
+
+        # Still served from the cached shard until the cache period runs out
+        assert client.get("/expenses").status_code == 200
+        with client.session_transaction() as sess:
+            user_id, shard, checked = sess["shard"]
+            sess["shard"] = [user_id, shard, checked - sharded_app.config["SHARD_CACHE_SECONDS"]]
+        response = client.get("/expenses")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+    @pytest.mark.integration
+    def test_failed_move_leaves_user_in_place(self, sharded_app, monkeypatch):
+        """Test a move failing mid-copy rolls the target back and keeps the user on the source"""
+        user, _ = self.populate("shard_1")
+        with pytest.raises(ShardMoveError):
+            move_user(user.id, "shard_9", grace_seconds=0)
+
+        def broken(conn, index):
+            raise RuntimeError("target went away")
+
+        monkeypatch.setattr("utils.sharding._interleave_sequences", broken)
+        with pytest.raises(RuntimeError):
+            move_user(user.id, "shard_2", grace_seconds=0)
+
+        entry = db.session.get(ShardDirectory, user.id)
+        assert (entry.shard, entry.moving) == ("shard_1", False)
+        assert shard_count(sharded_app, "shard_1", Expense) == 5
+        assert shard_count(sharded_app, "shard_2", Expense) == 0
+
+
+class TestShardLookupMigration:
+    """Test cases for migrating legacy lookup columns on every shard"""
+
+    @pytest.mark.integration
+    def test_shards_get_the_primary_ids(self, sharded_app):
+        """Test legacy strings on a shard are backfilled with the ids the primary assigns"""
+        user = create_user("legacy", "password", shard="shard_1")
+        with sharded_app.extensions["db_shards"]["shard_1"].begin() as conn:
+            conn.execute(text(
+                "ALTER TABLE expenses DROP COLUMN category_id, DROP COLUMN merchant_id, "
+                "ADD COLUMN category varchar(50), ADD COLUMN element varchar(100)"
+            ))
+            conn.execute(text(
+                "INSERT INTO expenses (id, name, amount, currency, category, date, element, user_id, version) "
+                "VALUES (1, 'Legacy', 10, 'USD', 'Heirloom', '2024-01-01', 'Attic', :user_id, 1)"
+            ), {"user_id": user.id})
+
+        assert unmigrated_lookup_columns() == ["shard_1:expenses.category", "shard_1:expenses.element"]
+        assert migrate_lookup_columns() == ["shard_1:expenses.category", "shard_1:expenses.element"]
+        assert unmigrated_lookup_columns() == []
+
+        primary_id = db.session.scalar(select(Category.id).where(Category.name == "Heirloom"))
+        with use_shard("shard_1"):
+            expense = Expense.query.one()
+            assert expense.category_id == primary_id
+            assert (expense.category, expense.element) == ("Heirloom", "Attic")
+        assert b"Heirloom" in login(sharded_app, "legacy").get("/expenses").data
+        # The request shared this app context; release its shard transaction before the DDL
+        db.session.remove()
+
+        assert verify_lookup_columns() == {"shard_1:expenses.category": 0, "shard_1:expenses.element": 0}
+        assert drop_legacy_lookup_columns() == ["shard_1:expenses.category", "shard_1:expenses.element"]
+        assert verify_lookup_columns() == {}
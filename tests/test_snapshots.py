@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pytest
+from datetime import date
+from sqlalchemy import update
+from controllers.expense_route import _summary_aggregates
+from models import Expense, db
+from utils import snapshots
+from utils.snapshots import load_snapshot, refresh_snapshot, snapshots_enabled, summarize
+from utils.data_version import bump_data_version
+from utils.lookups import categories
+from utils.partitioning import year_predicates
+
+
+def add_expense(user_id, day, amount=10.0, category="Food", due_date=None):
+    expense = Expense(
+        name="Snap", amount=amount, category=category, date=day, due_date=due_date, user_id=user_id,
+    )
+    db.session.add(expense)
+    bump_data_version(user_id)
+    db.session.commit()
+    return expense
+
+
+class TestSnapshots:
+    """Test cases for memory-mapped analytics snapshots"""
+
+    @pytest.mark.integration
+    def test_columns_match_rows(self, db_session, sample_user):
+        """Test the snapshot holds one entry per expense in each column"""
+        add_expense(sample_user.id, date(2024, 1, 5), amount=12.5)
+        add_expense(sample_user.id, date(2024, 2, 1), category="Transport", due_date=date(2024, 3, 1))
+
+        snapshot = load_snapshot(sample_user.id)
+        assert isinstance(snapshot.amounts, np.memmap)
+        assert list(snapshot.dates) == [date(2024, 1, 5).toordinal(), date(2024, 2, 1).toordinal()]
+        assert list(snapshot.amounts) == [12.5, 10.0]
+        names = categories.names_for(snapshot.category_ids)
+        assert [names[snapshot.category_ids[i]] for i in snapshot.categories] == ["Food", "Transport"]
+        assert list(snapshot.due_dates) == [0, date(2024, 3, 1).toordinal()]
+
+    @pytest.mark.integration
+    def test_appends_are_incremental(self, db_session, sample_user):
+        """Test new rows extend the current generation instead of rewriting it"""
+        add_expense(sample_user.id, date(2024, 1, 5))
+        first = refresh_snapshot(sample_user.id)
+        add_expense(sample_user.id, date(2024, 1, 6), category="Books")
+        second = refresh_snapshot(sample_user.id)
+
+        assert second["generation"] == first["generation"]
+        assert second["rows"] == 2
+        assert second["category_ids"] == [categories.id_for("Food"), categories.id_for("Books")]
+
+    @pytest.mark.integration
+    def test_edits_rebuild_snapshot(self, db_session, sample_user):
+        """Test an edited row triggers a new generation with the new values"""
+        expense = add_expense(sample_user.id, date(2024, 1, 5))
+        first = refresh_snapshot(sample_user.id)
+        db.session.execute(
+            update(Expense).where(Expense.id == expense.id).values(amount=99.0, version=Expense.version + 1)
+        )
+        bump_data_version(sample_user.id)
+        db.session.commit()
+
+        snapshot = load_snapshot(sample_user.id)
+        user_dir = os.path.join(snapshots._snapshot_root(), str(sample_user.id))
+        assert list(snapshot.amounts) == [99.0]
+        assert not os.path.exists(os.path.join(user_dir, f"{first['generation']}.amount"))
+
+    @pytest.mark.integration
+    def test_summarize_matches_sql(self, db_session, sample_user):
+        """Test snapshot aggregates agree with the summary's SQL aggregates"""
+        add_expense(sample_user.id, date(2023, 12, 31), amount=5.0)
+        add_expense(sample_user.id, date(2024, 1, 5), amount=10.0)
+        add_expense(sample_user.id, date(2024, 1, 9), amount=2.0, category="Books", due_date=date(2024, 2, 1))
+
+        category_rows, months, paid, debts, unconverted = summarize(load_snapshot(sample_user.id), year=2024)
+        assert sorted(category_rows) == sorted([
+            (categories.id_for("Books"), 2.0, 1), (categories.id_for("Food"), 10.0, 1),
+        ])
+        assert months == [("2024-01", 12.0)]
+        assert (paid, debts, unconverted) == (10.0, 2.0, 0)
+
+    @pytest.mark.integration
+    @pytest.mark.parametrize("year", [None, 2024])
+    def test_summarize_agrees_with_summary_aggregates(self, db_session, sample_user, year):
+        """Test the snapshot and the SQL path of the summary page return the same totals"""
+        add_expense(sample_user.id, date(2023, 12, 31), amount=5.0)
+        add_expense(sample_user.id, date(2024, 1, 5), amount=10.0)
+        add_expense(sample_user.id, date(2024, 1, 9), amount=2.5, category="Books", due_date=date(2024, 2, 1))
+        add_expense(sample_user.id, date(2024, 3, 2), amount=7.25, category="Books")
+
+        criteria = [Expense.user_id == sample_user.id]
+        if year:
+            criteria.extend(year_predicates(Expense.date, year))
+        add_expense(sample_user.id, date(2024, 3, 3), amount=3.0)
+        db.session.execute(update(Expense).where(Expense.amount == 3.0).values(currency="GBP"))
+        bump_data_version(sample_user.id)
+        db.session.commit()
+
+        sql_categories, sql_months, sql_paid, sql_debts, sql_unconverted = _summary_aggregates(criteria, "USD")
+        snap_categories, snap_months, snap_paid, snap_debts, snap_unconverted = summarize(
+            load_snapshot(sample_user.id), year
+        )
+
+        assert sorted(snap_categories) == sorted((r.category_id, r.total, r.count) for r in sql_categories)
+        assert snap_months == [(r.month, r.total) for r in sql_months]
+        assert (snap_paid, snap_debts, snap_unconverted) == (sql_paid, sql_debts, sql_unconverted)
+        assert snap_unconverted == 1
+
+    @pytest.mark.integration
+    def test_summary_page_uses_snapshot(self, authenticated_client, sample_user):
+        """Test the summary page renders totals computed from the snapshot"""
+        assert snapshots_enabled()
+        add_expense(sample_user.id, date(2024, 1, 5), amount=10.0)
+        add_expense(sample_user.id, date(2024, 1, 9), amount=2.25)
+
+        response = authenticated_client.get("/summary")
+        assert b"12.25" in response.data
+        assert b"2024-01" in response.data
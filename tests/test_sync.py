@@ -0,0 +1,118 @@
+import pytest
+from datetime import date
+from models import Expense, ExpenseChange, db
+
+
+def pull(client, since=0, **params):
+    response = client.get("/sync", query_string={"since": since, **params})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def push(client, *changes):
+    return client.post("/sync", json={"changes": list(changes)})
+
+
+def new_change(client_id, name="Synced", amount=10.0, **fields):
+    return {"op": "upsert", "client_id": client_id, "name": name, "amount": amount,
+            "category": "Food", "date": date.today().isoformat(), **fields}
+
+
+class TestChangeLog:
+    """Test cases for the expense change log written by the web routes"""
+
+    @pytest.mark.integration
+    def test_routes_append_changes(self, authenticated_client, sample_user):
+        """Test create, edit and delete each append one entry"""
+        today = date.today().isoformat()
+        form = {"name": "Lunch", "amount": "12", "category": "Food", "date": today}
+        authenticated_client.post("/expenses/new", data=form)
+        expense = Expense.query.filter_by(name="Lunch").one()
+        authenticated_client.post(f"/expenses/{expense.id}/edit", data={**form, "amount": "15"})
+        authenticated_client.post(f"/expenses/{expense.id}/delete")
+
+        ops = [c.op for c in ExpenseChange.query.order_by(ExpenseChange.seq)]
+        assert ops == ["upsert", "upsert", "delete"]
+
+    @pytest.mark.integration
+    def test_bulk_actions_log_each_row(self, authenticated_client, sample_user):
+        """Test bulk actions log one entry per affected expense"""
+        push(authenticated_client, new_change("a"), new_change("b"))
+        ids = [e.id for e in Expense.query.all()]
+        authenticated_client.post("/expenses/bulk", data={"action": "delete", "ids": ids})
+
+        deletes = ExpenseChange.query.filter_by(op="delete").all()
+        assert sorted(c.expense_id for c in deletes) == sorted(ids)
+
+
+class TestSyncApi:
+    """Test cases for the /sync pull and push endpoints"""
+
+    @pytest.mark.integration
+    def test_pull_returns_only_new_changes(self, authenticated_client, sample_user):
+        """Test a cursor only returns changes made after it"""
+        push(authenticated_client, new_change("a", name="First"))
+        first = pull(authenticated_client)
+        assert [c["expense"]["name"] for c in first["changes"]] == ["First"]
+
+        push(authenticated_client, new_change("b", name="Second"))
+        second = pull(authenticated_client, since=first["cursor"])
+        assert [c["expense"]["name"] for c in second["changes"]] == ["Second"]
+        assert pull(authenticated_client, since=second["cursor"])["changes"] == []
+
+    @pytest.mark.integration
+    def test_pull_collapses_and_pages(self, authenticated_client, sample_user):
+        """Test repeated changes collapse to current state and batches page"""
+        created = push(authenticated_client, new_change("a"), new_change("b")).get_json()["created"]
+        expense = db.session.get(Expense, created["a"])
+        push(authenticated_client, {**new_change(None, name="Edited"), "id": expense.id})
+        push(authenticated_client, {"op": "delete", "id": created["b"]})
+
+        page = pull(authenticated_client, limit=2)
+        assert page["has_more"] is True
+        rest = pull(authenticated_client, since=page["cursor"], limit=10)
+        assert rest["has_more"] is False
+        final = {c.get("id") or c["expense"]["id"]: c for c in rest["changes"]}
+        assert final[expense.id]["expense"]["name"] == "Edited"
+        assert final[created["b"]] == {"op": "delete", "id": created["b"]}
+
+    @pytest.mark.integration
+    def test_push_is_all_or_nothing(self, authenticated_client, sample_user):
+        """Test a stale version rejects the whole batch"""
+        created = push(authenticated_client, new_change("a")).get_json()["created"]
+        response = push(
+            authenticated_client,
+            new_change("b", name="Never stored"),
+            {**new_change(None), "id": created["a"], "version": 99},
+        )
+        assert response.status_code == 409
+        assert response.get_json()["conflicts"] == [created["a"]]
+        assert Expense.query.filter_by(name="Never stored").count() == 0
+
+    @pytest.mark.integration
+    def test_push_validates_input(self, authenticated_client, sample_user):
+        """Test malformed changes are refused"""
+        assert push(authenticated_client, {"op": "upsert", "name": "x"}).status_code == 400
+        assert authenticated_client.post("/sync", json={}).status_code == 400
+
+    @pytest.mark.integration
+    def test_push_rejects_malformed_shapes(self, authenticated_client, sample_user):
+        """Test bodies and changes of the wrong shape get a 400, not a server error"""
+        assert authenticated_client.post("/sync", json=[new_change("a")]).status_code == 400
+        assert authenticated_client.post("/sync", json={"changes": {"op": "delete"}}).status_code == 400
+        assert push(authenticated_client, "delete").status_code == 400
+        assert push(authenticated_client, {"op": "delete", "id": "1"}).status_code == 400
+        assert push(authenticated_client, {"op": "delete", "id": True}).status_code == 400
+        assert push(authenticated_client, {**new_change(None), "id": 1, "version": "2"}).status_code == 400
+        assert push(authenticated_client, {"op": "drop", "id": 1}).status_code == 400
+        assert Expense.query.count() == 0
+
+    @pytest.mark.integration
+    def test_changes_are_private(self, client, sample_user, admin_user):
+        """Test users only see their own changes"""
+        with client.session_transaction() as sess:
+            sess["user_id"] = admin_user.id
+        push(client, new_change("a"))
+        with client.session_transaction() as sess:
+            sess["user_id"] = sample_user.id
+        assert pull(client)["changes"] == []
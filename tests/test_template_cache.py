@@ -0,0 +1,81 @@
+import os
+import pytest
+from sqlalchemy import update
+from models import Expense, db
+from utils.data_version import bump_data_version, get_data_version
+from utils.template_cache import FragmentCache
+
+
+class TestFragmentCache:
+    """Test cases for the LRU fragment store"""
+
+    @pytest.mark.unit
+    def test_evicts_least_recently_used(self):
+        """Test the store keeps at most max_entries fragments"""
+        cache = FragmentCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert len(cache) == 2
+
+    @pytest.mark.unit
+    def test_evicts_to_stay_under_byte_cap(self):
+        """Test the store evicts old fragments once the total size exceeds max_bytes"""
+        cache = FragmentCache(max_entries=10, max_bytes=10, max_entry_bytes=10)
+        cache.set("a", "x" * 4)
+        cache.set("b", "y" * 4)
+        cache.set("c", "z" * 4)
+        assert cache.get("a") is None
+        assert cache.get("b") == "y" * 4
+        assert cache.total_bytes == 8
+
+    @pytest.mark.unit
+    def test_skips_oversized_fragments(self):
+        """Test fragments above max_entry_bytes are not stored and replace any older copy"""
+        cache = FragmentCache(max_entries=10, max_bytes=100, max_entry_bytes=5)
+        cache.set("a", "small")
+        cache.set("a", "much too large")
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        assert cache.total_bytes == 0
+
+
+class TestTemplateCaching:
+    """Test cases for bytecode and fragment caching of rendered pages"""
+
+    @pytest.mark.integration
+    def test_bytecode_cache_written(self, test_app, authenticated_client):
+        """Test compiled templates are persisted to the bytecode cache directory"""
+        authenticated_client.get("/expenses")
+        cache_dir = test_app.jinja_env.bytecode_cache.directory
+        assert any(name.startswith("__jinja2_") for name in os.listdir(cache_dir))
+
+    @pytest.mark.integration
+    def test_rows_served_from_cache_until_version_bump(self, authenticated_client, sample_expense):
+        """Test table rows are reused until the user's data version changes"""
+        response = authenticated_client.get("/expenses")
+        assert b"Test Expense" in response.data
+
+        # Change the row behind the app's back: the cached fragment is still served
+        db.session.execute(
+            update(Expense).where(Expense.id == sample_expense.id).values(name="Renamed")
+        )
+        db.session.commit()
+        response = authenticated_client.get("/expenses")
+        assert b"Test Expense" in response.data
+
+        bump_data_version(sample_expense.user_id)
+        db.session.commit()
+        response = authenticated_client.get("/expenses")
+        assert b"Renamed" in response.data
+
+    @pytest.mark.integration
+    def test_expense_write_bumps_version(self, authenticated_client, sample_expense):
+        """Test deleting an expense invalidates the user's cached fragments"""
+        user_id = sample_expense.user_id
+        before = get_data_version(user_id)
+        authenticated_client.post(f"/expenses/{sample_expense.id}/delete")
+        assert get_data_version(user_id) == before + 1
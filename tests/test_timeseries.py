@@ -0,0 +1,134 @@
+import pytest
+from datetime import date, timedelta
+from sqlalchemy import select
+from models import Expense, FxRate, TimeseriesBucket, db
+from utils.data_version import bump_data_version, get_data_version
+from utils.timeseries import bucket_totals, buckets, downsample, pick_granularity
+
+
+def add(user_id, day, amount, category="Food"):
+    db.session.add(Expense(name="Item", amount=amount, category=category, date=day, user_id=user_id))
+    db.session.commit()
+
+
+def stored(user_id, granularity):
+    return {
+        row.bucket_start: row.totals
+        for row in db.session.execute(
+            select(TimeseriesBucket).where(TimeseriesBucket.user_id == user_id,
+                                           TimeseriesBucket.granularity == granularity)
+        ).scalars()
+    }
+
+
+class TestBuckets:
+    """Test cases for bucketing and downsampling date ranges"""
+
+    @pytest.mark.unit
+    def test_buckets_cover_whole_periods(self):
+        """Test a range is split into whole calendar buckets"""
+        assert buckets("month", date(2024, 1, 15), date(2024, 3, 1)) == [
+            (date(2024, 1, 1), date(2024, 2, 1)),
+            (date(2024, 2, 1), date(2024, 3, 1)),
+            (date(2024, 3, 1), date(2024, 4, 1)),
+        ]
+
+    @pytest.mark.unit
+    def test_pick_granularity_coarsens_long_ranges(self):
+        """Test the finest granularity within the point budget is chosen"""
+        start, end = date(2024, 1, 1), date(2024, 12, 31)
+        assert pick_granularity(start, end, 400) == "day"
+        assert pick_granularity(start, end, 100) == "week"
+        assert pick_granularity(start, end, 20) == "month"
+        assert pick_granularity(start, end, 20, finest="year") == "year"
+
+    @pytest.mark.unit
+    def test_downsample_merges_neighbours(self):
+        """Test consecutive points are summed per category until they fit"""
+        points = [(i, {1: 1.0, 2: float(i)}) for i in range(5)]
+        assert downsample(points, 10) == points
+        assert downsample(points, 2) == [(0, {1: 3.0, 2: 3.0}), (3, {1: 2.0, 2: 7.0})]
+
+
+class TestTimeseriesEndpoint:
+    """Test cases for the time-series chart API"""
+
+    @pytest.mark.integration
+    def test_closed_buckets_are_cached_and_invalidated(self, authenticated_client, sample_user):
+        """Test closed months are stored once and a backdated expense clears only its month"""
+        add(sample_user.id, date(2024, 1, 5), 10.0)
+        add(sample_user.id, date(2024, 2, 5), 20.0)
+        url = "/api/timeseries?granularity=month&start=2024-01-01&end=2024-02-29"
+
+        data = authenticated_client.get(url).get_json()
+        assert data["granularity"] == "month"
+        assert data["points"] == [{"start": "2024-01-01", "total": 10.0}, {"start": "2024-02-01", "total": 20.0}]
+        assert set(stored(sample_user.id, "month")) == {date(2024, 1, 1), date(2024, 2, 1)}
+
+        authenticated_client.post("/expenses/new", data={
+            "name": "Late", "amount": "5", "category": "Food", "date": "2024-02-10",
+        })
+        assert set(stored(sample_user.id, "month")) == {date(2024, 1, 1)}
+        data = authenticated_client.get(url).get_json()
+        assert [p["total"] for p in data["points"]] == [10.0, 25.0]
+
+    @pytest.mark.integration
+    def test_totals_computed_before_a_write_are_not_stored(self, test_app, sample_user):
+        """Test a fill whose data version went stale meanwhile leaves the cache empty"""
+        add(sample_user.id, date(2024, 1, 5), 10.0)
+        ranges = buckets("month", date(2024, 1, 1), date(2024, 1, 31))
+        with test_app.test_request_context("/"):
+            version = get_data_version(sample_user.id)
+            bump_data_version(sample_user.id)
+            db.session.commit()
+            assert bucket_totals(sample_user.id, "month", "USD", ranges, version)[date(2024, 1, 1)]
+        assert stored(sample_user.id, "month") == {}
+
+    @pytest.mark.integration
+    def test_current_bucket_is_not_stored(self, authenticated_client, sample_user):
+        """Test the open period is computed on demand but never cached"""
+        today = date.today()
+        add(sample_user.id, today, 7.0)
+        data = authenticated_client.get(
+            f"/api/timeseries?granularity=day&start={today - timedelta(days=1)}&end={today}"
+        ).get_json()
+        assert [p["total"] for p in data["points"]] == [0.0, 7.0]
+        assert set(stored(sample_user.id, "day")) == {today - timedelta(days=1)}
+
+    @pytest.mark.integration
+    def test_long_ranges_are_downsampled_by_category(self, test_app, authenticated_client, sample_user):
+        """Test a range over the point budget is coarsened and split into series"""
+        test_app.config["TIMESERIES_MAX_POINTS"] = 3
+        add(sample_user.id, date(2024, 1, 5), 10.0)
+        add(sample_user.id, date(2024, 2, 5), 4.0, category="Transport")
+
+        data = authenticated_client.get(
+            "/api/timeseries?granularity=day&start=2024-01-01&end=2024-02-29&by_category=1"
+        ).get_json()
+        assert data["granularity"] == "month"
+        assert data["downsampled"] is True
+        assert data["series"] == {"Food": [10.0, 0.0], "Transport": [0.0, 4.0]}
+
+    @pytest.mark.integration
+    def test_days_after_the_last_rate_use_it(self, authenticated_client, sample_user):
+        """Test buckets convert expenses dated after the newest rate with that rate"""
+        db.session.add_all([
+            FxRate(currency="EUR", rate_date=date(2024, 1, 1), rate=1.2),
+            FxRate(currency="USD", rate_date=date(2024, 1, 1), rate=1.0),
+            Expense(name="Hotel", amount=10.0, currency="EUR", category="Travel", date=date(2024, 2, 5),
+                    user_id=sample_user.id),
+        ])
+        db.session.commit()
+        data = authenticated_client.get(
+            "/api/timeseries?granularity=month&start=2024-02-01&end=2024-02-29"
+        ).get_json()
+        assert data["points"] == [{"start": "2024-02-01", "total": pytest.approx(12.0)}]
+
+    @pytest.mark.integration
+    def test_rejects_bad_parameters(self, authenticated_client):
+        """Test unknown granularities and inverted ranges are rejected"""
+        assert authenticated_client.get("/api/timeseries?granularity=hour").status_code == 400
+        assert authenticated_client.get("/api/timeseries?start=2024-02-01&end=2024-01-01").status_code == 400
+        assert authenticated_client.get("/api/timeseries?end=0001-01-01").status_code == 400
+        assert authenticated_client.get("/api/timeseries?end=9999-12-31&granularity=year").status_code == 400
+        assert authenticated_client.get("/api/balances?end=0001-01-05").status_code == 400